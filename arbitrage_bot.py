@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import numpy as np
+
+from arbitrager import Arbitrager, BUY_ERC20, NO_TRADE
+
+
+class MockBlockFeed:  # noise trades on random pools, published as blocks of touched tokens
+    def __init__(self, exchange, rng, block_time=0.01, mean_updates=10, burst_prob=0.1, burst_factor=20,
+                 trade_fraction=0.02):
+        self.exchange, self.rng = exchange, rng
+        self.block_time, self.mean_updates = block_time, mean_updates
+        self.burst_prob, self.burst_factor = burst_prob, burst_factor
+        self.trade_fraction = trade_fraction  # noise trade size, relative to the pool's ETH
+        self.tokens = list(exchange.token_to_pool.keys())
+
+    def _block(self):
+        mean = self.mean_updates * (self.burst_factor if self.rng.random() < self.burst_prob else 1)
+        n = min(len(self.tokens), int(self.rng.poisson(mean)))
+        touched = [self.tokens[i] for i in self.rng.choice(len(self.tokens), n, replace=False)]
+        for token in touched:
+            pool = self.exchange.get_pool(token)
+            size = max(1, int(pool.ETH * self.trade_fraction * self.rng.random()))
+            if self.rng.random() < 0.5:
+                pool.ETH_to_ERC20(size)
+            else:
+                pool.ERC20_to_ETH_exact(size)
+        return touched
+
+    async def publish(self, queue, n_blocks):
+        for block_number in range(n_blocks):
+            await queue.put((block_number, time.perf_counter(), self._block()))
+            await asyncio.sleep(self.block_time)
+        await queue.put(None)  # end of feed
+
+
+class ArbitrageBot:  # asyncio runner of an Arbitrager over the pools of an Exchange
+    def __init__(self, arbitrager, exchange, oracle_ratios, submit_latency=0.002, max_trades_per_block=None):
+        self.arbitrager, self.exchange = arbitrager, exchange
+        self.oracle_ratios = oracle_ratios  # token -> ERC20 / ETH
+        self.submit_latency = submit_latency  # simulated network latency per trade
+        self.max_trades_per_block = max_trades_per_block
+        self.decisions = []  # (block_number, token, expected_gain, gain, decision_latency, submit_latency, bool_executed)
+
+    def evaluate(self, tokens):  # every touched pool in one batched pass, best gain first
+        pools = [self.exchange.get_pool(token) for token in tokens]
+        directions, Ns, gains = self.arbitrager.best_trades(
+            [pool.ETH for pool in pools], [pool.ERC20 for pool in pools], [pool.fee for pool in pools],
+            [self.oracle_ratios[token] for token in tokens], [pool.bool_int for pool in pools])
+
+        order = np.argsort(-gains, kind='stable')
+        trades = [(tokens[i], int(directions[i]), int(Ns[i]), float(gains[i]))
+                  for i in order.tolist() if directions[i] != NO_TRADE]
+        return trades[:self.max_trades_per_block]
+
+    async def submit(self, block_number, received, decided, token, direction, N, gain):
+        await asyncio.sleep(self.submit_latency)
+
+        # the pool may have moved since the decision: re-quote before executing
+        pool, oracle_ratio = self.exchange.get_pool(token), self.oracle_ratios[token]
+        if direction == BUY_ERC20:
+            quote = pool.quote('ETH_to_ERC20', N)
+            gain_now = quote.amount_out - N * oracle_ratio - self.arbitrager.tx_fee["ETH2ERC20"]
+        else:
+            quote = pool.quote('ERC20_to_ETH', N)
+            gain_now = quote.amount_out * oracle_ratio - N - self.arbitrager.tx_fee["ERC202ETH"]
+
+        bool_executed = gain_now > 0
+        if bool_executed:
+            pool.execute(quote)  # no repricing
+            self.arbitrager.update_balance_ERC20(gain_now)
+
+        self.decisions.append((block_number, token, gain, gain_now, decided - received,
+                               time.perf_counter() - received, bool_executed))
+
+    async def run(self, queue):
+        while True:
+            block = await queue.get()
+            if block is None:
+                return
+            block_number, received, touched = block
+
+            trades = self.evaluate(touched)
+            decided = time.perf_counter()
+            await asyncio.gather(*[self.submit(block_number, received, decided, *trade) for trade in trades])
+
+    def get_latency_stats(self, percentiles=(50, 90, 99)):
+        if not self.decisions:
+            return {}
+
+        decision_latencies = np.array([decision[4] for decision in self.decisions])
+        submit_latencies = np.array([decision[5] for decision in self.decisions])
+        stats = {"decisions": len(self.decisions),
+                 "executed": sum(decision[6] for decision in self.decisions)}
+        for p in percentiles:
+            stats["decision_p{}".format(p)] = float(np.percentile(decision_latencies, p))
+            stats["submit_p{}".format(p)] = float(np.percentile(submit_latencies, p))
+        return stats
+
+
+async def simulate(exchange, arbitrager, oracle_ratios, rng, n_blocks=100, **feed_kwargs):
+    queue = asyncio.Queue()
+    feed = MockBlockFeed(exchange, rng, **feed_kwargs)
+    bot = ArbitrageBot(arbitrager, exchange, oracle_ratios)
+    await asyncio.gather(feed.publish(queue, n_blocks), bot.run(queue))
+    return bot
+
+
+if __name__ == "__main__":
+    from pprint import pprint
+
+    from exchange import Exchange
+
+    rng = np.random.default_rng(12345)
+
+    """init"""
+    exchange, oracle_ratios = Exchange(), {}
+    for i in range(1000):
+        token, ratio = 'T{}'.format(i), float(rng.uniform(1, 1000))
+        exchange.create_pool(token, '-1', 1000000, int(1000000 * ratio), 1000000)
+        oracle_ratios[token] = ratio
+    arbitrager = Arbitrager(1000000000, 200.)
+
+    """Simulation"""
+    bot = asyncio.run(simulate(exchange, arbitrager, oracle_ratios, rng, n_blocks=200))
+    pprint(bot.get_latency_stats())
+    print(">>> balance {}".format(arbitrager.balance_ERC20))
@@ -1,5 +1,11 @@
 from math import floor, sqrt
 
+import numpy as np
+
+from uniswap import FEE_DENOMINATOR, _floor_to_ints
+
+BUY_ERC20, BUY_ETH, NO_TRADE = 0, 1, -1  # BUY_ERC20 / BUY_ETH match replay's ETH_TO_ERC20 / ERC20_TO_ETH
+
 
 class Arbitrager:
     def __init__(self,
@@ -15,6 +21,9 @@ class Arbitrager:
             "ERC202ETH": 60000,
             "default": 21000}
 
+        self.recorder = None  # optional `recorder.Recorder` of ARBITRAGER_COLUMNS, fed by `arbitrage`
+        self.metrics = None  # optional `metrics.Metrics`: attempts, profitable executions and timings
+
     def update(self, oracle_ratio):
         self.oracle_ratio = oracle_ratio
 
@@ -59,14 +68,14 @@ class Arbitrager:
         N_ERC20 = self._best_number(pool.ERC20, pool.ETH, pool.fee, (1. / self.oracle_ratio))
 
         # Buy ETH
-        delta_ETH = pool.ERC20_to_ETH(N_ERC20, bool_update=False)
-        gain = delta_ETH * self.oracle_ratio - N_ERC20 - self.tx_fee["ERC202ETH"]  # profit - loss - fee
+        quote = pool.quote('ERC20_to_ETH', N_ERC20)
+        gain = quote.amount_out * self.oracle_ratio - N_ERC20 - self.tx_fee["ERC202ETH"]  # profit - loss - fee
 
         if gain <= 0:
             pass
         else:
             self.update_balance_ERC20(gain)
-            pool.ERC20_to_ETH(N_ERC20, bool_update=True)
+            pool.execute(quote)  # no repricing
 
         return gain
 
@@ -75,28 +84,115 @@ class Arbitrager:
         N_ETH = self._best_number(pool.ETH, pool.ERC20, pool.fee, self.oracle_ratio)
 
         # Buy ERC20
-        delta_ERC20 = pool.ETH_to_ERC20(N_ETH, bool_update=False)
-        gain = delta_ERC20 - N_ETH * self.oracle_ratio - self.tx_fee["ETH2ERC20"]  # profit - loss - fee
+        quote = pool.quote('ETH_to_ERC20', N_ETH)
+        gain = quote.amount_out - N_ETH * self.oracle_ratio - self.tx_fee["ETH2ERC20"]  # profit - loss - fee
 
         if gain <= 0:
             pass
         else:
             self.update_balance_ERC20(gain)
-            pool.ETH_to_ERC20(N_ETH, bool_update=True)
+            pool.execute(quote)  # no repricing
 
         return gain
 
     def arbitrage(self, pool):
+        if self.metrics is not None:
+            metrics = self.metrics
+            gain = metrics.call(self, 'arbitrage', pool)
+            if (gain is not None) and (gain > 0):
+                metrics.inc('profitable', 'arbitrage')
+            return gain
+
         current_ETH, current_ERC20 = pool.ETH, pool.ERC20
         pool_ratio = float(current_ERC20 / current_ETH)
 
+        gain = None
         if pool_ratio > self.oracle_ratio:
             # self._sell_ETH(pool)
-            return self._buy_ERC20(pool)
+            gain = self._buy_ERC20(pool)
 
         elif pool_ratio < self.oracle_ratio:
             # self._sell_ERC20(pool)
-            return self._buy_ETH(pool)
+            gain = self._buy_ETH(pool)
+
+        if self.recorder is not None:
+            self.recorder.record(gain or 0., self.balance_ERC20)
+        return gain
+
+    """Arbitraging (batched over pools)"""
+
+    def best_trades(self, ETHs, ERC20s, fees, oracle_ratios=None, bool_int=False):
+        """
+        Optimal trade of every pool in one pass: returns (directions, Ns, gains).
+        `_best_number` is refined by pricing both floor(N) and floor(N) + 1 and
+        keeping the better; directions are NO_TRADE where the best gain is <= 0.
+        Pools with `bool_int` (one flag, or one per pool) price both with the
+        contract's integer formula, on their exact reserves.
+        """
+        int_ETHs, int_ERC20s = np.asarray(ETHs), np.asarray(ERC20s)
+        ETHs = np.asarray(ETHs, dtype=np.float64)
+        ERC20s = np.asarray(ERC20s, dtype=np.float64)
+        fees = np.broadcast_to(np.asarray(fees, dtype=np.float64), ETHs.shape)
+        oracle_ratios = np.broadcast_to(np.asarray(
+            self.oracle_ratio if oracle_ratios is None else oracle_ratios, dtype=np.float64), ETHs.shape)
+        idx_int = np.flatnonzero(np.broadcast_to(np.asarray(bool_int, dtype=np.bool_), ETHs.shape))
+
+        pool_ratios = ERC20s / ETHs
+        bool_buy_ERC20 = pool_ratios > oracle_ratios
+        bool_buy_ETH = pool_ratios < oracle_ratios
+
+        # Buy ERC20: ETH in, valued at oracle_ratio. Buy ETH: ERC20 in, ETH out valued at oracle_ratio
+        Xs = np.where(bool_buy_ERC20, ETHs, ERC20s)
+        Ys = np.where(bool_buy_ERC20, ERC20s, ETHs)
+        value_ins = np.where(bool_buy_ERC20, oracle_ratios, 1.)
+        value_outs = np.where(bool_buy_ERC20, 1., oracle_ratios)
+        tx_fees = np.where(bool_buy_ERC20, self.tx_fee["ETH2ERC20"], self.tx_fee["ERC202ETH"])
+
+        # `_best_number`
+        gammas = (1. - fees)
+        units = value_ins / value_outs
+        N_floors = np.floor((np.sqrt(Ys) * np.sqrt(gammas) * np.sqrt(Xs) / np.sqrt(units) - Xs) / (gammas))
+
+        if idx_int.size:  # getInputPrice's operands, as Python ints
+            int_Xs = [int(X) for X in np.where(bool_buy_ERC20, int_ETHs, int_ERC20s)[idx_int].tolist()]
+            int_Ys = [int(Y) for Y in np.where(bool_buy_ERC20, int_ERC20s, int_ETHs)[idx_int].tolist()]
+            gamma_nums = [FEE_DENOMINATOR - round(fee * FEE_DENOMINATOR) for fee in fees[idx_int].tolist()]
+
+        def gain(Ns):  # `_get_input_price` on the pool, profit - loss - fee
+            alphas = Ns / Xs
+            delta_Ys = np.floor(alphas * gammas / (1. + alphas * gammas) * Ys)
+            if idx_int.size:
+                int_Ns = [int(N) if N > 0 else 0 for N in Ns[idx_int].tolist()]  # not traded otherwise
+                delta_Ys[idx_int] = [N * gamma_num * Y // (X * FEE_DENOMINATOR + N * gamma_num)
+                                     for N, X, Y, gamma_num in zip(int_Ns, int_Xs, int_Ys, gamma_nums)]
+            return delta_Ys * value_outs - Ns * value_ins - tx_fees
+
+        gain_floors, gain_ceils = gain(N_floors), gain(N_floors + 1.)
+        bool_ceil = gain_ceils > gain_floors
+        Ns = np.where(bool_ceil, N_floors + 1., N_floors)
+        gains = np.where(bool_ceil, gain_ceils, gain_floors)
+
+        directions = np.where(bool_buy_ERC20, BUY_ERC20, np.where(bool_buy_ETH, BUY_ETH, NO_TRADE))
+        directions = np.where((Ns > 0) & (gains > 0), directions, NO_TRADE)
+        Ns = _floor_to_ints(np.where(directions == NO_TRADE, 0, Ns))  # Python ints beyond int64
+        return directions, Ns, gains
+
+    def arbitrage_bank(self, bank, oracle_ratios=None):  # every pool of a PoolBank at once
+        if self.metrics is not None:
+            metrics = self.metrics
+            directions, Ns, gains = metrics.call(self, 'arbitrage_bank', bank, oracle_ratios)
+            metrics.inc('profitable', 'arbitrage_bank', int((directions != NO_TRADE).sum()))
+            return directions, Ns, gains
+
+        directions, Ns, gains = self.best_trades(bank.ETH, bank.ERC20, bank.fee, oracle_ratios)
+
+        idx_buy_ERC20 = np.flatnonzero(directions == BUY_ERC20)
+        idx_buy_ETH = np.flatnonzero(directions == BUY_ETH)
+        bank.ETH_to_ERC20(Ns[idx_buy_ERC20], idx=idx_buy_ERC20)
+        bank.ERC20_to_ETH(Ns[idx_buy_ETH], idx=idx_buy_ETH)
+
+        self.update_balance_ERC20(float(gains[directions != NO_TRADE].sum()))
+        return directions, Ns, gains
 
 
 if __name__ == "__main__":
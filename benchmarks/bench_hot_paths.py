@@ -0,0 +1,265 @@
+"""
+Hot paths of pools, arbitrage, scenario branching and the simulators, with a
+history of runs and regression thresholds against it.
+
+    python -m benchmarks.bench_hot_paths [--filter SUBSTRING] [--threshold 1.2] [--record]
+
+With `--record`, the run is appended to `--history` (one JSON line: time,
+commit, seconds per op); by default, a file in the user's cache directory,
+outside the source tree. A benchmark regresses when its best time is over `--threshold` times the
+median of the previous `--window` runs (or of the runs of `--baseline COMMIT`);
+the exit status is then 1. The memory of LT holders, plain and interned, is
+printed after the timings.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from copy import deepcopy
+
+from uniswap import Uniswap
+from arbitrager import Arbitrager
+from holders import AddressTable
+import simulator_uniswap
+import simulator_arbitrager
+
+
+BENCHMARKS = {}  # name -> (setup, ops per run); setup() returns run()
+HISTORY_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                            'uniswap-python', 'bench_history.jsonl')
+
+
+def benchmark(name, n):
+    def register(setup):
+        BENCHMARKS[name] = (setup, n)
+        return setup
+    return register
+
+
+def _pool(n_holders=0, address_table=None):
+    pool = Uniswap('-1', 1000000, 200000000, 1000000, address_table=address_table)  # 1:200
+    for i in range(n_holders):
+        pool.join(str(i), 1, pool.required_ERC20_for_liquidity(1))
+    return pool
+
+
+"""Pools"""
+
+
+@benchmark('swap.ETH_to_ERC20', 100000)
+def _ETH_to_ERC20():
+    def run():
+        pool = _pool()
+        for _ in range(100000):
+            pool.ETH_to_ERC20(2)
+    return run
+
+
+@benchmark('swap.ERC20_to_ETH_exact', 100000)
+def _ERC20_to_ETH_exact():
+    def run():
+        pool = _pool()
+        for _ in range(100000):
+            pool.ERC20_to_ETH_exact(2)
+    return run
+
+
+def _join_out(address_table=None):
+    pool = _pool(n_holders=100000, address_table=address_table)
+
+    def run():  # each op: a new holder joins, then leaves
+        for i in range(10000):
+            address = 'new' + str(i)
+            delta_LT = pool.join(address, 10, pool.required_ERC20_for_liquidity(10))
+            pool.out(address, delta_LT)
+    return run
+
+
+benchmark('liquidity.join_out[100000 holders]', 10000)(_join_out)
+benchmark('liquidity.join_out[100000 interned holders]', 10000)(lambda: _join_out(AddressTable()))
+
+
+"""Arbitrage"""
+
+
+@benchmark('arbitrager.arbitrage', 10000)
+def _arbitrage():
+    def run():  # each op: a noise swap, then arbitrage, as simulator_arbitrager
+        random.seed(950327)
+        pool, arbitrager = _pool(), Arbitrager(1000000000, 200.)
+        for _ in range(10000):
+            if random.random() < 0.5:
+                pool.ETH_to_ERC20(315)
+            else:
+                pool.ERC20_to_ETH_exact(315)
+            arbitrager.arbitrage(pool)
+    return run
+
+
+"""Scenario branching: a what-if of 100 swaps on a pool with 100000 holders"""
+
+
+def _branch(pool):
+    for _ in range(50):
+        pool.ETH_to_ERC20(105)
+        pool.ERC20_to_ETH_exact(105)
+
+
+@benchmark('branching.deepcopy', 100)
+def _deepcopy():
+    pool = _pool(n_holders=100000)
+
+    def run():
+        for _ in range(100):
+            _branch(deepcopy(pool))
+    return run
+
+
+@benchmark('branching.snapshot', 100)
+def _snapshot():
+    pool = _pool(n_holders=100000)
+
+    def run():
+        for _ in range(100):
+            snapshot_id = pool.snapshot()
+            _branch(pool)
+            pool.restore(snapshot_id)
+    return run
+
+
+"""Simulators (results written to a temporary directory)"""
+
+
+def _simulator(module, scenario, seed=950327):
+    def setup():
+        args = argparse.Namespace(path=tempfile.mkdtemp(), seed=seed)
+
+        def run():
+            random.seed(seed)
+            with redirect_stdout(io.StringIO()):  # the scenarios print pool states
+                if module is simulator_arbitrager:
+                    scenario(args, _pool(), Arbitrager(1000000000, 200.))
+                else:
+                    scenario(args, _pool())
+        return run
+    return setup
+
+
+for _module, _names in ((simulator_uniswap, ['Swap_k_Curve', 'ETH2ERC20_Swap_Curve', 'ERC202ETH_Swap_Curve',
+                                             'LP_k_ETHNERC20_Curve', 'LP_LT_Curve', 'fee_Gain_Curve']),
+                        (simulator_arbitrager, ['Arbitraging_Curve'])):
+    for _name in _names:
+        benchmark('{}.{}'.format(_module.__name__, _name), 1)(_simulator(_module, getattr(_module, _name)))
+
+
+"""Memory: LT holders of 4 pools sharing 100000 LPs, each with its own balances"""
+
+
+MEMORY = {}  # name -> bytes()
+
+
+def _holders_nbytes(address_table=None):
+    def nbytes():
+        random.seed(950327)
+        pools = [Uniswap('-1', 1000000, 200000000, 1000000, address_table=address_table) for _ in range(4)]
+        for pool in pools:
+            for i in range(100000):
+                amount = random.randint(1000, 100000)
+                pool.join(str(i), amount, pool.required_ERC20_for_liquidity(amount))
+        if address_table is None:  # dicts and an int per balance (the addresses are shared by both)
+            return sum(sys.getsizeof(pool.LT_holders) + sum(map(sys.getsizeof, pool.LT_holders.values()))
+                       for pool in pools)
+        return address_table.nbytes() + sum(pool.LT_holders.nbytes() for pool in pools)
+    return nbytes
+
+
+MEMORY['holders[4 pools x 100000]'] = _holders_nbytes()
+MEMORY['holders[4 pools x 100000 interned]'] = _holders_nbytes(AddressTable())
+
+
+"""Running"""
+
+
+def measure(setup, n, repeat=3):  # best seconds per op
+    run = setup()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def get_baselines(history, window=5, commit=None):  # name -> median seconds per op
+    if commit is not None:
+        runs = [run for run in history if run['commit'].startswith(commit)]
+    else:
+        runs = history[-window:]
+    names = {name for run in runs for name in run['results']}
+    return {name: statistics.median(run['results'][name] for run in runs if name in run['results'])
+            for name in names}
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filter', default='')  # run benchmarks whose name contains this
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--window', type=int, default=5)  # previous runs in the baseline
+    parser.add_argument('--baseline')  # commit (prefix) to compare against instead
+    parser.add_argument('--threshold', type=float, default=1.2)  # slowdown ratio that fails
+    parser.add_argument('--record', action='store_true')  # append this run to the history
+    args = parser.parse_args()
+
+    baselines = get_baselines(load_history(args.history), window=args.window, commit=args.baseline)
+
+    results, regressions = {}, []
+    print("{:<44}{:>14}{:>14}{:>10}".format("benchmark", "us/op", "baseline", "ratio"))
+    for name, (setup, n) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup, n, repeat=args.repeat)
+
+        baseline = baselines.get(name)
+        ratio = results[name] / baseline if baseline else None
+        if (ratio is not None) and (ratio > args.threshold):
+            regressions.append(name)
+        print("{:<44}{:>14.3f}{:>14}{:>10}{}".format(
+            name, results[name] * 1e6, '-' if baseline is None else '{:.3f}'.format(baseline * 1e6),
+            '-' if ratio is None else '{:.2f}'.format(ratio), '  REGRESSION' if name in regressions else ''))
+
+    for name, nbytes in MEMORY.items():
+        if args.filter in name:
+            print("{:<44}{:>14.1f} MB".format(name, nbytes() / 2 ** 20))
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _commit(),
+                                'results': results}) + '\n')
+
+    if regressions:
+        print(">>> {} regression(s) over x{}: {}".format(len(regressions), args.threshold, ', '.join(regressions)))
+        raise SystemExit(1)
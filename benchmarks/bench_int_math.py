@@ -0,0 +1,84 @@
+"""
+Throughput of float, big-int and fast-int (int64) pricing.
+
+    python -m benchmarks.bench_int_math [--n N]
+"""
+import argparse
+import time
+from copy import deepcopy
+
+import numpy as np
+
+from uniswap import Uniswap
+from replay import replay, ETH_TO_ERC20
+
+
+def _timeit(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _swaps(pool, directions, amount):
+    def run():
+        tmp_pool = deepcopy(pool)
+        for direction in directions:
+            if direction == ETH_TO_ERC20:
+                tmp_pool.ETH_to_ERC20(amount)
+            else:
+                tmp_pool.ERC20_to_ETH_exact(amount)
+    return run
+
+
+def _replay(pool, directions, amount, bool_jit):
+    amounts = np.full(len(directions), amount, dtype=np.int64)
+    exacts = directions != ETH_TO_ERC20
+
+    def run():
+        replay(deepcopy(pool), directions, amounts, exacts, bool_jit=bool_jit)
+    run()  # warm-up (jit compile)
+    return run
+
+
+def _quotes(pool, amounts):
+    def run():
+        pool.ETH_to_ERC20_batch(amounts)
+    return run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=12345)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    directions = rng.integers(0, 2, args.n).astype(np.int8)
+
+    # (reserves, amount): simulator scale fits int64, on-chain (1e18-scaled) does not
+    scales = {
+        "simulator": ((1000000, 200000000, 1000000), 105),
+        "on-chain": ((1000 * 10 ** 18, 200000 * 10 ** 18, 1000 * 10 ** 18), 10 ** 17),
+    }
+
+    print("{:<10}{:<22}{:>12}{:>14}".format("scale", "mode", "seconds", "swaps/s"))
+    for scale, (reserves, amount) in scales.items():
+        float_pool = Uniswap('-1', *reserves)
+        int_pool = Uniswap('-1', *reserves, bool_int=True)
+        quote_amounts = np.full(args.n, amount, dtype=np.int64 if amount < 2 ** 62 else object)
+
+        cases = [
+            ("float", _swaps(float_pool, directions, amount)),
+            ("big-int", _swaps(int_pool, directions, amount)),
+            ("float replay", _replay(float_pool, directions, amount, bool_jit=False)),
+            ("big-int replay", _replay(int_pool, directions, amount, bool_jit=False)),
+            ("fast-int replay", _replay(int_pool, directions, amount, bool_jit=True)),
+            ("float batch quote", _quotes(float_pool, quote_amounts)),
+            ("int batch quote", _quotes(int_pool, quote_amounts)),
+        ]
+        for mode, fn in cases:
+            seconds = _timeit(fn)
+            print("{:<10}{:<22}{:>12.4f}{:>14.0f}".format(scale, mode, seconds, args.n / seconds))
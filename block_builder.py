@@ -0,0 +1,298 @@
+import random
+from collections import namedtuple
+
+
+DIRECTIONS = ('ETH_to_ERC20', 'ETH_to_ERC20_exact', 'ERC20_to_ETH', 'ERC20_to_ETH_exact')
+
+# A pending swap. `limit` is the min output ('ETH_to_ERC20', 'ERC20_to_ETH') or the max input
+# ('*_exact'), None for none; `deadline` the last block it may be included in, None for none;
+# `gas_price` the fee it pays to the block, in ERC20.
+Tx = namedtuple('Tx', ['sender', 'direction', 'amount', 'limit', 'deadline', 'gas_price'])
+
+
+def apply_tx(pool, tx, block):  # as a router: the swap's price, or an exception (reverted)
+    if (tx.deadline is not None) and (block > tx.deadline):
+        raise Exception("expired tx. deadline {} < block {}".format(tx.deadline, block))
+
+    direction, amount, limit = tx.direction, tx.amount, tx.limit
+    quote = pool.quote(direction, amount)
+    if direction.endswith('_exact'):
+        price = quote.amount_in
+        if (limit is not None) and (price > limit):
+            raise Exception("slippage. input {} > max {}".format(price, limit))
+    else:
+        price = quote.amount_out
+        if (limit is not None) and (price < limit):
+            raise Exception("slippage. output {} < min {}".format(price, limit))
+    pool.execute(quote)  # no repricing
+    return price
+
+
+def apply_txs(pool, txs, block):  # [(tx, price or exception, bool_success)]
+    receipts = []
+    for tx in txs:
+        try:
+            receipts.append((tx, apply_tx(pool, tx, block), True))
+        except Exception as e:
+            receipts.append((tx, e, False))
+    return receipts
+
+
+def get_flows(tx, price):  # (delta_ETH, delta_ERC20) of the sender of a successful `tx`
+    direction = tx.direction
+    if direction == 'ETH_to_ERC20':
+        return -tx.amount, price
+    if direction == 'ETH_to_ERC20_exact':
+        return -price, tx.amount
+    if direction == 'ERC20_to_ETH':
+        return price, -tx.amount
+    return tx.amount, -price  # ERC20_to_ETH_exact
+
+
+class Mempool:  # pending txs, in arrival order
+    def __init__(self):
+        self.txs = []
+
+    def add(self, tx):
+        if tx.direction not in DIRECTIONS:
+            raise Exception("invalid direction {}".format(tx.direction))
+        self.txs.append(tx)
+
+    def pending(self, block):  # drops expired txs; the rest by gas price, highest first
+        self.txs = [tx for tx in self.txs if (tx.deadline is None) or (tx.deadline >= block)]
+        return sorted(self.txs, key=lambda tx: -tx.gas_price)
+
+    def remove(self, txs):
+        ids = {id(tx) for tx in txs}
+        self.txs = [tx for tx in self.txs if id(tx) not in ids]
+
+    def __len__(self):
+        return len(self.txs)
+
+
+"""Searcher"""
+
+
+class SandwichSearcher:
+    """
+    Front-runs a victim swap in its direction by the largest amount the
+    victim's limit tolerates, then sells back what the front-run bought. Sized
+    by speculative execution on pool snapshots; the profit is valued at the
+    `Arbitrager`'s oracle ratio, net of its `tx_fee`s (paid as gas to the block).
+    """
+    def __init__(self, arbitrager, max_probes=32):
+        self.arbitrager = arbitrager
+        self.max_probes = max_probes  # of the binary search for the largest front-run
+
+    def _tx(self, direction, amount, block):
+        gas = self.arbitrager.tx_fee["ETH2ERC20" if direction == 'ETH_to_ERC20' else "ERC202ETH"]
+        return Tx(self, direction, amount, None, block, gas)
+
+    def _bool_tolerated(self, pool, front, victim, block):
+        snapshot_id = pool.snapshot()
+        try:
+            apply_tx(pool, front, block)
+            apply_tx(pool, victim, block)
+            return True
+        except Exception:
+            return False
+        finally:
+            pool.restore(snapshot_id)
+
+    def _sandwich(self, pool, front, victim, block):  # ([front, back], profit), or None if reverted
+        snapshot_id = pool.snapshot()
+        try:
+            bought = apply_tx(pool, front, block)
+            apply_tx(pool, victim, block)
+            back = self._tx('ERC20_to_ETH' if front.direction == 'ETH_to_ERC20' else 'ETH_to_ERC20', bought, block)
+            receipts = [(front, bought, True), (back, apply_tx(pool, back, block), True)]
+        except Exception:
+            return None
+        finally:
+            pool.restore(snapshot_id)
+        return [front, back], self.profit(receipts)
+
+    def sandwich(self, pool, victim, block):
+        """([front-run, back-run], expected profit) around `victim` on the current pool, or None if unprofitable."""
+        if victim.sender is self:
+            return None
+        if victim.direction.startswith('ETH'):
+            direction, capital = 'ETH_to_ERC20', int(self.arbitrager.get_balance_ETH())
+        else:
+            direction, capital = 'ERC20_to_ETH', int(self.arbitrager.get_balance_ERC20())
+
+        lo, hi = 0, capital  # largest tolerated front-run, in (lo, hi]
+        if not self._bool_tolerated(pool, self._tx(direction, hi, block), victim, block):
+            for _ in range(self.max_probes):
+                if hi - lo <= 1:
+                    break
+                mid = (lo + hi) // 2
+                if self._bool_tolerated(pool, self._tx(direction, mid, block), victim, block):
+                    lo = mid
+                else:
+                    hi = mid
+            hi = lo
+
+        best = None
+        for amount in (hi, hi // 2, hi // 4):  # the largest is not always the best, as fees grow with it
+            if amount <= 0:
+                continue
+            result = self._sandwich(pool, self._tx(direction, amount, block), victim, block)
+            if (result is not None) and (result[1] > 0) and ((best is None) or (result[1] > best[1])):
+                best = result
+        return best
+
+    def profit(self, receipts):  # of this searcher's successful txs, in ERC20, net of gas
+        ETH, ERC20 = 0, 0
+        for tx, price, bool_success in receipts:
+            if bool_success and (tx.sender is self):
+                delta_ETH, delta_ERC20 = get_flows(tx, price)
+                ETH, ERC20 = ETH + delta_ETH, ERC20 + delta_ERC20 - tx.gas_price
+        return ETH * self.arbitrager.oracle_ratio + ERC20
+
+
+"""Builder"""
+
+
+class BlockBuilder:
+    """
+    Orders a block of pending txs to maximize the gas it collects plus the
+    searcher's profit: gas-price order first, then sandwiches inserted greedily
+    (each kept if the whole block scores better), then random pairwise swaps
+    of positions as a local search. Every candidate is executed speculatively
+    on a pool snapshot and rolled back, O(txs) per ordering.
+    """
+    def __init__(self, pool, searcher=None, max_txs=200, n_orderings=1000, seed=950327):
+        self.pool = pool
+        self.searcher = searcher
+        self.max_txs = max_txs  # block gas limit, in txs
+        self.n_orderings = n_orderings  # orderings evaluated per block, at most
+        self.rng = random.Random(seed)
+
+        self.n_evaluated = 0
+
+    def score(self, receipts):
+        score = sum(tx.gas_price for tx, _, bool_success in receipts if bool_success)
+        if self.searcher is not None:
+            score += self.searcher.profit(receipts)
+        return score
+
+    def evaluate(self, txs, block):  # (score, receipts) of `txs` in this order; the pool is left unchanged
+        snapshot_id = self.pool.snapshot()
+        try:
+            receipts = apply_txs(self.pool, txs, block)
+        finally:
+            self.pool.restore(snapshot_id)
+        self.n_evaluated += 1
+        return self.score(receipts), receipts
+
+    def _sandwich_at(self, txs, i, block):  # the searcher's sandwich of txs[i], after txs[:i]
+        snapshot_id = self.pool.snapshot()
+        try:
+            apply_txs(self.pool, txs[:i], block)
+            return self.searcher.sandwich(self.pool, txs[i], block)
+        finally:
+            self.pool.restore(snapshot_id)
+
+    def search(self, txs, block):  # (score, ordering)
+        best = list(txs)
+        best_score, _ = self.evaluate(best, block)
+        n_orderings = 1
+
+        if self.searcher is not None:
+            victims = sorted(txs, key=lambda tx: -tx.amount)  # larger swaps leave more to extract
+            for victim in victims:
+                if n_orderings >= self.n_orderings:
+                    break
+                i = best.index(victim)
+                result = self._sandwich_at(best, i, block)
+                if result is None:
+                    continue
+                (front, back), _ = result
+                candidate = best[:i] + [front, victim, back] + best[i + 1:]
+                score, _ = self.evaluate(candidate, block)
+                n_orderings += 1
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        if len(best) > 1:
+            rng = self.rng
+            for _ in range(self.n_orderings - n_orderings):
+                i, j = rng.randrange(len(best)), rng.randrange(len(best))
+                if i == j:
+                    continue
+                candidate = list(best)
+                candidate[i], candidate[j] = candidate[j], candidate[i]
+                score, _ = self.evaluate(candidate, block)
+                if score > best_score:
+                    best, best_score = candidate, score
+        return best_score, best
+
+    def build(self, mempool, block):
+        """Search an ordering of the pending txs, execute it on the pool and return its receipts."""
+        txs = mempool.pending(block)[:self.max_txs]
+        if not txs:
+            return []
+        _, ordering = self.search(txs, block)
+
+        receipts = apply_txs(self.pool, ordering, block)
+        mempool.remove(txs)  # included, or reverted
+        if self.searcher is not None:
+            self.searcher.arbitrager.update_balance_ERC20(self.searcher.profit(receipts))
+        return receipts
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from uniswap import Uniswap
+    from arbitrager import Arbitrager
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=950327)
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--txs', type=int, default=20)  # per block
+    parser.add_argument('--orderings', type=int, default=2000)  # per block
+    args = parser.parse_args()
+    print(args)
+
+    def submit(rng, mempool, pool, block, quotes):  # traders with 0.1% .. 3% slippage tolerance
+        for i in range(args.txs):
+            if rng.random() < 0.5:
+                tx = Tx(str(i), 'ETH_to_ERC20', rng.randint(1000, 20000), None, block + 2, rng.randint(1000, 100000))
+            else:
+                tx = Tx(str(i), 'ERC20_to_ETH', rng.randint(200000, 4000000), None, block + 2, rng.randint(1000, 100000))
+            quote = getattr(pool, tx.direction)(tx.amount, bool_update=False)
+            tx = tx._replace(limit=int(quote * (1. - rng.uniform(0.001, 0.03))))
+            quotes[id(tx)] = quote * (1. if tx.direction == 'ETH_to_ERC20' else 200.)  # in ERC20
+            mempool.add(tx)
+
+    for name, bool_searcher, n_orderings in (('gas-price order', False, 1), ('searched', False, args.orderings),
+                                             ('searched, sandwiched', True, args.orderings)):
+        rng = random.Random(args.seed)
+        us = Uniswap('-1', 1000000, 200000000, 1000000)  # 1:200
+        searcher = SandwichSearcher(Arbitrager(1000000000, 200.)) if bool_searcher else None
+        builder = BlockBuilder(us, searcher, n_orderings=n_orderings, seed=args.seed)
+        mempool, quotes = Mempool(), {}
+
+        start = time.perf_counter()
+        shortfall, n_included, n_reverted = 0., 0, 0
+        for block in range(args.blocks):
+            submit(rng, mempool, us, block, quotes)
+            for tx, price, bool_success in builder.build(mempool, block):
+                if tx.sender is searcher:
+                    continue
+                if bool_success:
+                    n_included += 1
+                    shortfall += quotes[id(tx)] - price * (1. if tx.direction == 'ETH_to_ERC20' else 200.)
+                else:
+                    n_reverted += 1
+        elapsed = time.perf_counter() - start
+
+        print(">>> {}: {} txs included, {} reverted, traders' shortfall to their quotes {:.0f} ERC20".format(
+            name, n_included, n_reverted, shortfall))
+        print(">>> {} orderings in {:.3f}s ({:.0f}/s)".format(
+            builder.n_evaluated, elapsed, builder.n_evaluated / elapsed))
+        if bool_searcher:
+            print(">>> searcher profit {:.0f} ERC20".format(searcher.arbitrager.balance_ERC20 - 1000000000))
@@ -0,0 +1,262 @@
+from collections import deque
+from math import log, sqrt, inf
+
+
+EPS = 1e-12  # relaxations smaller than this are float noise, not profit
+
+
+class CycleDetector:
+    """
+    Pools as a token multigraph: each pool gives two edges, base -> quote and
+    quote -> base, weighted by -log(marginal rate * (1 - fee)), so a negative
+    cycle is a loop of swaps that is profitable at the margin. Cycles are found
+    with SPFA (queue-based Bellman-Ford). Between blocks, only the edges of the
+    touched pools are reweighted and only those whose weight dropped seed the
+    search: the previous distances stay feasible for every other edge. A found
+    cycle (profitable or not once sized in integers) is left out of the search
+    until one of its pools is updated again.
+    """
+    def __init__(self, max_cycles=16):
+        self.max_cycles = max_cycles  # per `update`
+        self.tokens, self.token_ids = [], {}
+        self.pools, self.pool_ids = [], {}  # [(pool, base, quote)], id(pool) -> index
+        self.tails, self.heads, self.weights = [], [], []  # per edge
+        self.edge_pools, self.edge_bool_base_in = [], []
+        self.out_edges = []  # per token
+        self.dist, self.pred = [], []  # SPFA state, kept between updates
+        self.bool_dirty = True  # distances must be recomputed from scratch
+        self.pending = set()  # sources of a search cut short by `max_cycles`, carried to the next `update`
+
+    def _token_id(self, token):
+        if token not in self.token_ids:
+            self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.out_edges.append([])
+            self.dist.append(0.)
+            self.pred.append(-1)
+        return self.token_ids[token]
+
+    def add_pool(self, pool, base='ETH', quote=None):  # `pool.ETH` is `base`, `pool.ERC20` is `quote`
+        if pool.invariant is not None:
+            raise Exception("invalid pool. only x * y = k pools are sized in closed form")
+        if id(pool) in self.pool_ids:
+            raise Exception("pool already added")
+
+        self.pool_ids[id(pool)] = len(self.pools)
+        self.pools.append((pool, base, quote))
+        base_id, quote_id = self._token_id(base), self._token_id(quote)
+        for tail, head, bool_base_in in ((base_id, quote_id, True), (quote_id, base_id, False)):
+            self.out_edges[tail].append(len(self.tails))
+            self.tails.append(tail)
+            self.heads.append(head)
+            self.edge_pools.append(pool)
+            self.edge_bool_base_in.append(bool_base_in)
+            self.weights.append(self._weight(pool, bool_base_in))
+        self.bool_dirty = True
+
+    @classmethod
+    def from_exchanges(cls, exchanges, max_cycles=16):  # every ETH/ERC20 pool of every exchange
+        detector = cls(max_cycles=max_cycles)
+        for exchange in exchanges:
+            for token, pool in exchange.token_to_pool.items():
+                detector.add_pool(pool, 'ETH', token)
+        return detector
+
+    @staticmethod
+    def _weight(pool, bool_base_in):
+        gamma = 1. - pool.fee
+        if bool_base_in:
+            return -log(gamma * pool.ERC20 / pool.ETH)
+        return -log(gamma * pool.ETH / pool.ERC20)
+
+    """Detection"""
+
+    def update(self, pools=None):
+        """Reweight the edges of `pools` (None: every pool), then return the profitable cycles, best first."""
+        sources = self.pending
+        for pool in (self.pools_only() if pools is None else pools):
+            i = 2 * self.pool_ids[id(pool)]
+            for e in (i, i + 1):
+                weight = self._weight(pool, self.edge_bool_base_in[e])
+                if weight < self.weights[e]:
+                    sources.add(self.tails[e])
+                self.weights[e] = weight
+
+        if self.bool_dirty:
+            sources = self._reset()
+        return self._find_cycles(sources)
+
+    def pools_only(self):
+        return [pool for pool, _, _ in self.pools]
+
+    def _reset(self):
+        self.dist = [0.] * len(self.tokens)  # a virtual source at distance 0 of every token
+        self.pred = [-1] * len(self.tokens)
+        self.bool_dirty = False
+        return set(range(len(self.tokens)))
+
+    def _spfa(self, sources):  # edges of a negative cycle, or None
+        n, dist, pred, weights, heads = len(self.tokens), self.dist, self.pred, self.weights, self.heads
+        queue, in_queue = deque(sources), [False] * n
+        for source in sources:
+            in_queue[source] = True
+
+        while queue:
+            u = queue.popleft()
+            in_queue[u] = False
+            dist_u = dist[u]
+            for e in self.out_edges[u]:
+                v = heads[e]
+                dist_v = dist_u + weights[e]
+                if dist_v < dist[v] - EPS:
+                    dist[v], pred[v] = dist_v, e
+                    if self._bool_on_cycle(v):  # pred paths are short: cheaper than counting n relaxations
+                        return self._cycle_at(v)
+                    if not in_queue[v]:
+                        queue.append(v)
+                        in_queue[v] = True
+        return None
+
+    def _bool_on_cycle(self, v):  # does the predecessor path of `v` lead back to `v`?
+        u = self.tails[self.pred[v]]
+        for _ in range(len(self.tokens)):
+            if u == v:
+                return True
+            e = self.pred[u]
+            if e < 0:
+                return False
+            u = self.tails[e]
+        return False
+
+    def _cycle_at(self, v):
+        for _ in range(len(self.tokens)):  # walk back onto the cycle
+            v = self.tails[self.pred[v]]
+        edges, u = [], v
+        while True:
+            e = self.pred[u]
+            edges.append(e)
+            u = self.tails[e]
+            if u == v:
+                break
+        return edges[::-1]
+
+    def _find_cycles(self, sources):
+        cycles, self.pending = [], set()
+        while sources:
+            if len(cycles) >= self.max_cycles:
+                self.pending = sources  # distances are still infeasible out of them
+                break
+            dist, pred = self.dist[:], self.pred[:]  # feasible but for the edges out of `sources`
+            edges = self._spfa(sources)
+            if edges is None:
+                break
+
+            cycle = self.size(edges)
+            if cycle is not None:
+                cycles.append(cycle)
+            for e in edges:  # until reweighted by `update`
+                self.weights[e] = inf
+            self.dist, self.pred = dist, pred  # look for other cycles from the same distances
+        return sorted(cycles, key=lambda cycle: -cycle['profit'])
+
+    """Sizing"""
+
+    def size(self, edges):
+        """
+        Optimal input of a cycle: the composition of the hops' input prices
+        y = gamma * Y * x / (X + gamma * x) is a * x / (b + c * x), maximal over
+        the input at x = (sqrt(a * b) - b) / c. Returned with exact amounts.
+        """
+        base_id = self.token_ids.get('ETH')
+        starts = [i for i, e in enumerate(edges) if self.tails[e] == base_id]
+        if starts:  # measured in ETH when the cycle goes through it
+            edges = edges[starts[0]:] + edges[:starts[0]]
+
+        a, b, c = 1., 1., 0.
+        for e in edges:
+            pool, bool_base_in = self.edge_pools[e], self.edge_bool_base_in[e]
+            X, Y = (pool.ETH, pool.ERC20) if bool_base_in else (pool.ERC20, pool.ETH)
+            gamma = 1. - pool.fee
+            a, b, c = gamma * Y * a / b, X, (X * c + gamma * a) / b  # normalized by b
+        if (a <= b) or (c <= 0.):
+            return None
+
+        amount_in = int((sqrt(a * b) - b) / c)
+        if amount_in <= 0:
+            return None
+        try:
+            amount_out = self._simulate(edges, amount_in, bool_update=False)
+        except Exception:  # rejected by a pool
+            return None
+        if amount_out <= amount_in:
+            return None
+        return {'tokens': [self.tokens[self.tails[e]] for e in edges] + [self.tokens[self.tails[edges[0]]]],
+                'edges': edges, 'amount_in': amount_in, 'amount_out': amount_out, 'profit': amount_out - amount_in}
+
+    def _simulate(self, edges, amount, bool_update):  # distinct pools: hops do not interact
+        for e in edges:
+            pool = self.edge_pools[e]
+            if self.edge_bool_base_in[e]:
+                amount = pool.ETH_to_ERC20(amount, bool_update=bool_update)
+            else:
+                amount = pool.ERC20_to_ETH(amount, bool_update=bool_update)
+        return amount
+
+    def execute(self, cycle):  # returns the realized profit; `update` the cycle's pools afterwards
+        return self._simulate(cycle['edges'], cycle['amount_in'], bool_update=True) - cycle['amount_in']
+
+    def get_pools(self, cycle):
+        return [self.edge_pools[e] for e in cycle['edges']]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from exchange import Exchange
+
+    random.seed(12345)
+
+    """init: 3 exchanges listing the same 1000 tokens, at slightly different prices"""
+    n_tokens = 1000
+    ratios = [random.uniform(10, 1000) for _ in range(n_tokens)]
+    exchanges = []
+    for _ in range(3):
+        exchange = Exchange()
+        for token, ratio in enumerate(ratios):
+            exchange.create_pool(token, '-1', 1000000, int(1000000 * ratio * random.uniform(0.995, 1.005)), 1000000)
+        exchanges.append(exchange)
+
+    start = time.perf_counter()
+    detector = CycleDetector.from_exchanges(exchanges)
+    cycles = detector.update()
+    print(">>> full scan: {} cycles in {:.3f}s".format(len(cycles), time.perf_counter() - start))
+    for cycle in cycles[:3]:
+        print(cycle['tokens'], cycle['amount_in'], cycle['profit'])
+
+    profit = 0
+    while cycles:
+        for cycle in cycles:
+            profit += detector.execute(cycle)
+        cycles = detector.update([pool for cycle in cycles for pool in detector.get_pools(cycle)])
+    print(">>> executed, profit {} ETH".format(profit))
+
+    """Blocks: noise trades on a few pools, then an incremental update"""
+    pools, elapsed, n_cycles = detector.pools_only(), 0., 0
+    for _ in range(1000):
+        touched = random.sample(pools, 5)
+        for pool in touched:
+            if random.random() < 0.5:
+                pool.ETH_to_ERC20(random.randint(1, 20000))
+            else:
+                pool.ERC20_to_ETH_exact(random.randint(1, 20000))
+
+        start = time.perf_counter()
+        cycles = detector.update(touched)
+        elapsed += time.perf_counter() - start
+        n_cycles += len(cycles)
+        for cycle in cycles:
+            profit += detector.execute(cycle)
+        if cycles:
+            detector.update([pool for cycle in cycles for pool in detector.get_pools(cycle)])
+    print(">>> 1000 blocks: {} cycles, {:.3f}ms per update, profit {} ETH".format(n_cycles, elapsed, profit))
@@ -0,0 +1,212 @@
+import os
+import json
+import pickle
+import bisect
+
+import numpy as np
+
+from uniswap import Uniswap
+
+
+EVENTS = ['ETH_to_ERC20', 'ETH_to_ERC20_exact', 'ERC20_to_ETH', 'ERC20_to_ETH_exact',
+          'join', 'out', 'update_fee', 'burn']  # op code = index
+EVENT_DTYPE = np.dtype([('op', 'u1'), ('bool_fee', 'u1'), ('address', '<u4'),
+                        ('amount_0', '<i8'), ('amount_1', '<i8'), ('fee', '<f8')])  # 30 bytes per event
+OPS = {event: op for op, event in enumerate(EVENTS)}
+BUFFER_SIZE = 65536
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+SKIP_STATE = ('event_log', 'recorder', '_journal', 'ledger', 'metrics', '_quotes', '_quotes_version')  # attributes not stored in checkpoints
+
+
+class EventLog:  # append-only binary log of one pool's state-changing calls, with checkpoints
+    def __init__(self, path, checkpoint_interval=100000):
+        self.path, self.checkpoint_interval = path, checkpoint_interval
+        os.makedirs(os.path.join(path, 'checkpoints'), exist_ok=True)
+
+        self.addresses = self._load_addresses()
+        self.address_ids = {address: i for i, address in enumerate(self.addresses)}
+        self.overflow = self._load_overflow()  # event index -> (amount_0, amount_1) not int64 (wei, floats)
+        self.events = open(os.path.join(path, 'events.bin'), 'ab')
+        self.n_events = self.events.tell() // EVENT_DTYPE.itemsize
+        self.buffer = []  # records not yet written
+
+    def _load_addresses(self):
+        addresses_path = os.path.join(self.path, 'addresses.jsonl')
+        if not os.path.exists(addresses_path):
+            return []
+        with open(addresses_path) as f:
+            return [json.loads(line) for line in f]
+
+    def _load_overflow(self):
+        overflow_path = os.path.join(self.path, 'overflow.jsonl')
+        if not os.path.exists(overflow_path):
+            return {}
+        with open(overflow_path) as f:
+            return {index: (amount_0, amount_1) for index, amount_0, amount_1 in map(json.loads, f)}
+
+    def _address_id(self, address):  # interned, JSON-serializable addresses
+        if address not in self.address_ids:
+            with open(os.path.join(self.path, 'addresses.jsonl'), 'a') as f:
+                f.write(json.dumps(address) + '\n')
+            self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return self.address_ids[address]
+
+    """Recording"""
+
+    def attach(self, pool):  # start logging `pool`; its current state is the checkpoint at this index
+        self.checkpoint(pool)
+        pool.event_log = self
+
+    def append(self, pool, event, *args):  # called by `pool` after a successful update
+        if event == 'join':  # (address, delta_ETH, delta_ERC20)
+            record = (OPS[event], 1, self._address_id(args[0]), args[1], args[2], 0.)
+        elif event == 'out':  # (address, delta_LT)
+            record = (OPS[event], 1, self._address_id(args[0]), args[1], 0, 0.)
+        elif event == 'update_fee':  # (new_fee,)
+            record = (OPS[event], 1, 0, 0, 0, args[0])
+        elif event == 'burn':  # (delta_LT,)
+            record = (OPS[event], 1, 0, args[0], 0, 0.)
+        else:  # swaps: (amount, bool_fee)
+            record = (OPS[event], args[1], 0, args[0], 0, 0.)
+
+        amounts = record[3:5]
+        if not all(isinstance(amount, (int, np.integer)) and (INT64_MIN <= amount <= INT64_MAX) for amount in amounts):
+            with open(os.path.join(self.path, 'overflow.jsonl'), 'a') as f:  # exact, next to the zeroed record
+                f.write(json.dumps([self.n_events, *amounts]) + '\n')
+            self.overflow[self.n_events] = amounts
+            record = record[:3] + (0, 0) + record[5:]
+
+        self.buffer.append(record)
+        self.n_events += 1
+        if len(self.buffer) == BUFFER_SIZE:
+            self.flush()
+        if self.n_events % self.checkpoint_interval == 0:
+            self.checkpoint(pool)
+
+    def checkpoint(self, pool):
+        self.flush()
+        state = {key: value for key, value in vars(pool).items() if key not in SKIP_STATE}
+        with open(os.path.join(self.path, 'checkpoints', '{}.pkl'.format(self.n_events)), 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def truncate(self, n_events):  # drop every event after the first `n_events`, with their checkpoints
+        if n_events > self.n_events:
+            raise Exception("invalid n_events {}. {} events".format(n_events, self.n_events))
+        n_written = self.n_events - len(self.buffer)
+        if n_events >= n_written:
+            del self.buffer[n_events - n_written:]
+        else:
+            self.buffer = []
+            self.events.truncate(n_events * EVENT_DTYPE.itemsize)
+            self.events.seek(0, os.SEEK_END)
+        self.n_events = n_events
+
+        if any(index >= n_events for index in self.overflow):
+            self.overflow = {index: amounts for index, amounts in self.overflow.items() if index < n_events}
+            with open(os.path.join(self.path, 'overflow.jsonl'), 'w') as f:
+                f.writelines(json.dumps([index, *amounts]) + '\n' for index, amounts in self.overflow.items())
+        for checkpoint in self.get_checkpoints():
+            if checkpoint > n_events:
+                os.remove(os.path.join(self.path, 'checkpoints', '{}.pkl'.format(checkpoint)))
+
+    def flush(self):
+        buffer, self.buffer = self.buffer, []  # not retried: a failed write drops its events
+        try:
+            self.events.write(np.array(buffer, dtype=EVENT_DTYPE).tobytes())
+            self.events.flush()
+        except Exception:
+            self.n_events = self.events.tell() // EVENT_DTYPE.itemsize
+            raise
+
+    def close(self):
+        self.flush()
+        self.events.close()
+
+    """Replaying"""
+
+    def get_checkpoints(self):
+        return sorted(int(name[:-len('.pkl')]) for name in os.listdir(os.path.join(self.path, 'checkpoints')))
+
+    def get_events(self):  # memory-mapped records
+        self.flush()
+        if self.n_events == 0:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        return np.memmap(os.path.join(self.path, 'events.bin'), dtype=EVENT_DTYPE, mode='r', shape=(self.n_events,))
+
+    def state_at(self, index):
+        """
+        New Uniswap in the state after the first `index` events: the nearest
+        checkpoint at or before `index`, plus at most one interval of events.
+        """
+        checkpoints = self.get_checkpoints()
+        i = bisect.bisect_right(checkpoints, index) - 1
+        if (i < 0) or (index > self.n_events):
+            raise Exception("invalid index {}. {} events, checkpoints from {}".format(
+                index, self.n_events, checkpoints[:1]))
+
+        pool = Uniswap.__new__(Uniswap)
+        with open(os.path.join(self.path, 'checkpoints', '{}.pkl'.format(checkpoints[i])), 'rb') as f:
+            pool.__dict__.update(pickle.load(f))
+        pool._journal, pool.recorder, pool.event_log, pool.ledger, pool.metrics = None, None, None, None, None
+        pool._quotes, pool._quotes_version = None, None
+
+        overflow = self.overflow
+        for j, record in enumerate(self.get_events()[checkpoints[i]:index].tolist(), checkpoints[i]):
+            op, bool_fee, address, amount_0, amount_1, fee = record
+            if overflow and (j in overflow):
+                amount_0, amount_1 = overflow[j]
+            event = EVENTS[op]
+            if event == 'join':
+                pool.join(self.addresses[address], amount_0, amount_1)
+            elif event == 'out':
+                pool.out(self.addresses[address], amount_0)
+            elif event == 'update_fee':
+                pool.update_fee(fee)
+            elif event == 'burn':
+                pool.burn(amount_0)
+            else:
+                getattr(pool, event)(amount_0, bool_fee=bool(bool_fee))
+        return pool
+
+    def __len__(self):
+        return self.n_events
+
+    def __deepcopy__(self, memo):  # a copied pool is not logged
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    random.seed(12345)
+
+    """init"""
+    us = Uniswap('-1', 100000, 20000000, 1000000)  # 1:200
+    log = EventLog(tempfile.mkdtemp(), checkpoint_interval=100000)  # one log per pool
+    log.attach(us)
+
+    """Txs"""
+    us.join('0', 2000, 400001)
+    for _ in range(1000000):
+        if random.random() < 0.5:
+            us.ETH_to_ERC20(2)
+        else:
+            us.ERC20_to_ETH_exact(2)
+    us.out('0', 20000)
+    us.print_pool_state(bool_LT=True)
+
+    """Jump to an arbitrary transaction"""
+    start = time.perf_counter()
+    pool = log.state_at(len(log))
+    print(">>> state at {} in {:.3f}s".format(len(log), time.perf_counter() - start))
+    pool.print_pool_state(bool_LT=True)
+    log.close()
@@ -0,0 +1,118 @@
+from uniswap import Uniswap
+
+
+class Exchange:  # factory of ETH/ERC20 pools, keyed by token
+    def __init__(self):
+        self.token_to_pool = {}
+        self.pool_to_token = {}  # id(pool) -> token
+
+    def __len__(self):
+        return len(self.token_to_pool)
+
+    def __contains__(self, token):
+        return token in self.token_to_pool
+
+    def create_pool(self, token, address, amount_ETH, amount_ERC20, init_LT, fee=0.003, bool_int=False):
+        # Validity check
+        if token in self.token_to_pool:
+            raise Exception("pool already exists for token {}".format(token))
+
+        pool = Uniswap(address, amount_ETH, amount_ERC20, init_LT, fee=fee, bool_int=bool_int)
+        self.add_pool(token, pool)
+        return pool
+
+    def add_pool(self, token, pool):
+        if token in self.token_to_pool:
+            raise Exception("pool already exists for token {}".format(token))
+
+        self.token_to_pool[token] = pool
+        self.pool_to_token[id(pool)] = token
+
+    def get_pool(self, token):
+        if token not in self.token_to_pool:
+            raise Exception("invalid token {}".format(token))
+        return self.token_to_pool[token]
+
+    def get_token(self, pool):
+        if id(pool) not in self.pool_to_token:
+            raise Exception("invalid pool")
+        return self.pool_to_token[id(pool)]
+
+    def _get_route(self, token_in, token_out):
+        if token_in == token_out:
+            raise Exception("invalid route. {} -> {}".format(token_in, token_out))
+        return self.get_pool(token_in), self.get_pool(token_out)
+
+    """Swap Protocol (ERC20 -> ETH -> ERC20)"""
+
+    def ERC20_to_ERC20(self, token_in, token_out, delta_ERC20_in,
+                       min_ERC20_out=None, bool_fee=True, bool_update=True):  # tokenToTokenSwapInput
+        pool_in, pool_out = self._get_route(token_in, token_out)
+
+        quote_in = pool_in.quote('ERC20_to_ETH', delta_ERC20_in, bool_fee=bool_fee)
+        quote_out = pool_out.quote('ETH_to_ERC20', quote_in.amount_out, bool_fee=bool_fee)
+        delta_ERC20_out = quote_out.amount_out
+
+        # Slippage check
+        if (min_ERC20_out is not None) and (delta_ERC20_out < min_ERC20_out):
+            raise Exception("invalid delta_ERC20_out. {} < {}".format(delta_ERC20_out, min_ERC20_out))
+
+        if bool_update:  # both pools or neither; through `execute`, so the pools' hooks see each hop
+            pool_in.execute(quote_in)
+            # views of one PoolBank share its version: re-quoted (at the same price) after the first hop
+            pool_out.execute(pool_out.quote('ETH_to_ERC20', quote_in.amount_out, bool_fee=bool_fee))
+        return delta_ERC20_out
+
+    def ERC20_to_ERC20_exact(self, token_in, token_out, delta_ERC20_out,
+                             max_ERC20_in=None, bool_fee=True, bool_update=True):  # tokenToTokenSwapOutput
+        pool_in, pool_out = self._get_route(token_in, token_out)
+
+        quote_out = pool_out.quote('ETH_to_ERC20_exact', delta_ERC20_out, bool_fee=bool_fee)
+        quote_in = pool_in.quote('ERC20_to_ETH_exact', quote_out.amount_in, bool_fee=bool_fee)
+        delta_ERC20_in = quote_in.amount_in
+
+        # Slippage check
+        if (max_ERC20_in is not None) and (delta_ERC20_in > max_ERC20_in):
+            raise Exception("invalid delta_ERC20_in. {} > {}".format(delta_ERC20_in, max_ERC20_in))
+
+        if bool_update:  # both pools or neither
+            pool_in.execute(quote_in)
+            pool_out.execute(pool_out.quote('ETH_to_ERC20_exact', delta_ERC20_out, bool_fee=bool_fee))
+        return delta_ERC20_in
+
+    """Logging"""
+
+    def print_exchange_state(self):
+        print("token\t\tETH\t\tERC20\t\tk\t\tLT")
+        for token, pool in self.token_to_pool.items():
+            print("{}\t\t{}\t\t{}\t{}\t{}".format(
+                token, pool.ETH, pool.ERC20, pool.k, pool.LT))
+        print('\n')
+
+
+if __name__ == "__main__":
+    from pool_bank import PoolBank
+
+    exchange = Exchange()
+
+    """init"""
+    exchange.create_pool('DAI', '-1', 100000, 20000000, 1000000)  # 1:200
+    exchange.create_pool('MKR', '-1', 100000, 500000, 1000000)  # 1:5
+    exchange.print_exchange_state()
+
+    """Txs"""
+    print(exchange.ERC20_to_ERC20('DAI', 'MKR', 4000))  # MKR out for 4000 DAI in
+    print(exchange.ERC20_to_ERC20_exact('MKR', 'DAI', 4000))  # MKR in for 4000 DAI out
+    exchange.print_exchange_state()
+
+    """Pools of one PoolBank: both hops commit"""
+    bank = PoolBank([100000, 100000], [20000000, 500000], [1000000, 1000000])
+    banked = Exchange()
+    banked.add_pool('DAI', bank[0])
+    banked.add_pool('MKR', bank[1])
+    delta_MKR = banked.ERC20_to_ERC20('DAI', 'MKR', 4000)
+    delta_DAI = banked.ERC20_to_ERC20_exact('MKR', 'DAI', 4000)
+    assert [(pool.ETH, pool.ERC20) for pool in banked.token_to_pool.values()] == \
+        [(pool.ETH, pool.ERC20) for pool in exchange.token_to_pool.values()]
+    print(delta_MKR, delta_DAI)
+    banked.print_exchange_state()
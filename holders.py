@@ -0,0 +1,352 @@
+import heapq
+import sys
+
+import numpy as np
+
+
+INT64_MAX, INT32_MAX = 2 ** 63 - 1, 2 ** 31 - 1
+EMPTY = -1  # slot of no holder
+ABSENT = -2 ** 63  # balance of no holder, by id
+DENSE = 4  # ids per holder, at most, for balances by id
+HASH = 0x9E3779B1  # odd: id -> slot is one-to-one over any power-of-two capacity
+MISSING = object()
+
+
+class AddressTable:  # address -> dense int id, append-only; one table can back the holders of many pools
+    def __init__(self):
+        self.ids = {}
+        self.addresses = []  # id -> address
+
+    def intern(self, address):
+        i = self.ids.get(address)
+        if i is None:
+            i = self.ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return i
+
+    def intern_many(self, addresses):  # int64 array of ids
+        return np.fromiter((self.intern(address) for address in addresses), dtype=np.int64)
+
+    def get(self, address):  # id, or None if never interned
+        return self.ids.get(address)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def nbytes(self):  # bytes of the index and its ids (the addresses themselves are the caller's)
+        return sys.getsizeof(self.ids) + sum(map(sys.getsizeof, self.ids.values())) + sys.getsizeof(self.addresses)
+
+    def __deepcopy__(self, memo):  # shared by copies: ids never change once given
+        return self
+
+
+class HolderBalances:
+    """
+    LT balances of one pool, with the dict interface `Uniswap` uses for
+    `LT_holders`, over the int ids of an AddressTable. While the pool holds
+    at least 1 in DENSE of the ids up to its last, the balances are one int64
+    array indexed by id, 8 bytes an id; a sparser pool turns to an
+    open-addressing table (linear probing) of int32 ids and int64 balances,
+    12 bytes a slot. A dict costs ~26 bytes an entry plus an int object per
+    balance. Balances are kept as given: zero is a holder; a float or an int
+    beyond int64 turns the balances to Python objects, in the table. Iterates
+    in id order.
+    """
+    def __init__(self, table=None, capacity=8):
+        self.table = AddressTable() if table is None else table
+        self._table_ids = self.table.ids  # address -> id, never replaced
+        self.bool_object = False  # balances beyond int64 (or not ints)
+        self.bool_dense = True  # balances by id; else the open-addressing table
+        self.n = 0  # holders
+        self.slot_ids, self.slot_LTs = None, np.full(capacity, ABSENT, dtype=np.int64)
+        self._views()
+
+    def _views(self):  # memoryviews: scalar reads and writes at list speed
+        self._ids = None if self.slot_ids is None else memoryview(self.slot_ids)
+        self._LTs = self.slot_LTs if self.bool_object else memoryview(self.slot_LTs)
+
+    def _grow(self, i):  # balances by id up to `i`, or the table if that is too sparse
+        size = max(i + 1, 3 * len(self.slot_LTs) // 2)
+        if size > DENSE * self.n + 64:
+            self._to_table()
+            return
+        LTs = np.full(size, ABSENT, dtype=np.int64)
+        LTs[:len(self.slot_LTs)] = self.slot_LTs
+        self.slot_LTs = LTs
+        self._views()
+
+    def _to_table(self):
+        ids = np.flatnonzero(self.slot_LTs != ABSENT)
+        LTs = self.slot_LTs[ids]
+        capacity = 8
+        while 3 * capacity // 4 <= self.n:  # room for one more
+            capacity *= 2
+        self.bool_dense = False
+        self._allocate(capacity)
+        self._place(ids, LTs)
+
+    """Open-addressing table"""
+
+    def _allocate(self, capacity):  # empty table of `capacity` (a power of 2) slots
+        self.slot_ids = np.full(capacity, EMPTY, dtype=np.int32)
+        self.slot_LTs = np.zeros(capacity, dtype=object if self.bool_object else np.int64)
+        self.mask, self.max_n = capacity - 1, 3 * capacity // 4  # load up to 3/4
+        self._views()
+
+    def _slot(self, i):  # slot of id `i`, or the empty slot it would take; odd multiplier: dense ids spread evenly
+        keys, mask = self._ids, self.mask
+        s = (i * HASH) & mask
+        while True:
+            key = keys[s]
+            if (key == i) or (key < 0):
+                return s
+            s = (s + 1) & mask
+
+    def _place(self, ids, values):  # into an empty table
+        homes = (ids.astype(np.int64) * HASH) & self.mask
+        order = np.argsort(homes, kind='stable')
+        ids, values, homes = ids[order], values[order], homes[order]
+        slots = np.arange(len(ids)) + np.maximum.accumulate(homes - np.arange(len(ids)))  # next free slot
+        if len(slots) and (slots[-1] > self.mask):  # probes wrap around: one at a time
+            for i, LT in zip(ids.tolist(), values.tolist()):
+                s = self._slot(i)
+                self._ids[s], self._LTs[s] = i, LT
+        else:
+            self.slot_ids[slots], self.slot_LTs[slots] = ids, values
+
+    def _resize(self, capacity):
+        live = self.slot_ids != EMPTY
+        ids, values = self.slot_ids[live], self.slot_LTs[live]
+        self._allocate(capacity)
+        self._place(ids, values)
+
+    def _to_object(self):
+        if self.bool_dense:
+            self._to_table()
+        self.bool_object = True
+        self.slot_LTs = self.slot_LTs.astype(object)
+        self._views()
+
+    """dict interface"""
+
+    def get(self, address, default=None):
+        i = self._table_ids.get(address)
+        if i is None:
+            return default
+        if self.bool_dense:
+            LTs = self._LTs
+            if i < len(LTs):
+                LT = LTs[i]
+                if LT != -0x8000000000000000:  # ABSENT
+                    return LT
+            return default
+
+        ids, mask = self._ids, self.mask
+        s = (i * HASH) & mask
+        while True:  # `_slot`, inlined
+            key = ids[s]
+            if key == i:
+                return self._LTs[s]
+            if key < 0:  # EMPTY
+                return default
+            s = (s + 1) & mask
+
+    def __getitem__(self, address):
+        LT = self.get(address, MISSING)
+        if LT is MISSING:
+            raise KeyError(address)
+        return LT
+
+    def __contains__(self, address):
+        return self.get(address, MISSING) is not MISSING
+
+    def __setitem__(self, address, LT):
+        if not (self.bool_object or ((type(LT) is int) and (-0x7FFFFFFFFFFFFFFF <= LT <= 0x7FFFFFFFFFFFFFFF))):  # int64
+            if not (isinstance(LT, np.integer) and (LT.dtype.kind in 'iu') and (-INT64_MAX <= LT <= INT64_MAX)):
+                self._to_object()
+        i = self._table_ids.get(address)
+        if i is None:
+            i = self.table.intern(address)
+            if i > INT32_MAX:
+                raise Exception("invalid address id {}. over int32".format(i))
+
+        if self.bool_dense:
+            if i >= len(self._LTs):
+                self._grow(i)
+            if self.bool_dense:
+                LTs = self._LTs
+                if LTs[i] == -0x8000000000000000:  # ABSENT
+                    self.n += 1
+                LTs[i] = LT
+                return
+
+        ids, mask = self._ids, self.mask
+        s = (i * HASH) & mask
+        while True:  # `_slot`, inlined
+            key = ids[s]
+            if key == i:
+                self._LTs[s] = LT
+                return
+            if key < 0:  # EMPTY
+                break
+            s = (s + 1) & mask
+
+        if self.n >= self.max_n:
+            self._resize(2 * len(ids))
+            s = self._slot(i)
+        self._ids[s], self._LTs[s] = i, LT
+        self.n += 1
+
+    def __delitem__(self, address):
+        i = self._table_ids.get(address)
+        if i is None:
+            raise KeyError(address)
+        if self.bool_dense:
+            LTs = self._LTs
+            if (i >= len(LTs)) or (LTs[i] == -0x8000000000000000):  # ABSENT
+                raise KeyError(address)
+            LTs[i] = -0x8000000000000000
+            self.n -= 1
+            return
+
+        ids, LTs, mask = self._ids, self._LTs, self.mask
+        s = (i * HASH) & mask
+        while True:  # `_slot`, inlined
+            key = ids[s]
+            if key == i:
+                break
+            if key < 0:  # EMPTY
+                raise KeyError(address)
+            s = (s + 1) & mask
+
+        # backward-shift deletion: no tombstones, probes stay short
+        j, k = s, s
+        while True:
+            k = (k + 1) & mask
+            key = ids[k]
+            if key < 0:  # EMPTY
+                break
+            home = (key * HASH) & mask
+            if ((k - home) & mask) >= ((k - j) & mask):  # `j` is on the probe path of `key`
+                ids[j], LTs[j] = key, LTs[k]
+                j = k
+        ids[j], LTs[j] = EMPTY, 0
+        self.n -= 1
+
+    def pop(self, address, *default):
+        LT = self.get(address, MISSING)
+        if LT is MISSING:
+            if default:
+                return default[0]
+            raise KeyError(address)
+        del self[address]
+        return LT
+
+    def __len__(self):
+        return self.n
+
+    def _holders(self):  # ids of the holders, ascending, and their balances
+        if self.bool_dense:
+            ids = np.flatnonzero(self.slot_LTs != ABSENT)
+            return ids, self.slot_LTs[ids]
+        slots = np.flatnonzero(self.slot_ids != EMPTY)
+        slots = slots[np.argsort(self.slot_ids[slots], kind='stable')]
+        return self.slot_ids[slots].astype(np.int64), self.slot_LTs[slots]
+
+    def __iter__(self):
+        addresses = self.table.addresses
+        return (addresses[i] for i in self._holders()[0].tolist())
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return self._holders()[1].tolist()
+
+    def items(self):
+        addresses, (ids, LTs) = self.table.addresses, self._holders()
+        return [(addresses[i], LT) for i, LT in zip(ids.tolist(), LTs.tolist())]
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __getstate__(self):  # memoryviews are not copied or pickled
+        return {key: value for key, value in vars(self).items() if key not in ('_ids', '_LTs')}
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._views()
+
+    """Bulk queries"""
+
+    def ids(self):  # ids of the holders, ascending
+        return self._holders()[0]
+
+    def total(self):  # sum of every balance: the pool's LT
+        return sum(self._holders()[1].tolist())
+
+    def top(self, n):  # the `n` largest holders, [(address, LT)], largest first
+        ids, LTs = self._holders()
+        if n < len(ids):
+            if self.bool_object:
+                idx = np.array(heapq.nlargest(n, range(len(LTs)), key=LTs.__getitem__), dtype=np.int64)
+            else:
+                idx = np.argpartition(-LTs, n - 1)[:n]
+            ids, LTs = ids[idx], LTs[idx]
+        order = np.argsort(-LTs, kind='stable')
+        addresses = self.table.addresses
+        return [(addresses[i], LT) for i, LT in zip(ids[order].tolist(), LTs[order].tolist())]
+
+    def nbytes(self):  # bytes of the arrays, and of the balances as objects
+        size = self.slot_LTs.nbytes + (0 if self.slot_ids is None else self.slot_ids.nbytes)
+        if self.bool_object:
+            size += sum(map(sys.getsizeof, self.slot_LTs.tolist()))
+        return size
+
+
+if __name__ == "__main__":
+    import time
+    import random
+
+    from uniswap import Uniswap
+
+    random.seed(12345)
+
+    def size_plain(pools):  # bytes of the holder dicts and their balances (addresses are shared by both stores)
+        return sum(sys.getsizeof(pool.LT_holders) + sum(map(sys.getsizeof, pool.LT_holders.values())) for pool in pools)
+
+    def size_interned(pools, table):
+        return table.nbytes() + sum(pool.LT_holders.nbytes() for pool in pools)
+
+    """init: 4 pools, the same 250000 LPs in each, with their own balances"""
+    n, n_pools = 250000, 4
+    addresses = ['0x{:040x}'.format(random.getrandbits(160)) for _ in range(n)]
+    amounts = [[random.randint(1000, 100000) for _ in range(n)] for _ in range(n_pools)]
+
+    for table in (None, AddressTable()):
+        name = "dict" if table is None else "interned"
+        pools = [Uniswap('-1', 1000000, 200000000, 1000000, address_table=table) for _ in range(n_pools)]
+
+        start = time.perf_counter()
+        for pool, pool_amounts in zip(pools, amounts):
+            for address, amount in zip(addresses, pool_amounts):
+                pool.join(address, amount, pool.required_ERC20_for_liquidity(amount))
+        print(">>> {}: {} joins in {:.3f}s".format(name, n_pools * n, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for address in addresses[:n // 2]:
+            pools[0].out(address, pools[0].LT_holders[address])
+        print(">>> {}: {} outs in {:.3f}s".format(name, n // 2, time.perf_counter() - start))
+
+        size = size_plain(pools) if table is None else size_interned(pools, table)
+        print(">>> {}: holders of {} pools in {:.1f}MB".format(name, n_pools, size / 2 ** 20))
+
+    holders = pools[0].LT_holders
+    print(">>> table: {} addresses; pool 0: {} holders, {} LT (pool: {})".format(
+        len(table), len(holders), holders.total(), pools[0].LT))
+
+    start = time.perf_counter()
+    print(">>> top 3: {} in {:.3f}s".format(holders.top(3), time.perf_counter() - start))
@@ -0,0 +1,186 @@
+import os
+import csv
+import json
+import itertools
+
+from uniswap import Uniswap
+
+
+"""
+Exported Uniswap v1 exchange events, one row per event in chain order:
+
+    event           TokenPurchase | EthPurchase | AddLiquidity | RemoveLiquidity
+    address         buyer / provider
+    eth_amount      eth_sold | eth_bought | eth_amount | eth_amount    [wei]
+    token_amount    tokens_bought | tokens_sold | token_amount | token_amount
+    eth_reserve     (optional) exchange ETH balance after the event
+    token_reserve   (optional) exchange token balance after the event
+
+Other columns (block_number, log_index, ...) are ignored; `columns` maps
+different header names onto these.
+"""
+FIELDS = ('event', 'address', 'eth_amount', 'token_amount', 'eth_reserve', 'token_reserve')
+INT_FIELDS = ('eth_amount', 'token_amount', 'eth_reserve', 'token_reserve')
+
+
+def _chunks(rows, chunk_size):
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_rows(path):
+    with open(path, newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def _jsonl_rows(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parquet_chunks(path, chunk_size):
+    try:  # optional
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("reading {} requires pyarrow".format(path))
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def load_events(path, fmt=None, chunk_size=65536, columns=None):
+    """Stream normalized event dicts from a CSV / JSONL / Parquet file, `chunk_size` rows at a time."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'csv':
+        chunks = _chunks(_csv_rows(path), chunk_size)
+    elif fmt in ('jsonl', 'json', 'ndjson'):
+        chunks = _chunks(_jsonl_rows(path), chunk_size)
+    elif fmt == 'parquet':
+        chunks = _parquet_chunks(path, chunk_size)
+    else:
+        raise Exception("invalid format {}".format(fmt))
+
+    renames = {source: field for field, source in (columns or {}).items()}
+    for chunk in chunks:
+        events = []
+        for row in chunk:
+            if renames:
+                row = {renames.get(key, key): value for key, value in row.items()}
+            event = {field: row.get(field) for field in FIELDS}
+            for field in INT_FIELDS:
+                if event[field] not in (None, ''):
+                    event[field] = int(event[field])
+                else:
+                    event[field] = None
+            events.append(event)
+        yield events
+
+
+def _swap(pool, direction, amount_in, amount_out):  # returns the output amount
+    # v1 logs input- and output-priced swaps alike: take the variant that reproduces both amounts
+    quote = pool.quote(direction, amount_in)
+    if quote.amount_out != amount_out:
+        try:
+            exact = pool.quote(direction + '_exact', amount_out)
+        except Exception:  # amount_out beyond the reserve: a mismatch either way
+            exact = None
+        if (exact is not None) and (exact.amount_in == amount_in):
+            quote = exact
+    pool.execute(quote)
+    return quote.amount_out
+
+
+def apply_event(pool, event):  # drive `pool` with one event; returns the pool's output amount
+    name = event['event']
+    if name == 'TokenPurchase':
+        return _swap(pool, 'ETH_to_ERC20', event['eth_amount'], event['token_amount'])
+    elif name == 'EthPurchase':
+        return _swap(pool, 'ERC20_to_ETH', event['token_amount'], event['eth_amount'])
+    elif name == 'AddLiquidity':
+        return pool.join(event['address'], event['eth_amount'], event['token_amount'])
+    elif name == 'RemoveLiquidity':
+        # the event has no LT amount: the smallest LT that burns both amounts
+        delta_LT = max(-(-event['eth_amount'] * pool.LT // pool.ETH),
+                       -(-event['token_amount'] * pool.LT // pool.ERC20))
+        if event['address'] in pool.LT_holders:
+            return pool.out(event['address'], delta_LT)
+        return pool.burn(delta_LT)  # provider's LT predates the export
+    raise Exception("invalid event {}".format(name))
+
+
+def _expected(event):
+    name = event['event']
+    if name == 'TokenPurchase':
+        return event['token_amount']
+    elif name == 'EthPurchase':
+        return event['eth_amount']
+    elif name == 'RemoveLiquidity':
+        return event['eth_amount'], event['token_amount']
+    return None
+
+
+def ingest(path, pool=None, fmt=None, chunk_size=65536, columns=None, bool_strict=True, fee=0.003):
+    """
+    Replay exported events into `pool` (created by the first AddLiquidity if None,
+    in integer mode as on-chain). Swap outputs and, when present, recorded
+    reserves are validated; a mismatch raises if `bool_strict`, else is counted.
+    Returns (pool, stats).
+    """
+    stats = {'events': 0, 'mismatches': 0, 'first_mismatch': None}
+
+    for events in load_events(path, fmt=fmt, chunk_size=chunk_size, columns=columns):
+        for event in events:
+            if pool is None:
+                if event['event'] != 'AddLiquidity':
+                    raise Exception("invalid first event {}. pool required".format(event['event']))
+                pool = Uniswap(event['address'], event['eth_amount'], event['token_amount'],
+                               event['eth_amount'], fee=fee, bool_int=True)  # v1: initial LT = ETH
+                output = None
+            else:
+                output = apply_event(pool, event)
+
+            # Validity check
+            expected = _expected(event)
+            bool_mismatch = (expected is not None) and (output != expected)
+            if event['eth_reserve'] is not None:
+                bool_mismatch |= pool.ETH != event['eth_reserve']
+            if event['token_reserve'] is not None:
+                bool_mismatch |= pool.ERC20 != event['token_reserve']
+            if bool_mismatch:
+                if bool_strict:
+                    raise Exception("invalid state after event {}: {}. pool ETH: {}, ERC20: {}, output: {}".format(
+                        stats['events'], event, pool.ETH, pool.ERC20, output))
+                stats['mismatches'] += 1
+                if stats['first_mismatch'] is None:
+                    stats['first_mismatch'] = stats['events']
+
+            stats[event['event']] = stats.get(event['event'], 0) + 1
+            stats['events'] += 1
+
+    return pool, stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path')  # exported events (.csv / .jsonl / .parquet)
+    parser.add_argument('--format')
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    parser.add_argument('--no-strict', action='store_true')  # count mismatches instead of raising
+    args = parser.parse_args()
+    print(args)
+
+    start = time.perf_counter()
+    pool, stats = ingest(args.path, fmt=args.format, chunk_size=args.chunk_size, bool_strict=not args.no_strict)
+    elapsed = time.perf_counter() - start
+    print(">>> {} events in {:.3f}s ({:.0f} events/s)".format(stats['events'], elapsed, stats['events'] / elapsed))
+    counts = {key: value for key, value in stats.items() if key != 'events'}
+    print(counts)
+    pool.print_pool_state()
@@ -0,0 +1,307 @@
+from bisect import bisect_right, insort
+from math import floor, ceil, sqrt, log
+
+from uniswap import Uniswap
+
+
+"""
+Pricing of a pool, pluggable via `Uniswap(..., invariant=...)`. `bool_ETH_in` is
+the swap direction; amounts are rounded as `Uniswap` does (outputs floored,
+inputs floored + 1) and the fee is taken on the input. `invariant=None` is the
+inlined x * y = k of `Uniswap`, the same math as `ConstantProduct`.
+"""
+
+
+class Invariant:
+    bool_proportional = True  # `join` / `out` as pro-rata shares of the reserves
+
+    def get_input_price(self, pool, delta_in, bool_ETH_in, bool_fee=True):
+        raise NotImplementedError
+
+    def get_output_price(self, pool, delta_out, bool_ETH_in, bool_fee=True):
+        raise NotImplementedError
+
+    def on_swap(self, pool, delta_in, delta_out, bool_ETH_in, bool_fee=True):  # state beyond the reserves
+        pass
+
+    def get_state(self):  # journaled by `Uniswap.snapshot`
+        return None
+
+    def set_state(self, state):
+        pass
+
+    @staticmethod
+    def _sides(pool, bool_ETH_in):  # (X, Y): reserves of the input and the output token
+        return (pool.ETH, pool.ERC20) if bool_ETH_in else (pool.ERC20, pool.ETH)
+
+
+class ConstantProduct(Invariant):  # x * y = k, the v1 pricing
+    def get_input_price(self, pool, delta_in, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        return Uniswap._get_input_price(pool, delta_in, X, Y, bool_fee=bool_fee)
+
+    def get_output_price(self, pool, delta_out, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        return Uniswap._get_output_price(pool, delta_out, Y, X, bool_fee=bool_fee)
+
+
+class Weighted(Invariant):  # Balancer: X ** w_X * Y ** w_Y = k
+    def __init__(self, weight_ETH=0.5):
+        if not 0. < weight_ETH < 1.:
+            raise Exception("invalid weight_ETH {}".format(weight_ETH))
+        self.weight_ETH = weight_ETH
+
+    def _exponent(self, bool_ETH_in):  # w_X / w_Y
+        return self.weight_ETH / (1. - self.weight_ETH) if bool_ETH_in else (1. - self.weight_ETH) / self.weight_ETH
+
+    def get_input_price(self, pool, delta_in, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        delta_out = floor(Y * (1. - (X / (X + delta_in * gamma)) ** self._exponent(bool_ETH_in)))
+        if delta_out >= Y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, Y))
+        return delta_out
+
+    def get_output_price(self, pool, delta_out, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        if delta_out >= Y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, Y))
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        return floor(X * ((Y / (Y - delta_out)) ** (1. / self._exponent(bool_ETH_in)) - 1.) / gamma) + 1
+
+
+class StableSwap(Invariant):  # Curve, 2 coins; ETH is scaled by `rate` onto the ERC20 peg
+    def __init__(self, A=100, rate=1.):
+        self.A, self.rate = A, rate  # amplification, target ERC20 / ETH
+
+    def _get_D(self, x, y):
+        Ann, S = self.A * 4, x + y
+        D = S
+        for _ in range(255):
+            D_P = D * D / (2 * x) * D / (2 * y)
+            D_prev = D
+            D = (Ann * S + 2 * D_P) * D / ((Ann - 1) * D + 3 * D_P)
+            if abs(D - D_prev) <= 1e-12 * D:
+                break
+        return D
+
+    def _get_y(self, x, D):  # the other balance, given one
+        Ann = self.A * 4
+        c = D * D / (2 * x) * D / (2 * Ann)
+        b = x + D / Ann
+        y = D
+        for _ in range(255):
+            y_prev = y
+            y = (y * y + c) / (2 * y + b - D)
+            if abs(y - y_prev) <= 1e-12 * y:
+                break
+        return y
+
+    def _scaled(self, pool, bool_ETH_in):  # (x, y, rate_x, rate_y) on the peg
+        X, Y = self._sides(pool, bool_ETH_in)
+        rate_X, rate_Y = (self.rate, 1.) if bool_ETH_in else (1., self.rate)
+        return X * rate_X, Y * rate_Y, rate_X, rate_Y
+
+    def get_input_price(self, pool, delta_in, bool_ETH_in, bool_fee=True):
+        x, y, rate_X, rate_Y = self._scaled(pool, bool_ETH_in)
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        y_prime = self._get_y(x + delta_in * gamma * rate_X, self._get_D(x, y))
+        delta_out = max(0, floor((y - y_prime) / rate_Y))
+        if delta_out >= y / rate_Y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, y / rate_Y))
+        return delta_out
+
+    def get_output_price(self, pool, delta_out, bool_ETH_in, bool_fee=True):
+        x, y, rate_X, rate_Y = self._scaled(pool, bool_ETH_in)
+        if delta_out * rate_Y >= y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, y / rate_Y))
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        x_prime = self._get_y(y - delta_out * rate_Y, self._get_D(x, y))
+        return floor((x_prime - x) / rate_X / gamma) + 1
+
+
+"""Concentrated liquidity"""
+
+TICK_BASE = 1.0001  # price of tick i = TICK_BASE ** i, in ERC20 / ETH
+
+
+def sqrt_price_at(tick):
+    return TICK_BASE ** (tick / 2.)
+
+
+def tick_at(price):
+    return floor(log(price) / log(TICK_BASE))
+
+
+class ConcentratedLiquidity(Invariant):
+    """
+    Tick-indexed ranges (v3 style) of virtual liquidity L = sqrt(ETH * ERC20).
+    The initialized ticks are kept sorted, so a swap finds each next boundary by
+    bisection and costs O(log ticks) per crossed tick instead of a scan. The fee
+    stays in the pool's reserves rather than being credited to the ranges.
+    """
+    bool_proportional = False  # liquidity is added by range, see `add_position`
+
+    def __init__(self, price, tick_spacing=60):
+        self.tick_spacing = tick_spacing
+        self.sqrt_price = sqrt(price)
+        self.tick = tick_at(price)  # sqrt_price_at(tick) <= sqrt_price < sqrt_price_at(tick + 1)
+        self.liquidity = 0.  # active L
+        self.ticks = []  # initialized ticks, sorted
+        self.liquidity_net = {}  # tick -> L added when the price crosses it upwards
+
+    def add_position(self, tick_lower, tick_upper, liquidity):
+        """Add L on [tick_lower, tick_upper); returns the (ETH, ERC20) it requires at the current price."""
+        if (tick_lower >= tick_upper) or (tick_lower % self.tick_spacing) or (tick_upper % self.tick_spacing):
+            raise Exception("invalid range [{}, {}). tick spacing {}".format(tick_lower, tick_upper, self.tick_spacing))
+
+        for tick, delta in ((tick_lower, liquidity), (tick_upper, -liquidity)):
+            if tick not in self.liquidity_net:
+                insort(self.ticks, tick)
+                self.liquidity_net[tick] = 0.
+            self.liquidity_net[tick] += delta
+        if tick_lower <= self.tick < tick_upper:
+            self.liquidity += liquidity
+
+        sqrt_lower, sqrt_upper = sqrt_price_at(tick_lower), sqrt_price_at(tick_upper)
+        sqrt_price = min(max(self.sqrt_price, sqrt_lower), sqrt_upper)
+        return ceil(liquidity * (1. / sqrt_price - 1. / sqrt_upper)), ceil(liquidity * (sqrt_price - sqrt_lower))
+
+    def _walk(self, amount, bool_ETH_in, bool_exact_out):
+        """
+        Swap through the ranges without changing them: `amount` is the input after
+        the fee, or the output if `bool_exact_out`. Returns (amount_in, amount_out, state).
+        """
+        sqrt_price, tick, L = self.sqrt_price, self.tick, self.liquidity
+        amount_in, amount_out, remaining = 0., 0., float(amount)
+
+        if bool_ETH_in:  # price goes down, crossing the next initialized tick at or below `tick`
+            i = bisect_right(self.ticks, tick) - 1
+            while remaining > 0.:
+                if i < 0:
+                    raise Exception("invalid delta_Y. insufficient liquidity below tick {}".format(tick))
+                target = self.ticks[i]
+                sqrt_target = sqrt_price_at(target)
+                max_in, max_out = L * (1. / sqrt_target - 1. / sqrt_price), L * (sqrt_price - sqrt_target)
+
+                if (max_out if bool_exact_out else max_in) > remaining:  # stops inside [target, tick]
+                    if bool_exact_out:
+                        sqrt_prime = sqrt_price - remaining / L
+                        amount_in += L * (1. / sqrt_prime - 1. / sqrt_price)
+                        amount_out += remaining
+                    else:
+                        sqrt_prime = 1. / (1. / sqrt_price + remaining / L)
+                        amount_in += remaining
+                        amount_out += L * (sqrt_price - sqrt_prime)
+                    sqrt_price, remaining = sqrt_prime, 0.
+                    tick = min(max(tick_at(sqrt_price * sqrt_price), target), tick)
+                    break
+
+                amount_in, amount_out = amount_in + max_in, amount_out + max_out
+                remaining -= max_out if bool_exact_out else max_in
+                sqrt_price, tick, L = sqrt_target, target - 1, L - self.liquidity_net[target]
+                i -= 1
+
+        else:  # price goes up, crossing the next initialized tick above `tick`
+            i = bisect_right(self.ticks, tick)
+            while remaining > 0.:
+                if i == len(self.ticks):
+                    raise Exception("invalid delta_Y. insufficient liquidity above tick {}".format(tick))
+                target = self.ticks[i]
+                sqrt_target = sqrt_price_at(target)
+                max_in, max_out = L * (sqrt_target - sqrt_price), L * (1. / sqrt_price - 1. / sqrt_target)
+
+                if (max_out if bool_exact_out else max_in) > remaining:  # stops inside [tick, target)
+                    if bool_exact_out:
+                        sqrt_prime = 1. / (1. / sqrt_price - remaining / L)
+                        amount_in += L * (sqrt_prime - sqrt_price)
+                        amount_out += remaining
+                    else:
+                        sqrt_prime = sqrt_price + remaining / L
+                        amount_in += remaining
+                        amount_out += L * (1. / sqrt_price - 1. / sqrt_prime)
+                    sqrt_price, remaining = sqrt_prime, 0.
+                    tick = max(min(tick_at(sqrt_price * sqrt_price), target - 1), tick)
+                    break
+
+                amount_in, amount_out = amount_in + max_in, amount_out + max_out
+                remaining -= max_out if bool_exact_out else max_in
+                sqrt_price, tick, L = sqrt_target, target, L + self.liquidity_net[target]
+                i += 1
+
+        return amount_in, amount_out, (sqrt_price, tick, L)
+
+    def get_input_price(self, pool, delta_in, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        delta_out = floor(self._walk(delta_in * gamma, bool_ETH_in, False)[1])
+        if delta_out >= Y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, Y))
+        return delta_out
+
+    def get_output_price(self, pool, delta_out, bool_ETH_in, bool_fee=True):
+        X, Y = self._sides(pool, bool_ETH_in)
+        if delta_out >= Y:
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_out, Y))
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+
+        return floor(self._walk(delta_out, bool_ETH_in, True)[0] / gamma) + 1
+
+    def on_swap(self, pool, delta_in, delta_out, bool_ETH_in, bool_fee=True):  # the price moves by what was paid in
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+        self.set_state(self._walk(delta_in * gamma, bool_ETH_in, False)[2])
+
+    def get_state(self):
+        return self.sqrt_price, self.tick, self.liquidity
+
+    def set_state(self, state):
+        self.sqrt_price, self.tick, self.liquidity = state
+
+    def get_price(self):  # ERC20 / ETH
+        return self.sqrt_price * self.sqrt_price
+
+
+def create_concentrated_pool(address, price, positions, fee=0.003, tick_spacing=60):
+    """`Uniswap` on ConcentratedLiquidity holding `positions` [(tick_lower, tick_upper, L)]."""
+    invariant = ConcentratedLiquidity(price, tick_spacing=tick_spacing)
+    amount_ETH, amount_ERC20 = 0, 0
+    for tick_lower, tick_upper, liquidity in positions:
+        ETH, ERC20 = invariant.add_position(tick_lower, tick_upper, liquidity)
+        amount_ETH, amount_ERC20 = amount_ETH + ETH, amount_ERC20 + ERC20
+    init_LT = int(sum(liquidity for _, _, liquidity in positions))
+    return Uniswap(address, amount_ETH, amount_ERC20, init_LT, fee=fee, invariant=invariant)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(12345)
+
+    """init: same reserves, 1:200"""
+    pools = {
+        'constant product': Uniswap('-1', 1000000, 200000000, 1000000),
+        'ConstantProduct': Uniswap('-1', 1000000, 200000000, 1000000, invariant=ConstantProduct()),
+        'Weighted 80/20': Uniswap('-1', 1000000, 200000000, 1000000, invariant=Weighted(0.8)),
+        'StableSwap A=100': Uniswap('-1', 1000000, 200000000, 1000000, invariant=StableSwap(100, rate=200.)),
+        'Concentrated': create_concentrated_pool(
+            '-1', 200., [(tick - 6000, tick + 6000, 1.4142e7) for tick in [tick_at(200.) // 60 * 60]]
+            + [(tick, tick + 60, 1e6) for tick in range(-60000, 120000, 60)]),  # 3000 ticks
+    }
+
+    """Identical traffic"""
+    trades = [(random.random() < 0.5, random.randint(1, 3150)) for _ in range(100000)]
+    for name, pool in pools.items():
+        start = time.perf_counter()
+        for bool_ETH_in, amount in trades:
+            if bool_ETH_in:
+                pool.ETH_to_ERC20(amount)
+            else:
+                pool.ERC20_to_ETH_exact(amount)
+        print(">>> {}: {} swaps in {:.3f}s, ETH {}, ERC20 {}, ratio {:.3f}".format(
+            name, len(trades), time.perf_counter() - start, pool.ETH, pool.ERC20, pool.ERC20 / pool.ETH))
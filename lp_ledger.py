@@ -0,0 +1,200 @@
+import numpy as np
+
+from uniswap import JOURNAL_LEDGER
+
+
+COLUMNS = ('LT',                                # ledger's copy of the holder's LT
+           'deposited_ETH', 'deposited_ERC20',  # entry basis: everything put in by `join`
+           'withdrawn_ETH', 'withdrawn_ERC20',  # everything taken out by `out`
+           'fees_ETH', 'fees_ERC20',            # fees accrued up to the last settlement, Q128
+           'growth_ETH', 'growth_ERC20')        # fee growth per LT at the last settlement, Q128
+EXACT_COLUMNS = ('LT', 'fees_ETH', 'fees_ERC20', 'growth_ETH', 'growth_ERC20')  # Python ints (object)
+Q128 = 2 ** 128  # fixed point of fee growth: exact for wei pools
+
+
+class LPLedger:  # per-holder LP accounting, O(1) per swap via global fee growth per LT; rolled back by `restore`
+    def __init__(self, capacity=1024):
+        self.pool = None
+        self.index = {}  # address -> row
+        self.addresses = []
+        for column in COLUMNS:
+            setattr(self, column, np.zeros(capacity, dtype=object if column in EXACT_COLUMNS else np.float64))
+        self.fee_growth_ETH, self.fee_growth_ERC20 = 0, 0  # fees per LT since `attach`, Q128
+        self._fee, self._fee_fraction = None, None  # pool fee -> (num, den), as in integer mode
+
+    def attach(self, pool):  # current holders enter at their pro-rata share of the reserves
+        self.pool = pool
+        for address, LT in pool.LT_holders.items():
+            i = self._row(address)
+            self.LT[i] = LT
+            self.deposited_ETH[i] = LT / pool.LT * pool.ETH
+            self.deposited_ERC20[i] = LT / pool.LT * pool.ERC20
+        pool.ledger = self
+
+    def _row(self, address):
+        if address not in self.index:
+            if len(self.addresses) == len(self.LT):
+                for column in COLUMNS:
+                    values = getattr(self, column)
+                    setattr(self, column, np.concatenate([values, np.zeros_like(values)]))
+            self.index[address] = len(self.addresses)
+            self.addresses.append(address)
+            i = self.index[address]
+            self.growth_ETH[i], self.growth_ERC20[i] = self.fee_growth_ETH, self.fee_growth_ERC20
+        return self.index[address]
+
+    def _settle(self, i):  # move fees earned since the last settlement into `fees_*`
+        self.fees_ETH[i] += self.LT[i] * (self.fee_growth_ETH - self.growth_ETH[i])
+        self.fees_ERC20[i] += self.LT[i] * (self.fee_growth_ERC20 - self.growth_ERC20[i])
+        self.growth_ETH[i], self.growth_ERC20[i] = self.fee_growth_ETH, self.fee_growth_ERC20
+
+    def _growth(self, delta_in, fee_num, fee_den):  # fees per LT of one swap, Q128
+        LT = self.pool.LT
+        if isinstance(delta_in, (int, np.integer)) and isinstance(LT, int):
+            return (int(delta_in) * fee_num * Q128) // (fee_den * LT)
+        return int(delta_in * fee_num / (fee_den * LT) * Q128)
+
+    """Snapshots: changes are journaled with the pool's, see `Uniswap.snapshot`"""
+
+    def _journal_row(self, address):
+        i = self.index.get(address)
+        if i is None:  # a new row: dropped on undo
+            self.pool._journal.append((JOURNAL_LEDGER, address, None))
+        else:
+            self.pool._journal.append((JOURNAL_LEDGER, i, tuple(getattr(self, column)[i] for column in COLUMNS)))
+
+    def undo(self, entry):  # one journal entry, newest first
+        _, key, values = entry
+        if key is None:  # fee growth
+            self.fee_growth_ETH, self.fee_growth_ERC20 = values
+        elif values is None:  # the last row
+            i = self.index.pop(key)
+            self.addresses.pop()
+            for column in COLUMNS:
+                getattr(self, column)[i] = 0
+        else:
+            for column, value in zip(COLUMNS, values):
+                getattr(self, column)[key] = value
+
+    """Pool hooks (after a successful update)"""
+
+    def _get_fee_fraction(self):
+        if self.pool.fee != self._fee:
+            gamma_num, gamma_den = self.pool._get_gamma()
+            self._fee, self._fee_fraction = self.pool.fee, (gamma_den - gamma_num, gamma_den)
+        return self._fee_fraction
+
+    def on_swap(self, delta_ETH_in, delta_ERC20_in, bool_fee):
+        if bool_fee and self.pool.LT:
+            if self.pool._journal is not None:
+                self.pool._journal.append((JOURNAL_LEDGER, None, (self.fee_growth_ETH, self.fee_growth_ERC20)))
+            fee_fraction = self._get_fee_fraction()
+            if delta_ETH_in:
+                self.fee_growth_ETH += self._growth(delta_ETH_in, *fee_fraction)
+            if delta_ERC20_in:
+                self.fee_growth_ERC20 += self._growth(delta_ERC20_in, *fee_fraction)
+
+    def on_swaps(self, deltas_ETH_in, deltas_ERC20_in, bool_fee):  # `on_swap` of many swaps at one LT (`replay`)
+        if bool_fee and self.pool.LT:
+            if self.pool._journal is not None:
+                self.pool._journal.append((JOURNAL_LEDGER, None, (self.fee_growth_ETH, self.fee_growth_ERC20)))
+            fee_fraction = self._get_fee_fraction()
+            self.fee_growth_ETH += sum(self._growth(delta, *fee_fraction) for delta in deltas_ETH_in if delta)
+            self.fee_growth_ERC20 += sum(self._growth(delta, *fee_fraction) for delta in deltas_ERC20_in if delta)
+
+    def on_join(self, address, delta_ETH, delta_ERC20, delta_LT):
+        if self.pool._journal is not None:
+            self._journal_row(address)
+        i = self._row(address)
+        self._settle(i)
+        self.LT[i] += delta_LT
+        self.deposited_ETH[i] += delta_ETH
+        self.deposited_ERC20[i] += delta_ERC20
+
+    def on_out(self, address, delta_LT, delta_ETH, delta_ERC20):
+        if self.pool._journal is not None:
+            self._journal_row(address)
+        i = self._row(address)
+        self._settle(i)
+        self.LT[i] -= delta_LT
+        self.withdrawn_ETH[i] += delta_ETH
+        self.withdrawn_ERC20[i] += delta_ERC20
+
+    """Queries, O(1) per holder"""
+
+    def get_share(self, address):
+        return float(self.LT[self.index[address]] / self.pool.LT)
+
+    def get_claim(self, address):  # (ETH, ERC20) an `out` of the whole position would return, unrounded
+        share = self.get_share(address)
+        return share * self.pool.ETH, share * self.pool.ERC20
+
+    def get_fees(self, address):  # (ETH, ERC20) earned as LP fees
+        i = self.index[address]
+        return (float((self.fees_ETH[i] + self.LT[i] * (self.fee_growth_ETH - self.growth_ETH[i])) / Q128),
+                float((self.fees_ERC20[i] + self.LT[i] * (self.fee_growth_ERC20 - self.growth_ERC20[i])) / Q128))
+
+    def get_pnl(self, address, oracle_ratio):  # withdrawn + claim - deposited, in ERC20
+        i = self.index[address]
+        claim_ETH, claim_ERC20 = self.get_claim(address)
+        ETH = self.withdrawn_ETH[i] + claim_ETH - self.deposited_ETH[i]
+        ERC20 = self.withdrawn_ERC20[i] + claim_ERC20 - self.deposited_ERC20[i]
+        return float(ETH * oracle_ratio + ERC20)
+
+    """Queries, vectorized over every holder (in `addresses` order)"""
+
+    def get_all_fees(self):
+        n = len(self.addresses)
+        fees_ETH = self.fees_ETH[:n] + self.LT[:n] * (self.fee_growth_ETH - self.growth_ETH[:n])
+        fees_ERC20 = self.fees_ERC20[:n] + self.LT[:n] * (self.fee_growth_ERC20 - self.growth_ERC20[:n])
+        return (fees_ETH / Q128).astype(np.float64), (fees_ERC20 / Q128).astype(np.float64)
+
+    def get_all_pnls(self, oracle_ratio):
+        n = len(self.addresses)
+        shares = (self.LT[:n] / self.pool.LT).astype(np.float64)
+        ETH = self.withdrawn_ETH[:n] + shares * self.pool.ETH - self.deposited_ETH[:n]
+        ERC20 = self.withdrawn_ERC20[:n] + shares * self.pool.ERC20 - self.deposited_ERC20[:n]
+        return ETH * oracle_ratio + ERC20
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __deepcopy__(self, memo):  # a copied pool is not accounted
+        return None
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from uniswap import Uniswap
+
+    random.seed(12345)
+
+    """init"""
+    us = Uniswap('-1', 1000000, 200000000, 1000000)  # 1:200
+    ledger = LPLedger()
+    ledger.attach(us)
+
+    start = time.perf_counter()
+    for i in range(100000):
+        us.join(str(i), 10, us.required_ERC20_for_liquidity(10))
+
+    """Txs"""
+    for _ in range(1000000):
+        if random.random() < 0.5:
+            us.ETH_to_ERC20(105)
+        else:
+            us.ERC20_to_ETH_exact(105)
+    us.out('0', us.LT_holders['0'])
+    print(">>> 100000 LPs, 1000000 swaps in {:.3f}s".format(time.perf_counter() - start))
+
+    """Queries"""
+    oracle_ratio = us.ERC20 / us.ETH
+    print(">>> '-1': share {:.6f}, fees {}, pnl {:.1f}".format(
+        ledger.get_share('-1'), ledger.get_fees('-1'), ledger.get_pnl('-1', oracle_ratio)))
+    print(">>> '0': fees {}, pnl {:.1f}".format(ledger.get_fees('0'), ledger.get_pnl('0', oracle_ratio)))
+
+    start = time.perf_counter()
+    pnls = ledger.get_all_pnls(oracle_ratio)
+    print(">>> {} pnls in {:.4f}s, total {:.1f}".format(len(pnls), time.perf_counter() - start, pnls.sum()))
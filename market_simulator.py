@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import random
+
+
+class MarketSimulator:  # discrete-event simulation of agents trading on one pool, block by block
+    def __init__(self, pool, seed=950327, max_txs_per_block=200):
+        self.pool = pool
+        self.rng = random.Random(seed)  # shared by the agents
+        self.max_txs_per_block = max_txs_per_block  # block gas limit, in txs; the rest waits in the mempool
+
+        self.block = 0
+        self._seq = itertools.count()  # FIFO tie-break in both heaps
+        self.wakeups = []  # heap of (block, seq, agent)
+        self.mempool = []  # heap of (-gas_price, seq, agent, fn, args)
+        self.subscribers = []  # agents woken after every block that changed the pool
+        self.hooks = []  # hook(sim, block, receipts), after every executed block
+
+        self.n_txs, self.n_reverted, self.n_blocks = 0, 0, 0
+
+    """Scheduling"""
+
+    def add_agent(self, agent, block=None):
+        self.schedule(agent, self.block if block is None else block)
+
+    def add_agents(self, agents, blocks):  # bulk: one heapify instead of a push per agent
+        self.wakeups.extend((block, next(self._seq), agent) for agent, block in zip(agents, blocks))
+        heapq.heapify(self.wakeups)
+
+    def schedule(self, agent, block):
+        heapq.heappush(self.wakeups, (block, next(self._seq), agent))
+
+    def subscribe(self, agent):
+        self.subscribers.append(agent)
+
+    def submit(self, agent, gas_price, fn, *args):  # included by gas price, highest first
+        heapq.heappush(self.mempool, (-gas_price, next(self._seq), agent, fn, args))
+
+    """Running"""
+
+    def _wake(self, agent):
+        next_block = agent.act(self, self.block)
+        if next_block is not None:
+            self.schedule(agent, max(next_block, self.block + 1))
+
+    def _execute_block(self):
+        state = (self.pool.ETH, self.pool.ERC20, self.pool.LT)
+
+        receipts = []  # (agent, result, bool_success)
+        for _ in range(min(len(self.mempool), self.max_txs_per_block)):
+            _, _, agent, fn, args = heapq.heappop(self.mempool)
+            try:
+                receipts.append((agent, fn(*args), True))
+            except Exception as e:  # reverted, as the pool's own validity checks
+                receipts.append((agent, e, False))
+                self.n_reverted += 1
+        self.n_txs += len(receipts)
+        self.n_blocks += 1
+
+        for hook in self.hooks:
+            hook(self, self.block, receipts)
+        return state != (self.pool.ETH, self.pool.ERC20, self.pool.LT)
+
+    def run(self, n_blocks):
+        """Simulate up to block `self.block + n_blocks`, skipping blocks with nothing to do."""
+        end = self.block + n_blocks
+        while self.block < end:
+            while self.wakeups and self.wakeups[0][0] <= self.block:
+                self._wake(heapq.heappop(self.wakeups)[2])
+
+            if self.mempool and self._execute_block():
+                for agent in self.subscribers:  # their txs go into the next block
+                    self._wake(agent)
+
+            if self.mempool:
+                self.block += 1
+            elif self.wakeups:
+                self.block = max(self.block + 1, min(self.wakeups[0][0], end))
+            else:
+                self.block = end
+
+
+"""Agents: `act(sim, block)` submits txs and returns the next block to wake at, or None"""
+
+
+class NoiseTrader:  # random swaps, Poisson in time
+    def __init__(self, rate, max_size, max_gas_price=100):
+        self.rate = rate  # swaps per block
+        self.max_size, self.max_gas_price = max_size, max_gas_price
+
+    def act(self, sim, block):
+        rng = sim.rng
+        size = rng.randint(1, self.max_size)
+        if rng.random() < 0.5:
+            sim.submit(self, rng.randint(1, self.max_gas_price), sim.pool.ETH_to_ERC20, size)
+        else:
+            sim.submit(self, rng.randint(1, self.max_gas_price), sim.pool.ERC20_to_ETH_exact, size)
+        return block + 1 + int(rng.expovariate(self.rate))
+
+
+class ArbitragerAgent:  # the existing `Arbitrager`, woken by pool changes, outbidding noise traders
+    def __init__(self, arbitrager, gas_price=1000):
+        self.arbitrager, self.gas_price = arbitrager, gas_price
+        self.bool_pending = False
+
+    def _arbitrage(self, pool):
+        self.bool_pending = False
+        return self.arbitrager.arbitrage(pool)
+
+    def act(self, sim, block):
+        if not self.bool_pending:  # one tx in flight at a time
+            self.bool_pending = True
+            sim.submit(self, self.gas_price, self._arbitrage, sim.pool)
+        return None
+
+
+class LiquidityProvider:  # alternates `join` and `out` of its whole position
+    def __init__(self, address, delta_ETH, rate, gas_price=50):
+        self.address, self.delta_ETH = address, delta_ETH
+        self.rate, self.gas_price = rate, gas_price  # joins / outs per block
+
+    def _join(self, pool):  # the ERC20 side is priced at inclusion
+        return pool.join(self.address, self.delta_ETH, pool.required_ERC20_for_liquidity(self.delta_ETH))
+
+    def _out(self, pool):
+        return pool.out(self.address, pool.LT_holders[self.address])
+
+    def act(self, sim, block):
+        if self.address in sim.pool.LT_holders:
+            sim.submit(self, self.gas_price, self._out, sim.pool)
+        else:
+            sim.submit(self, self.gas_price, self._join, sim.pool)
+        return block + 1 + int(sim.rng.expovariate(self.rate))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from uniswap import Uniswap
+    from arbitrager import Arbitrager
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=950327)
+    parser.add_argument('--blocks', type=int, default=10000)
+    parser.add_argument('--noise-traders', type=int, default=1000000)
+    parser.add_argument('--lps', type=int, default=100)
+    args = parser.parse_args()
+    print(args)
+
+    """init"""
+    us = Uniswap('-1', 1000000, 200000000, 1000000)  # 1:200
+    sim = MarketSimulator(us, seed=args.seed)
+
+    arbitrager = ArbitragerAgent(Arbitrager(1000000000, 200.))
+    sim.subscribe(arbitrager)
+    sim.add_agents([NoiseTrader(rate=1e-4, max_size=315) for _ in range(args.noise_traders)],
+                   [sim.rng.randrange(args.blocks) for _ in range(args.noise_traders)])
+    sim.add_agents([LiquidityProvider(str(i), 1000, rate=1e-3) for i in range(args.lps)],
+                   [sim.rng.randrange(args.blocks) for _ in range(args.lps)])
+
+    """Simulation"""
+    start = time.perf_counter()
+    sim.run(args.blocks)
+    elapsed = time.perf_counter() - start
+    print(">>> {} blocks, {} txs ({} reverted) in {:.3f}s ({:.0f} txs/s)".format(
+        sim.n_blocks, sim.n_txs, sim.n_reverted, elapsed, sim.n_txs / elapsed))
+    print(">>> arbitrager balance {}".format(arbitrager.arbitrager.balance_ERC20))
+    us.print_pool_state()
@@ -0,0 +1,118 @@
+import os
+import time
+from bisect import bisect_left
+
+
+BUCKETS = tuple(1e-7 * 2 ** i for i in range(24))  # upper bounds [s]: 100ns .. ~0.84s
+
+
+class Metrics:
+    """
+    Counters and timing histograms of the calls of instrumented objects. Set as
+    `pool.metrics` / `arbitrager.metrics` (None, the default, costs one attribute
+    check per call); one Metrics can be shared by many objects.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}  # (name, method) -> count
+        self.histograms = {}  # method -> [counts per bucket + 1 (+Inf), sum, count]
+
+    def inc(self, name, method, n=1):
+        key = (name, method)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, method, seconds):
+        histogram = self.histograms.get(method)
+        if histogram is None:
+            histogram = self.histograms[method] = [[0] * (len(self.buckets) + 1), 0., 0]
+        histogram[0][bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def call(self, obj, method, *args, **kwargs):
+        """Timed `obj.method(*args, **kwargs)`; quotes (bool_update=False) are counted apart."""
+        label = method if kwargs.get('bool_update', True) else method + '_quote'
+        obj.metrics = None  # the uninstrumented call
+        start = time.perf_counter()
+        try:
+            result = getattr(obj, method)(*args, **kwargs)
+        except Exception:
+            self.inc('rejected', label)
+            raise
+        finally:
+            self.observe(label, time.perf_counter() - start)
+            obj.metrics = self
+        self.inc('calls', label)
+        return result
+
+    """Export"""
+
+    def snapshot(self):
+        counters = {}
+        for (name, method), count in self.counters.items():
+            counters.setdefault(name, {})[method] = count
+        histograms = {method: {'buckets': list(self.buckets), 'counts': list(counts), 'sum': total, 'count': n}
+                      for method, (counts, total, n) in self.histograms.items()}
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self, prefix='uniswap'):  # text exposition format
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append('# TYPE {}_{}_total counter'.format(prefix, name))
+            for (name_, method), count in sorted(self.counters.items()):
+                if name_ == name:
+                    lines.append('{}_{}_total{{method="{}"}} {}'.format(prefix, name, method, count))
+
+        if self.histograms:
+            lines.append('# TYPE {}_call_seconds histogram'.format(prefix))
+        for method, (counts, total, n) in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_call_seconds_bucket{{method="{}",le="{}"}} {}'.format(prefix, method, le, cumulative))
+            lines.append('{}_call_seconds_sum{{method="{}"}} {!r}'.format(prefix, method, total))
+            lines.append('{}_call_seconds_count{{method="{}"}} {}'.format(prefix, method, n))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='uniswap'):  # atomic, for a textfile collector
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+
+    def __deepcopy__(self, memo):  # copied objects keep reporting here
+        return self
+
+
+if __name__ == "__main__":
+    import random
+    from pprint import pprint
+
+    from uniswap import Uniswap
+    from arbitrager import Arbitrager
+
+    random.seed(12345)
+
+    """init"""
+    metrics = Metrics()
+    us = Uniswap('-1', 1000000, 200000000, 1000000)  # 1:200
+    arbitrager = Arbitrager(1000000000, 200.)
+    us.metrics, arbitrager.metrics = metrics, metrics
+
+    """Txs"""
+    start = time.perf_counter()
+    for _ in range(100000):
+        if random.random() < 0.5:
+            us.ETH_to_ERC20(315)
+        else:
+            us.ERC20_to_ETH_exact(315)
+        arbitrager.arbitrage(us)
+    try:
+        us.ERC20_to_ETH_exact(us.ETH)  # rejected
+    except Exception:
+        pass
+    print(">>> 100000 rounds in {:.3f}s".format(time.perf_counter() - start))
+
+    pprint(metrics.snapshot()['counters'])
+    print(metrics.to_prometheus()[:600])
@@ -0,0 +1,297 @@
+import numpy as np
+
+from uniswap import Uniswap
+
+
+class PoolBank:  # N pools between ETH and ERC20, in struct-of-arrays form
+    def __init__(self,
+                 amount_ETHs,
+                 amount_ERC20s,
+                 init_LTs,
+                 fees=0.003,
+                 addresses=None     # initial LT holder of each pool (optional)
+                 ):
+
+        self.ETH = np.array(amount_ETHs, dtype=np.int64)
+        self.ERC20 = np.array(amount_ERC20s, dtype=np.int64)
+        self.LT = np.array(init_LTs, dtype=np.int64)
+        self.fee = np.array(np.broadcast_to(fees, self.ETH.shape), dtype=np.float64)
+
+        # Validity check
+        if not (self.ETH.shape == self.ERC20.shape == self.LT.shape) or self.ETH.ndim != 1:
+            raise Exception("invalid shapes. {}, {}, {}".format(self.ETH.shape, self.ERC20.shape, self.LT.shape))
+
+        self.LT_holders = {}  # index -> {address: LT}, only for pools with known holders
+        self.version = 0  # bumped by every change of any pool; shared by the views' quotes
+        if addresses is not None:
+            for i, address in enumerate(addresses):
+                self.LT_holders[i] = {address: int(self.LT[i])}
+
+    @classmethod
+    def from_pools(cls, pools):
+        if any(pool.invariant is not None for pool in pools):
+            raise Exception("invalid pools. only x * y = k pools can be banked")
+        bank = cls([pool.ETH for pool in pools],
+                   [pool.ERC20 for pool in pools],
+                   [pool.LT for pool in pools],
+                   [pool.fee for pool in pools])
+        for i, pool in enumerate(pools):
+            if pool.LT_holders:
+                bank.LT_holders[i] = dict(pool.LT_holders)
+        return bank
+
+    def __len__(self):
+        return len(self.ETH)
+
+    def __getitem__(self, index):
+        return PoolView(self, index)
+
+    @property
+    def k(self):  # float64; use a view for the exact product
+        return self.ETH.astype(np.float64) * self.ERC20
+
+    def update_fee(self, new_fees, idx=None):
+        self.fee[self._index(idx)] = new_fees
+        self.version += 1
+
+    def _index(self, idx):
+        if idx is None:
+            return slice(None)
+
+        idx = np.asarray(idx)
+        if idx.dtype != np.bool_ and len(np.unique(idx)) != len(idx):
+            raise Exception("invalid idx. duplicated pool indices")
+        return idx
+
+    """Swap Protocol (vectorized over pools)"""
+
+    def _get_input_prices(self, delta_Xs, Xs, Ys, fees, bool_fee=True):
+        # Validity check
+        if ((Xs == 0) | (Ys == 0)).any():
+            raise Exception("invalid X or Y. empty pool selected")
+
+        alphas = delta_Xs / Xs
+        gammas = (1. - fees) if bool_fee else (1.)
+
+        delta_Ys = np.floor(alphas * gammas / (1. + alphas * gammas) * Ys).astype(np.int64)
+
+        # Validity check
+        invalid = delta_Ys >= Ys
+        if invalid.any():
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_Ys[invalid][0], Ys[invalid][0]))
+
+        return delta_Ys
+
+    def _get_output_prices(self, delta_Ys, Ys, Xs, fees, bool_fee=True):
+        # Validity check
+        if ((Xs == 0) | (Ys == 0)).any():
+            raise Exception("invalid X or Y. empty pool selected")
+        invalid = delta_Ys >= Ys
+        if invalid.any():
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_Ys[invalid][0], Ys[invalid][0]))
+
+        betas = delta_Ys / Ys
+        gammas = (1. - fees) if bool_fee else (1.)
+
+        delta_Xs = np.floor(betas / ((1. - betas) * gammas) * Xs).astype(np.int64) + 1
+        return delta_Xs
+
+    def _amounts(self, amounts, i):
+        return np.broadcast_to(np.asarray(amounts, dtype=np.int64), self.ETH[i].shape)
+
+    def ETH_to_ERC20(self, delta_ETHs, idx=None, bool_fee=True, bool_update=True):
+        i = self._index(idx)
+        delta_ETHs = self._amounts(delta_ETHs, i)
+        delta_ERC20s = self._get_input_prices(delta_ETHs, self.ETH[i], self.ERC20[i], self.fee[i], bool_fee=bool_fee)
+
+        if bool_update:
+            self.ETH[i] += delta_ETHs
+            self.ERC20[i] -= delta_ERC20s
+            self.version += 1
+        return delta_ERC20s
+
+    def ETH_to_ERC20_exact(self, delta_ERC20s, idx=None, bool_fee=True, bool_update=True):
+        i = self._index(idx)
+        delta_ERC20s = self._amounts(delta_ERC20s, i)
+        delta_ETHs = self._get_output_prices(delta_ERC20s, self.ERC20[i], self.ETH[i], self.fee[i], bool_fee=bool_fee)
+
+        if bool_update:
+            self.ETH[i] += delta_ETHs
+            self.ERC20[i] -= delta_ERC20s
+            self.version += 1
+        return delta_ETHs
+
+    def ERC20_to_ETH(self, delta_ERC20s, idx=None, bool_fee=True, bool_update=True):
+        i = self._index(idx)
+        delta_ERC20s = self._amounts(delta_ERC20s, i)
+        delta_ETHs = self._get_input_prices(delta_ERC20s, self.ERC20[i], self.ETH[i], self.fee[i], bool_fee=bool_fee)
+
+        if bool_update:
+            self.ETH[i] -= delta_ETHs
+            self.ERC20[i] += delta_ERC20s
+            self.version += 1
+        return delta_ETHs
+
+    def ERC20_to_ETH_exact(self, delta_ETHs, idx=None, bool_fee=True, bool_update=True):
+        i = self._index(idx)
+        delta_ETHs = self._amounts(delta_ETHs, i)
+        delta_ERC20s = self._get_output_prices(delta_ETHs, self.ETH[i], self.ERC20[i], self.fee[i], bool_fee=bool_fee)
+
+        if bool_update:
+            self.ETH[i] -= delta_ETHs
+            self.ERC20[i] += delta_ERC20s
+            self.version += 1
+        return delta_ERC20s
+
+    """Liquidity Protocol (vectorized over pools, without LT holders)"""
+
+    def required_ERC20_for_liquidity(self, delta_ETHs, idx=None):
+        i = self._index(idx)
+        alphas = self._amounts(delta_ETHs, i) / self.ETH[i]
+
+        ERC20_primes = np.floor((1. + alphas) * self.ERC20[i]).astype(np.int64) + 1
+        return ERC20_primes - self.ERC20[i]
+
+    def mint(self, delta_ETHs, delta_ERC20s, idx=None, bool_update=True):  # add_liquidity
+        i = self._index(idx)
+        delta_ETHs = self._amounts(delta_ETHs, i)
+        alphas = delta_ETHs / self.ETH[i]
+
+        ERC20_primes = np.floor((1. + alphas) * self.ERC20[i]).astype(np.int64) + 1
+
+        # delta_ERC20 validity check
+        invalid = (ERC20_primes - self.ERC20[i]) != self._amounts(delta_ERC20s, i)
+        if invalid.any():
+            raise Exception("invalid delta_ERC20. Require {} ERC20 but input is {}".format(
+                (ERC20_primes - self.ERC20[i])[invalid][0], self._amounts(delta_ERC20s, i)[invalid][0]))
+
+        LT_primes = np.floor((1. + alphas) * self.LT[i]).astype(np.int64)
+        delta_LTs = LT_primes - self.LT[i]
+
+        if bool_update:
+            self.ETH[i] += delta_ETHs
+            self.ERC20[i] = ERC20_primes
+            self.LT[i] = LT_primes
+            self.version += 1
+        return delta_LTs
+
+    def burn(self, delta_LTs, idx=None, bool_update=True):  # remove_liquidity
+        i = self._index(idx)
+        delta_LTs = self._amounts(delta_LTs, i)
+
+        # delta_LT validity check
+        invalid = delta_LTs > self.LT[i]
+        if invalid.any():
+            raise Exception("invalid delta_LT. Have to be under {} LT but input is {}".format(
+                self.LT[i][invalid][0], delta_LTs[invalid][0]))
+
+        alphas = delta_LTs / self.LT[i]
+
+        ETH_primes = np.ceil((1. - alphas) * self.ETH[i]).astype(np.int64)
+        ERC20_primes = np.ceil((1. - alphas) * self.ERC20[i]).astype(np.int64)
+        delta_ETHs = self.ETH[i] - ETH_primes
+        delta_ERC20s = self.ERC20[i] - ERC20_primes
+
+        if bool_update:
+            self.ETH[i] = ETH_primes
+            self.ERC20[i] = ERC20_primes
+            self.LT[i] -= delta_LTs
+            self.version += 1
+        return delta_ETHs, delta_ERC20s
+
+
+class PoolView(Uniswap):  # `Uniswap` backed by one index of a PoolBank
+    bool_int = False
+    _journal = None
+    recorder = None
+    event_log = None
+    ledger = None
+    invariant = None
+    metrics = None
+    _quotes, _quotes_version = None, None
+
+    def __init__(self, bank, index):  # no Uniswap.__init__: state lives in the bank
+        if not (-len(bank) <= index < len(bank)):
+            raise Exception("invalid index {}".format(index))
+        self.bank, self.index = bank, index % len(bank)
+
+    def __eq__(self, other):  # views of one index are one pool (quotes execute on either)
+        return isinstance(other, PoolView) and (other.bank is self.bank) and (other.index == self.index)
+
+    def __hash__(self):
+        return hash((id(self.bank), self.index))
+
+    @property
+    def ETH(self):
+        return int(self.bank.ETH[self.index])
+
+    @ETH.setter
+    def ETH(self, value):
+        self.bank.ETH[self.index] = value
+
+    @property
+    def ERC20(self):
+        return int(self.bank.ERC20[self.index])
+
+    @ERC20.setter
+    def ERC20(self, value):
+        self.bank.ERC20[self.index] = value
+
+    @property
+    def LT(self):
+        return int(self.bank.LT[self.index])
+
+    @LT.setter
+    def LT(self, value):
+        self.bank.LT[self.index] = value
+
+    @property
+    def k(self):
+        return self.ETH * self.ERC20
+
+    @k.setter
+    def k(self, value):  # derived from the reserves
+        pass
+
+    @property
+    def fee(self):
+        return float(self.bank.fee[self.index])
+
+    @fee.setter
+    def fee(self, new_fee):
+        self.bank.fee[self.index] = new_fee
+
+    @property
+    def version(self):
+        return self.bank.version
+
+    @version.setter
+    def version(self, value):
+        self.bank.version = value
+
+    @property
+    def LT_holders(self):
+        return self.bank.LT_holders.setdefault(self.index, {})
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(12345)
+
+    """init"""
+    n = 100000
+    amount_ETHs = rng.integers(10000, 1000000, n)
+    bank = PoolBank(amount_ETHs, amount_ETHs * 200, np.full(n, 1000000))
+
+    """Txs (one block: every pool trades once)"""
+    start = time.perf_counter()
+    for _ in range(100):
+        bank.ETH_to_ERC20(105)
+        bank.ERC20_to_ETH_exact(105)
+    print("{} pools x 200 swaps\t{:.3f}s".format(n, time.perf_counter() - start))
+
+    """Single pool, through the Uniswap API"""
+    pool = bank[0]
+    pool.join('0', 2000, pool.required_ERC20_for_liquidity(2000))
+    pool.print_pool_state(bool_LT=True)
@@ -0,0 +1,269 @@
+"""
+A directory of flat little-endian arrays, memory-mapped on open:
+
+    header.json          format, version, counts, arbitragers, and every ETH, ERC20 or LT that is not an
+                         int128 (float reserves), by record index (written last: a store without it is
+                         incomplete)
+    pools.bin            POOL_DTYPE per pool
+    holders.bin          HOLDER_DTYPE per LT holder, pool after pool
+
+ETH, ERC20 and LT are int128s in two int64 limbs: the low one in the field
+itself, the high one in `<field>_hi`. An int64 value is its own low limb (the
+high one is its sign), so int64 readers use the fields as they are; wei
+amounts stay in the mapped arrays.
+    addresses.bin        JSON of every distinct address, back to back (tuples are read back from lists)
+    address_offsets.bin  int64 (n_addresses + 1) offsets into addresses.bin
+"""
+import os
+import json
+
+import numpy as np
+
+from uniswap import Uniswap
+from arbitrager import Arbitrager
+from pool_bank import PoolBank
+from holders import HolderBalances
+
+
+FORMAT, FORMAT_VERSION = 'uniswap-python/pools', 3
+POOL_DTYPE = np.dtype([('ETH', '<i8'), ('ERC20', '<i8'), ('LT', '<i8'), ('fee', '<f8'), ('bool_int', 'u1'),
+                       ('holders_start', '<i8'), ('n_holders', '<i8'),
+                       ('ETH_hi', '<i8'), ('ERC20_hi', '<i8'), ('LT_hi', '<i8')])  # 73 bytes per pool
+HOLDER_DTYPE = np.dtype([('address', '<i8'), ('LT', '<i8'), ('LT_hi', '<i8')])  # file-local address id, by pool
+POOL_DTYPE_2 = np.dtype(POOL_DTYPE.descr[:7])  # versions 1 and 2: int64 only
+HOLDER_DTYPE_2 = np.dtype(HOLDER_DTYPE.descr[:2])
+FILES = ('pools.bin', 'holders.bin', 'addresses.bin', 'address_offsets.bin')
+OVERFLOW_FIELDS = ('ETH', 'ERC20', 'LT', 'holder_LT')  # columns whose values may not fit int128
+INT128_MIN, INT128_MAX = -2 ** 127, 2 ** 127 - 1
+MASK64 = 2 ** 64 - 1
+
+
+def _to_address(value):  # JSON lists back to (hashable) tuples
+    if isinstance(value, list):
+        return tuple(_to_address(v) for v in value)
+    return value
+
+
+def _split(values, overflow):  # (low, high) int64 limbs of `values`; the others go to `overflow` by index, as is
+    if isinstance(values, np.ndarray) and (values.dtype.kind == 'i'):  # int64 already
+        lows = values.astype(np.int64)
+        return lows, lows >> 63
+
+    lows, highs = [], []
+    for i, value in enumerate(values):
+        if isinstance(value, (int, np.integer)) and (INT128_MIN <= value <= INT128_MAX):
+            value = int(value)
+            lows.append(((value & MASK64) ^ 2 ** 63) - 2 ** 63)  # as int64
+            highs.append(value >> 64)
+        else:
+            overflow[i] = value
+            lows.append(0)
+            highs.append(0)
+    return lows, highs
+
+
+def _join(low, high):  # int of two int64 limbs
+    if high == (low >> 63):  # int64
+        return low
+    return (high << 64) | (low & MASK64)
+
+
+def _write(path, name, data):  # to a temporary file, then moved into place: open maps keep the old file
+    tmp_path = os.path.join(path, name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(path, name))
+
+
+def save(path, pools, arbitragers=()):
+    """Write `pools` (Uniswap pools, or a PoolBank) and `arbitragers` to the directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    address_ids, addresses = {}, []
+    overflow = {field: {} for field in OVERFLOW_FIELDS}
+
+    def intern(address):
+        if address not in address_ids:
+            address_ids[address] = len(addresses)
+            addresses.append(address)
+        return address_ids[address]
+
+    if isinstance(pools, PoolBank):
+        records = np.zeros(len(pools), dtype=POOL_DTYPE)
+        for field in ('ETH', 'ERC20', 'LT'):
+            records[field], records[field + '_hi'] = _split(getattr(pools, field), overflow[field])
+        records['fee'] = pools.fee
+        holders_of = [pools.LT_holders.get(i, {}) for i in range(len(pools))]
+    else:
+        if any(pool.invariant is not None for pool in pools):
+            raise Exception("invalid pools. only x * y = k pools can be stored")
+        records = np.zeros(len(pools), dtype=POOL_DTYPE)
+        for field in ('ETH', 'ERC20', 'LT'):
+            records[field], records[field + '_hi'] = _split([getattr(pool, field) for pool in pools], overflow[field])
+        for field in ('fee', 'bool_int'):
+            records[field] = [getattr(pool, field) for pool in pools]
+        holders_of = [pool.LT_holders for pool in pools]
+
+    n_holders = np.fromiter((len(holders) for holders in holders_of), dtype=np.int64, count=len(records))
+    records['n_holders'] = n_holders
+    records['holders_start'] = np.cumsum(n_holders) - n_holders
+    holders = np.zeros(int(n_holders.sum()), dtype=HOLDER_DTYPE)
+    holders['address'] = [intern(address) for pool_holders in holders_of for address in pool_holders]
+    holders['LT'], holders['LT_hi'] = _split(
+        [LT for pool_holders in holders_of for LT in pool_holders.values()], overflow['holder_LT'])
+
+    encoded = [json.dumps(address).encode() for address in addresses]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    header = json.dumps({
+        'format': FORMAT, 'version': FORMAT_VERSION,
+        'n_pools': len(records), 'n_holders': len(holders), 'n_addresses': len(addresses),
+        'overflow': overflow,
+        'arbitragers': [{'balance_ERC20': arbitrager.balance_ERC20, 'oracle_ratio': arbitrager.oracle_ratio,
+                         'tx_fee': arbitrager.tx_fee} for arbitrager in arbitragers]}, indent=1).encode()
+
+    # everything is encoded: only now is the previous store touched
+    header_path = os.path.join(path, 'header.json')
+    if os.path.exists(header_path):
+        os.remove(header_path)  # incomplete until rewritten
+    _write(path, 'pools.bin', records.tobytes())
+    _write(path, 'holders.bin', holders.tobytes())
+    _write(path, 'addresses.bin', b''.join(encoded))
+    _write(path, 'address_offsets.bin', offsets.tobytes())
+    _write(path, 'header.json', header)
+
+
+class PoolStore:
+    """
+    A saved set of pools, opened in O(1) (plus the header's non-int128 values):
+    arrays are memory-mapped and only the pages of the pools read are loaded. `store[i]` builds a new Uniswap with
+    pool i's state; changes to it are not written back (`save` again).
+    """
+    def __init__(self, path, address_table=None):
+        self.path = path
+        self.address_table = address_table  # optional `holders.AddressTable` for the pools' LT holders
+
+        header_path = os.path.join(path, 'header.json')
+        if not os.path.exists(header_path):
+            raise Exception("invalid store {}. no header (incomplete save?)".format(path))
+        with open(header_path) as f:
+            self.header = json.load(f)
+        if self.header.get('format') != FORMAT:
+            raise Exception("invalid store {}. format {}".format(path, self.header.get('format')))
+        if self.header['version'] > FORMAT_VERSION:
+            raise Exception("unsupported version {}. up to {}".format(self.header['version'], FORMAT_VERSION))
+        self.overflow = {field: {int(i): value for i, value in values.items()}  # JSON keys are strings
+                         for field, values in self.header.get('overflow', {}).items()}
+        for field in OVERFLOW_FIELDS:
+            self.overflow.setdefault(field, {})
+
+        self.bool_wide = self.header['version'] >= 3  # high limbs
+        self.pools = self._map('pools.bin', POOL_DTYPE if self.bool_wide else POOL_DTYPE_2, self.header['n_pools'])
+        self.holders = self._map(
+            'holders.bin', HOLDER_DTYPE if self.bool_wide else HOLDER_DTYPE_2, self.header['n_holders'])
+        self.addresses = self._map('addresses.bin', np.uint8, None)
+        self.address_offsets = self._map('address_offsets.bin', np.dtype('<i8'), self.header['n_addresses'] + 1)
+
+    def _map(self, name, dtype, n):
+        file_path = os.path.join(self.path, name)
+        if (n == 0) or (os.path.getsize(file_path) == 0):  # mmap cannot map empty files
+            return np.empty(0, dtype=dtype)
+        if (n is not None) and (os.path.getsize(file_path) != n * dtype.itemsize):
+            raise Exception("invalid {}. {} bytes for {} records".format(name, os.path.getsize(file_path), n))
+        return np.memmap(file_path, dtype=dtype, mode='r')
+
+    def __len__(self):
+        return len(self.pools)
+
+    def get_address(self, address_id):
+        start, end = self.address_offsets[address_id:address_id + 2].tolist()
+        return _to_address(json.loads(self.addresses[start:end].tobytes()))
+
+    def get_holders(self, i):  # [(address, LT)] of pool i
+        record = self.pools[i]
+        start, n = int(record['holders_start']), int(record['n_holders'])
+        overflow, holders = self.overflow['holder_LT'], self.holders[start:start + n].tolist()
+        if self.bool_wide:
+            holders = [(address_id, _join(LT, LT_hi)) for address_id, LT, LT_hi in holders]
+        return [(self.get_address(address_id), overflow.get(start + k, LT))
+                for k, (address_id, LT) in enumerate(holders)]
+
+    def __getitem__(self, i):
+        if not (-len(self) <= i < len(self)):
+            raise Exception("invalid index {}".format(i))
+        i %= len(self)
+        record = self.pools[i].tolist()
+        ETH, ERC20, LT, fee, bool_int = record[:5]
+        if self.bool_wide:
+            ETH_hi, ERC20_hi, LT_hi = record[7:]
+            ETH, ERC20, LT = _join(ETH, ETH_hi), _join(ERC20, ERC20_hi), _join(LT, LT_hi)
+        overflow = self.overflow
+        ETH, ERC20, LT = overflow['ETH'].get(i, ETH), overflow['ERC20'].get(i, ERC20), overflow['LT'].get(i, LT)
+
+        pool = Uniswap(None, ETH, ERC20, LT, fee=fee, bool_int=bool(bool_int))
+        pool.LT_holders = {} if self.address_table is None else HolderBalances(self.address_table)
+        for address, LT in self.get_holders(i):
+            pool.LT_holders[address] = LT
+        return pool
+
+    def to_bank(self, bool_holders=False):  # every pool in a PoolBank (reads the whole file)
+        pools = self.pools
+        bool_wide = np.zeros(len(pools), dtype=np.bool_)
+        if self.bool_wide:
+            for field in ('ETH', 'ERC20', 'LT'):
+                bool_wide |= pools[field + '_hi'] != (pools[field] >> 63)
+        for field in ('ETH', 'ERC20', 'LT'):
+            bool_wide[list(self.overflow[field])] = True
+        n_overflow = int(bool_wide.sum())
+        if n_overflow:
+            raise Exception("invalid store for a PoolBank. {} pools are not int64, read them with store[i]".format(
+                n_overflow))
+        bank = PoolBank(pools['ETH'], pools['ERC20'], pools['LT'], fees=pools['fee'])
+        if bool_holders:
+            for i in np.flatnonzero(pools['n_holders']).tolist():
+                bank.LT_holders[i] = dict(self.get_holders(i))
+        return bank
+
+    def get_arbitragers(self):
+        arbitragers = []
+        for state in self.header['arbitragers']:
+            arbitrager = Arbitrager(state['balance_ERC20'], state['oracle_ratio'])
+            arbitrager.tx_fee = state['tx_fee']
+            arbitragers.append(arbitrager)
+        return arbitragers
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    rng = np.random.default_rng(12345)
+
+    """init: 1000000 pools, one LP each"""
+    n = 1000000
+    amount_ETHs = rng.integers(10000, 1000000, n)
+    bank = PoolBank(amount_ETHs, amount_ETHs * 200, np.full(n, 1000000), addresses=[str(i) for i in range(n)])
+    path = os.path.join(tempfile.mkdtemp(), 'pools')
+
+    start = time.perf_counter()
+    save(path, bank, [Arbitrager(1000000000, 200.)])
+    print(">>> saved {} pools in {:.3f}s ({:.1f}MB)".format(n, time.perf_counter() - start, sum(
+        os.path.getsize(os.path.join(path, name)) for name in FILES) / 2 ** 20))
+
+    start = time.perf_counter()
+    store = PoolStore(path)
+    print(">>> opened in {:.3f}ms".format((time.perf_counter() - start) * 1000))
+
+    start = time.perf_counter()
+    pools = [store[int(i)] for i in rng.integers(0, n, 100)]
+    print(">>> 100 pools read in {:.3f}ms".format((time.perf_counter() - start) * 1000))
+    pools[0].print_pool_state(bool_LT=True)
+
+    arbitrager = store.get_arbitragers()[0]
+    arbitrager.update(210.)
+    arbitrager.arbitrage(pools[0])
+    pools[0].print_pool_state()
+
+    start = time.perf_counter()
+    bank = store.to_bank()
+    print(">>> whole bank loaded in {:.3f}s".format(time.perf_counter() - start))
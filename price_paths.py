@@ -0,0 +1,142 @@
+import numpy as np
+
+from arbitrager import Arbitrager, NO_TRADE
+from pool_bank import PoolBank
+
+
+"""Paths: (n_paths, n_steps + 1) float64 arrays of oracle ratios (ERC20 / ETH), column 0 = s0"""
+
+
+def _from_log_returns(s0, log_returns):
+    paths = np.empty((log_returns.shape[0], log_returns.shape[1] + 1), dtype=np.float64)
+    paths[:, 0] = 0.
+    np.cumsum(log_returns, axis=1, out=paths[:, 1:])
+    np.exp(paths, out=paths)
+    paths *= s0
+    return paths
+
+
+def gbm(rng, n_paths, n_steps, s0=200., mu=0., sigma=0.01, dt=1.):  # geometric Brownian motion
+    log_returns = rng.standard_normal((n_paths, n_steps))
+    log_returns *= sigma * np.sqrt(dt)
+    log_returns += (mu - 0.5 * sigma * sigma) * dt
+    return _from_log_returns(s0, log_returns)
+
+
+def jump_diffusion(rng, n_paths, n_steps, s0=200., mu=0., sigma=0.01, dt=1.,
+                   jump_rate=0.01,      # jumps per unit of time
+                   jump_mean=0.,        # of log(jump size)
+                   jump_std=0.05):      # Merton
+    kappa = np.exp(jump_mean + 0.5 * jump_std * jump_std) - 1.  # compensates the jumps' drift
+    log_returns = rng.standard_normal((n_paths, n_steps))
+    log_returns *= sigma * np.sqrt(dt)
+    log_returns += (mu - 0.5 * sigma * sigma - jump_rate * kappa) * dt
+
+    n_jumps = rng.poisson(jump_rate * dt, (n_paths, n_steps))
+    jumps = np.flatnonzero(n_jumps)  # sparse: most steps have none
+    log_returns.flat[jumps] += rng.normal(jump_mean * n_jumps.flat[jumps], jump_std * np.sqrt(n_jumps.flat[jumps]))
+    return _from_log_returns(s0, log_returns)
+
+
+def historical(series, n_paths=1, n_steps=None, s0=None, rng=None, block_size=20):
+    """
+    Replay of a historical price series, rescaled to start at `s0`: the series
+    itself on every path if `rng` is None, else a block bootstrap of its log
+    returns (blocks of `block_size` consecutive steps, drawn independently).
+    """
+    series = np.asarray(series, dtype=np.float64)
+    log_returns = np.diff(np.log(series))
+    s0 = series[0] if s0 is None else s0
+    n_steps = len(log_returns) if n_steps is None else n_steps
+
+    if rng is None:
+        if n_steps > len(log_returns):
+            raise Exception("invalid n_steps {}. series has {} steps".format(n_steps, len(log_returns)))
+        return _from_log_returns(s0, np.broadcast_to(log_returns[:n_steps], (n_paths, n_steps)))
+
+    block_size = min(block_size, len(log_returns))
+    n_blocks = -(-n_steps // block_size)
+    starts = rng.integers(0, len(log_returns) - block_size + 1, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_steps]
+    return _from_log_returns(s0, log_returns[idx])
+
+
+"""Driving pools"""
+
+
+def drive(pool, arbitrager, path):  # one path on one pool: oracle update, then arbitrage, per step
+    gains = []
+    for oracle_ratio in np.asarray(path)[1:].tolist():
+        arbitrager.update(oracle_ratio)
+        gain = arbitrager.arbitrage(pool)
+        gains.append(gain if (gain is not None) and (gain > 0) else 0.)  # traded only if > 0
+    return gains
+
+
+def simulate_paths(paths, amount_ETH, amount_ERC20, fee=0.003, arbitrager=None):
+    """
+    Every path drives its own fresh pool (ETH, ERC20), all paths at once on a
+    PoolBank: per step, one `Arbitrager.arbitrage_bank` over every pool.
+    Returns {ETH, ERC20, profits, n_trades, impermanent_loss}, per path; the
+    impermanent loss is the LP's final value over holding, - 1 (fees included).
+    """
+    paths = np.asarray(paths, dtype=np.float64)
+    n_paths, n_steps = paths.shape[0], paths.shape[1] - 1
+    bank = PoolBank(np.full(n_paths, amount_ETH), np.full(n_paths, amount_ERC20), np.full(n_paths, amount_ETH),
+                    fees=fee)
+    arbitrager = Arbitrager(0., paths[0, 0]) if arbitrager is None else arbitrager
+
+    profits, n_trades = np.zeros(n_paths), np.zeros(n_paths, dtype=np.int64)
+    for t in range(1, n_steps + 1):
+        directions, Ns, gains = arbitrager.arbitrage_bank(bank, paths[:, t])
+        traded = directions != NO_TRADE
+        profits += np.where(traded, gains, 0.)
+        n_trades += traded
+
+    final_ratios = paths[:, -1]
+    value_pool = bank.ETH * final_ratios + bank.ERC20
+    value_hold = amount_ETH * final_ratios + amount_ERC20
+    return {"ETH": bank.ETH, "ERC20": bank.ERC20, "profits": profits, "n_trades": n_trades,
+            "impermanent_loss": value_pool / value_hold - 1.}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from uniswap import Uniswap
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=950327)
+    parser.add_argument('--paths', type=int, default=100000)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--model', choices=['gbm', 'jump', 'historical'], default='gbm')
+    args = parser.parse_args()
+    print(args)
+
+    rng = np.random.default_rng(args.seed)
+
+    """Paths"""
+    start = time.perf_counter()
+    if args.model == 'gbm':
+        paths = gbm(rng, args.paths, args.steps, s0=200., sigma=0.01)
+    elif args.model == 'jump':
+        paths = jump_diffusion(rng, args.paths, args.steps, s0=200., sigma=0.01, jump_rate=0.02)
+    else:
+        series = gbm(rng, 1, 10000, s0=200., sigma=0.01)[0]  # stands in for a recorded series
+        paths = historical(series, args.paths, args.steps, s0=200., rng=rng)
+    print(">>> {} paths x {} steps in {:.3f}s".format(args.paths, args.steps, time.perf_counter() - start))
+
+    """Batched"""
+    start = time.perf_counter()
+    results = simulate_paths(paths, 1000000, 200000000)
+    print(">>> simulated in {:.3f}s".format(time.perf_counter() - start))
+    for key in ("profits", "impermanent_loss"):
+        print(">>> {}: mean {:.6g}, p5 {:.6g}, p50 {:.6g}, p95 {:.6g}".format(
+            key, results[key].mean(), *np.percentile(results[key], [5, 50, 95])))
+
+    """The same first path, one pool at a time (`best_trades` also tries N + 1, so reserves may differ slightly)"""
+    us = Uniswap('-1', 1000000, 200000000, 1000000)
+    gains = drive(us, Arbitrager(0., 200.), paths[0])
+    batched = (int(results["ETH"][0]), int(results["ERC20"][0]), float(results["profits"][0]))
+    print(">>> path 0: object {} vs batched {}".format((us.ETH, us.ERC20, sum(gains)), batched))
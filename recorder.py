@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+POOL_COLUMNS = {"ETH": np.int64, "ERC20": np.int64, "k": np.float64, "LT": np.int64}  # Uniswap._update
+WEI_POOL_COLUMNS = {"ETH": np.float64, "ERC20": np.float64, "k": np.float64, "LT": np.float64}  # beyond int64
+ARBITRAGER_COLUMNS = {"gain": np.float64, "balance_ERC20": np.float64}  # Arbitrager.arbitrage
+
+
+class Recorder:  # bounded-memory trajectory recorder, one .npy file per column
+    def __init__(self,
+                 path,      # directory of <column>.npy
+                 columns,   # {name: dtype}, in `record` order
+                 chunk_size=65536,  # rows buffered in memory before a flush
+                 decimation=1       # keep every n-th row
+                 ):
+
+        self.path, self.chunk_size, self.decimation = path, chunk_size, decimation
+        self.columns = list(columns.keys())
+        self.dtypes = [np.dtype(dtype) for dtype in columns.values()]
+        self.buffers = [np.empty(chunk_size, dtype=dtype) for dtype in self.dtypes]
+        self.n_buffered, self.n_flushed, self.n_seen = 0, 0, 0
+
+        os.makedirs(path, exist_ok=True)
+        self.files = []
+        for column, dtype in zip(self.columns, self.dtypes):
+            f = open(os.path.join(path, column + '.npy'), 'wb')
+            self._write_header(f, dtype, 0)
+            self.files.append(f)
+        self.header_size = self.files[0].tell() if self.files else 0
+
+    @staticmethod
+    def _write_header(f, dtype, n):  # 1-D .npy header; its size does not depend on `n`
+        np.lib.format.write_array_header_1_0(f, {
+            'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (n,)})
+
+    def record(self, *values):
+        self.n_seen += 1
+        if (self.n_seen - 1) % self.decimation:
+            return
+
+        for buffer, value in zip(self.buffers, values):
+            buffer[self.n_buffered] = value
+        self.n_buffered += 1
+        if self.n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for f, buffer in zip(self.files, self.buffers):
+            f.write(buffer[:self.n_buffered].tobytes())
+        self.n_flushed += self.n_buffered
+        self.n_buffered = 0
+
+    def close(self):
+        if self.files is None:
+            return
+
+        self.flush()
+        for f, dtype in zip(self.files, self.dtypes):
+            f.seek(0)
+            self._write_header(f, dtype, self.n_flushed)
+            if f.tell() != self.header_size:
+                raise Exception("invalid .npy header size. {} != {}".format(f.tell(), self.header_size))
+            f.close()
+        self.files = None
+
+    def __len__(self):
+        return self.n_flushed + self.n_buffered
+
+    def __deepcopy__(self, memo):  # a copied pool is not recorded
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load(path, columns=None, mmap_mode='r'):  # {column: array}, memory-mapped by default
+    if columns is None:
+        columns = sorted(name[:-len('.npy')] for name in os.listdir(path) if name.endswith('.npy'))
+    return {column: np.load(os.path.join(path, column + '.npy'), mmap_mode=mmap_mode) for column in columns}
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    from uniswap import Uniswap
+
+    random.seed(12345)
+
+    """init"""
+    us = Uniswap('-1', 100000, 20000000, 1000000)  # 1:200
+    path = tempfile.mkdtemp()
+    us.recorder = Recorder(path, POOL_COLUMNS, decimation=10)
+
+    """Txs"""
+    start = time.perf_counter()
+    with us.recorder:
+        for _ in range(1000000):
+            if random.random() < 0.5:
+                us.ETH_to_ERC20(2)
+            else:
+                us.ERC20_to_ETH_exact(2)
+    print("1000000 txs recorded in {:.3f}s".format(time.perf_counter() - start))
+
+    trajectory = load(path)
+    print({column: (len(values), values[-1]) for column, values in trajectory.items()})
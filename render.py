@@ -0,0 +1,247 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+"""Results (written by the simulators)"""
+
+
+def save_results(path, name, **series):
+    os.makedirs(path, exist_ok=True)
+    np.savez(os.path.join(path, name + '.npz'), **series)
+
+
+def load_results(path, name):
+    with np.load(os.path.join(path, name + '.npz')) as results:
+        return {key: results[key] for key in results.files}
+
+
+def downsample(ys, xs=None, max_points=4000):  # min and max of each bucket, so spikes survive
+    ys = np.asarray(ys)
+    xs = np.arange(len(ys)) if xs is None else np.asarray(xs)
+    if len(ys) <= max_points:
+        return xs, ys
+
+    edges = np.linspace(0, len(ys), max_points // 2 + 1).astype(np.int64)
+    buckets = list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+    mins = [start + int(np.argmin(ys[start:end])) for start, end in buckets]
+    maxs = [start + int(np.argmax(ys[start:end])) for start, end in buckets]
+    idx = np.unique(np.array([0] + mins + maxs + [len(ys) - 1]))
+    return xs[idx], ys[idx]
+
+
+"""Figures"""
+
+
+def _twin_ETHNERC20(plt, data, max_points, loc=None):
+    fig, ax1 = plt.subplots()
+
+    ln1 = ax1.plot(*downsample(data['ETHs'], max_points=max_points), 'b-', label='ETH')
+    ax1.set_xlabel('transaction')
+    ax1.set_ylabel('ETH', color='b')
+    ax1.tick_params('y', colors='b')
+
+    ax2 = ax1.twinx()
+    ln2 = ax2.plot(*downsample(data['ERC20s'], max_points=max_points), 'r-', label='ERC20')
+    ax2.set_ylabel('ERC20', color='r')
+    ax2.tick_params('y', colors='r')
+
+    lns = ln1 + ln2
+    labs = [ln.get_label() for ln in lns]
+    ax1.legend(lns, labs, loc=loc)
+    return ax1
+
+
+def _vlines(ax, xs):  # one collection instead of an `axvline` per x
+    if len(xs):
+        ax.vlines(xs, 0, 1, transform=ax.get_xaxis_transform(), color='gray', linestyle=':', linewidth=2)
+
+
+def Swap_k_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(*downsample(data['ks'], max_points=max_points), 'c-', label='k')
+    ax1.set_xlabel('transaction')
+    ax1.set_ylim((1998.9e11, 2001.6e11))
+    ax1.set_ylabel('k')
+
+    plt.legend()
+
+
+def Swap_ETHNERC20_Curve(plt, data, max_points):
+    _twin_ETHNERC20(plt, data, max_points, loc='upper left')
+
+
+def ETH2ERC20_Swap_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+
+    ln1 = ax1.plot([1, 1000000], [200, 200], 'r-', label='original')  # straight line
+    ax1.set_xlabel('ETH')
+    ax1.set_ylabel('ERC20', color='r')
+    ax1.set_ylim((95, 205))
+    ax1.tick_params('y', colors='r')
+
+    ax2 = ax1.twinx()
+    ln2 = ax2.plot(*downsample(data['amount_ERC20s'], data['delta_ETHs'], max_points), 'b-', label='uniswap')
+    ax2.set_ylabel('ERC20', color='b')
+    ax2.set_ylim((95, 205))
+    ax2.tick_params('y', colors='b')
+
+    lns = ln1 + ln2
+    labs = [ln.get_label() for ln in lns]
+    ax1.legend(lns, labs)
+
+
+def ERC202ETH_Swap_Curve(plt, data, max_points):
+    n_err = int(data['n_err'])
+
+    fig, ax1 = plt.subplots()
+
+    ln1 = ax1.plot([1, 200000000], [0.005, 0.005], 'r-', label='original')  # straight line
+    ax1.set_xlabel('ERC20')
+    ax1.set_ylabel('ETH', color='r')
+    ax1.set_ylim((0.0022, 0.0052))
+    ax1.tick_params('y', colors='r')
+
+    ax2 = ax1.twinx()
+    ln2 = ax2.plot(*downsample(data['amount_ETHs'][n_err:], data['delta_ERC20s'][n_err:], max_points),
+                   'b-', label='uniswap')
+    ax2.set_ylabel('ETH', color='b')
+    ax2.set_ylim((0.0022, 0.0052))
+    ax2.tick_params('y', colors='b')
+
+    lns = ln1 + ln2
+    labs = [ln.get_label() for ln in lns]
+    ax1.legend(lns, labs)
+
+
+def LP_k_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(*downsample(data['ks'], max_points=max_points), 'c-', label='k')
+    ax1.set_xlabel('transaction')
+    ax1.set_ylabel('k')
+
+    plt.legend()
+
+    _vlines(ax1, [1000, 2000])
+
+
+def LP_ETHNERC20_Curve(plt, data, max_points):
+    ax1 = _twin_ETHNERC20(plt, data, max_points)
+    _vlines(ax1, [1000, 2000])
+
+
+def LP_LT_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(*downsample(data['LTs'], data['input_ETHs'], max_points), 'b-', label='LT')
+    ax1.set_xlabel('ETH')
+    ax1.set_ylabel('LT')
+
+    plt.legend()
+
+
+def Fee_Gain_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(data['fees'], data['Gains'], 'r-', label='ERC20')
+    ax1.set_xlabel('fee')
+    ax1.set_ylabel('ERC20')
+
+    plt.legend()
+
+    _vlines(ax1, [0.003])
+
+
+def balance(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(*downsample(data['balances'], max_points=max_points), 'r-', label='balance')
+    ax1.set_xlabel('transaction')
+    ax1.set_ylabel('ERC20')
+
+    plt.legend()
+
+    _vlines(ax1, data['Timings'])
+
+
+def k_Curve(plt, data, max_points):
+    fig, ax1 = plt.subplots()
+    ln1 = ax1.plot(*downsample(data['ks'], max_points=max_points), 'c-', label='k')
+    ax1.set_xlabel('transaction')
+    ax1.set_ylabel('k')
+
+    plt.legend(loc='lower right')
+
+    _vlines(ax1, data['Timings'])
+
+
+def ETHNERC20_Curve(plt, data, max_points):
+    ax1 = _twin_ETHNERC20(plt, data, max_points, loc='lower right')
+    _vlines(ax1, data['Timings'])
+
+
+FIGURES = {  # results name -> figures (PNG name = function name)
+    'Swap_k_Curve': [Swap_k_Curve, Swap_ETHNERC20_Curve],
+    'ETH2ERC20_Swap_Curve': [ETH2ERC20_Swap_Curve],
+    'ERC202ETH_Swap_Curve': [ERC202ETH_Swap_Curve],
+    'LP_k_ETHNERC20_Curve': [LP_k_Curve, LP_ETHNERC20_Curve],
+    'LP_LT_Curve': [LP_LT_Curve],
+    'fee_Gain_Curve': [Fee_Gain_Curve],
+    'Arbitraging_Curve': [balance, k_Curve, ETHNERC20_Curve],
+}
+
+
+"""Rendering"""
+
+
+def _pyplot(display=False):  # lazy: importing matplotlib is slow
+    import matplotlib
+    if not display:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render(path, name, figure, display=False, dpi=300, max_points=4000):
+    plt = _pyplot(display)
+    figure(plt, load_results(path, name), max_points)
+
+    if display:
+        plt.show()
+    else:
+        fig = plt.gcf()  # get current figure
+        fig.set_size_inches(8, 6)
+        fig.savefig(os.path.join(path, figure.__name__ + '.png'), format='png', dpi=dpi)
+    plt.close('all')
+    return figure.__name__
+
+
+def _render_task(task):
+    return render(*task)
+
+
+def render_all(path, display=False, dpi=300, max_points=4000, n_workers=None):
+    """Render every figure whose results exist in `path`, in parallel unless displaying."""
+    tasks = [(path, name, figure, display, dpi, max_points)
+             for name, figures in FIGURES.items() if os.path.exists(os.path.join(path, name + '.npz'))
+             for figure in figures]
+
+    if display or n_workers == 1:
+        return [_render_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_render_task, tasks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='*', default=['plots/uniswap', 'plots/arbitrager'])  # results of the simulators
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--max-points', type=int, default=4000)  # per series, after downsampling
+    parser.add_argument('--workers', type=int)  # default: all cores
+    parser.add_argument('--no-save', action='store_true')  # display instead of saving
+    args = parser.parse_args()
+    print(args)
+
+    for path in args.paths:
+        rendered = render_all(path, display=args.no_save, dpi=args.dpi,
+                              max_points=args.max_points, n_workers=args.workers)
+        print(">>> {}: {}".format(path, ', '.join(rendered)))
@@ -0,0 +1,239 @@
+from math import floor
+
+import numpy as np
+
+try:  # optional: compiled kernel
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+ETH_TO_ERC20, ERC20_TO_ETH = 0, 1  # direction: which asset goes into the pool
+MAX_EXACT_INT = 2 ** 53  # int64 -> float64 is exact below this
+INT64_MAX = 2 ** 63 - 1
+
+
+def _replay_kernel(ETH, ERC20, gamma, directions, amounts, exacts, ETHs, ERC20s, max_X):
+    """Apply trades in order; returns (ETH, ERC20, n_done). n_done < len(directions) on a rejected trade."""
+    for i in range(len(directions)):
+        if directions[i] == ETH_TO_ERC20:
+            X, Y = ETH, ERC20
+        else:
+            X, Y = ERC20, ETH
+
+        # Validity check
+        if (X == 0) or (Y == 0):
+            return ETH, ERC20, i
+
+        if exacts[i]:  # `_get_output_price`
+            delta_Y = amounts[i]
+            if delta_Y >= Y:
+                return ETH, ERC20, i
+            beta = delta_Y / Y
+            delta_X = floor(beta / ((1. - beta) * gamma) * X) + 1
+        else:  # `_get_input_price`
+            delta_X = amounts[i]
+            alpha = delta_X / X
+            delta_Y = floor(alpha * gamma / (1. + alpha * gamma) * Y)
+            if delta_Y >= Y:
+                return ETH, ERC20, i
+
+        if X + delta_X >= max_X:  # leave the rest to the exact (Python number) kernel
+            return ETH, ERC20, i
+
+        if directions[i] == ETH_TO_ERC20:
+            ETH, ERC20 = X + delta_X, Y - delta_Y
+        else:
+            ETH, ERC20 = Y - delta_Y, X + delta_X
+
+        if ETHs is not None:
+            ETHs[i], ERC20s[i] = ETH, ERC20
+
+    return ETH, ERC20, len(directions)
+
+
+def _replay_kernel_int(ETH, ERC20, gamma_num, gamma_den, directions, amounts, exacts, ETHs, ERC20s, bool_check):
+    """Integer-mode `_replay_kernel`. With `bool_check`, stops before any int64 overflow."""
+    for i in range(len(directions)):
+        if directions[i] == ETH_TO_ERC20:
+            X, Y = ETH, ERC20
+        else:
+            X, Y = ERC20, ETH
+
+        # Validity check
+        if (X == 0) or (Y == 0):
+            return ETH, ERC20, i
+
+        if exacts[i]:  # getOutputPrice
+            delta_Y = amounts[i]
+            if delta_Y >= Y:
+                return ETH, ERC20, i
+            if bool_check and ((delta_Y > 0 and X > INT64_MAX // delta_Y)
+                               or X * delta_Y > INT64_MAX // gamma_den
+                               or Y - delta_Y > INT64_MAX // gamma_num):
+                return ETH, ERC20, i
+            delta_X = X * delta_Y * gamma_den // ((Y - delta_Y) * gamma_num) + 1
+        else:  # getInputPrice
+            delta_X = amounts[i]
+            if bool_check and (delta_X > INT64_MAX // gamma_num
+                               or delta_X * gamma_num > INT64_MAX // Y
+                               or X > (INT64_MAX - delta_X * gamma_num) // gamma_den):
+                return ETH, ERC20, i
+            delta_X_with_fee = delta_X * gamma_num
+            delta_Y = delta_X_with_fee * Y // (X * gamma_den + delta_X_with_fee)
+            if delta_Y >= Y:
+                return ETH, ERC20, i
+
+        if bool_check and X > INT64_MAX - delta_X:
+            return ETH, ERC20, i
+
+        if directions[i] == ETH_TO_ERC20:
+            ETH, ERC20 = X + delta_X, Y - delta_Y
+        else:
+            ETH, ERC20 = Y - delta_Y, X + delta_X
+
+        if ETHs is not None:
+            ETHs[i], ERC20s[i] = ETH, ERC20
+
+    return ETH, ERC20, len(directions)
+
+
+_replay_kernel_jit = njit(cache=True)(_replay_kernel) if njit is not None else None
+_replay_kernel_int_jit = njit(cache=True)(_replay_kernel_int) if njit is not None else None
+
+
+def _fits_kernel(pool, amounts, max_int):
+    return (isinstance(pool.ETH, int) and isinstance(pool.ERC20, int)
+            and np.issubdtype(amounts.dtype, np.integer)
+            and 0 <= pool.ETH < max_int and 0 <= pool.ERC20 < max_int
+            and (len(amounts) == 0 or (amounts.min() >= 0 and amounts.max() < max_int)))
+
+
+def replay(pool, directions, amounts, exacts, bool_fee=True, bool_trajectory=False, bool_jit=True):
+    """
+    Apply a whole trade sequence to `pool`, equivalent to calling
+        ETH_to_ERC20 / ETH_to_ERC20_exact / ERC20_to_ETH / ERC20_to_ETH_exact
+    once per trade. `directions` holds ETH_TO_ERC20 or ERC20_TO_ETH, `amounts` the
+    input amount (or the output amount if `exacts` is set).
+
+    Reserves are kept in int64 by the compiled kernel only while every value stays
+    below 2 ** 53, where the float math is bit-identical to the object path;
+    from the first trade that would leave that range on, the pure-Python kernel
+    takes over on Python numbers. Pools in integer mode (`bool_int`) use the
+    contract formulas, in int64 until an intermediate product would overflow.
+
+    An attached LPLedger accrues the fees of every trade and a Recorder gets
+    one row per trade, as with the calls; an EventLog gets a checkpoint of the
+    final state instead of the trades.
+
+    Returns (ETH, ERC20) or (ETH, ERC20, ETHs, ERC20s) with the post-trade reserves.
+    """
+    directions = np.asarray(directions, dtype=np.int8)
+    amounts = np.asarray(amounts)
+    exacts = np.asarray(exacts, dtype=np.bool_)
+    if not (len(directions) == len(amounts) == len(exacts)):
+        raise Exception("invalid trade sequence. lengths {}, {}, {}".format(
+            len(directions), len(amounts), len(exacts)))
+
+    if pool.invariant is not None:
+        raise Exception("invalid pool. replay only supports x * y = k pools")
+
+    n = len(directions)
+    if pool.bool_int:
+        gamma_num, gamma_den = pool._get_gamma(bool_fee)
+        kernel, kernel_jit, max_int = _replay_kernel_int, _replay_kernel_int_jit, INT64_MAX
+        params, jit_limit, py_limit = (gamma_num, gamma_den), True, False
+    else:
+        gamma = (1. - pool.fee) if bool_fee else (1.)
+        kernel, kernel_jit, max_int = _replay_kernel, _replay_kernel_jit, MAX_EXACT_INT
+        params, jit_limit, py_limit = (gamma,), MAX_EXACT_INT, float('inf')
+
+    ETH, ERC20, n_done = pool.ETH, pool.ERC20, 0
+    ETHs, ERC20s = [], []
+    bool_reserves = bool_trajectory or (pool.ledger is not None) or (pool.recorder is not None)  # after each trade
+
+    if bool_jit and (kernel_jit is not None) and _fits_kernel(pool, amounts, max_int):
+        jit_ETHs = np.empty(n, dtype=np.int64) if bool_reserves else None
+        jit_ERC20s = np.empty(n, dtype=np.int64) if bool_reserves else None
+        ETH, ERC20, n_done = kernel_jit(
+            ETH, ERC20, *params, directions, amounts.astype(np.int64), exacts, jit_ETHs, jit_ERC20s, jit_limit)
+        ETH, ERC20 = int(ETH), int(ERC20)
+        if bool_reserves:
+            ETHs, ERC20s = jit_ETHs[:n_done].tolist(), jit_ERC20s[:n_done].tolist()
+
+    if n_done < n:
+        py_ETHs = [None] * (n - n_done) if bool_reserves else None
+        py_ERC20s = [None] * (n - n_done) if bool_reserves else None
+        ETH, ERC20, n_py = kernel(
+            ETH, ERC20, *params, directions[n_done:].tolist(), amounts[n_done:].tolist(), exacts[n_done:].tolist(),
+            py_ETHs, py_ERC20s, py_limit)
+        if bool_reserves:
+            ETHs += py_ETHs[:n_py]
+            ERC20s += py_ERC20s[:n_py]
+        n_done += n_py
+
+    if n_done:
+        if pool.recorder is not None:  # a row per trade; `_update` records the last
+            for ETH_i, ERC20_i in zip(ETHs[:n_done - 1], ERC20s[:n_done - 1]):
+                pool.recorder.record(ETH_i, ERC20_i, ETH_i * ERC20_i, pool.LT)
+        if pool.ledger is not None:  # inputs of the trades, from the reserves
+            deltas_ETH_in, deltas_ERC20_in = [], []
+            for direction, ETH_i, ERC20_i, ETH_prev, ERC20_prev in zip(
+                    directions[:n_done].tolist(), ETHs, ERC20s, [pool.ETH] + ETHs, [pool.ERC20] + ERC20s):
+                if direction == ETH_TO_ERC20:
+                    deltas_ETH_in.append(ETH_i - ETH_prev)
+                else:
+                    deltas_ERC20_in.append(ERC20_i - ERC20_prev)
+
+        pool._update(ETH, ERC20)  # Pool update
+        if pool.ledger is not None:
+            pool.ledger.on_swaps(deltas_ETH_in, deltas_ERC20_in, bool_fee)
+        if pool.event_log is not None:  # the trades are not events: the log resumes from this state
+            pool.event_log.checkpoint(pool)
+
+    if n_done < n:
+        raise Exception("invalid trade at index {}. ETH: {}, ERC20: {}, amount: {}".format(
+            n_done, ETH, ERC20, amounts[n_done]))
+
+    if bool_trajectory:
+        return ETH, ERC20, np.asarray(ETHs), np.asarray(ERC20s)
+    return ETH, ERC20
+
+
+if __name__ == "__main__":
+    import time
+    from copy import deepcopy
+
+    from uniswap import Uniswap
+
+    rng = np.random.default_rng(12345)
+
+    """init"""
+    us = Uniswap('-1', 100000, 20000000, 1000000)  # 1:200
+    us.join('0', 2000, 400001)
+
+    """Txs"""
+    n = 1000000
+    directions = np.where(rng.random(n) < 0.5, ETH_TO_ERC20, ERC20_TO_ETH)
+    amounts = np.full(n, 2)
+    exacts = directions == ERC20_TO_ETH  # ETH_to_ERC20(2) or ERC20_to_ETH_exact(2)
+
+    ref = deepcopy(us)
+    start = time.perf_counter()
+    for i in range(n):
+        if directions[i] == ETH_TO_ERC20:
+            ref.ETH_to_ERC20(2)
+        else:
+            ref.ERC20_to_ETH_exact(2)
+    print("object path\t{:.3f}s".format(time.perf_counter() - start))
+
+    for bool_jit in (False, True):
+        tmp = deepcopy(us)
+        replay(tmp, directions[:10], amounts[:10], exacts[:10], bool_jit=bool_jit)  # warm-up (jit compile)
+        tmp = deepcopy(us)
+        start = time.perf_counter()
+        replay(tmp, directions, amounts, exacts, bool_jit=bool_jit)
+        print("replay (jit={})\t{:.3f}s".format(bool_jit, time.perf_counter() - start))
+        assert (tmp.ETH, tmp.ERC20, tmp.k) == (ref.ETH, ref.ERC20, ref.k)
+
+    ref.print_pool_state()
@@ -0,0 +1,309 @@
+import bisect
+import itertools
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Client, Listener
+
+from exchange import Exchange
+
+
+def get_legs(path):  # [(token, method)] of the route ERC20 -> ETH -> ERC20 (-> ETH -> ERC20 ...)
+    if len(path) < 2:
+        raise Exception("invalid path {}".format(path))
+    legs = [(path[0], 'ERC20_to_ETH')]
+    for token in path[1:-1]:
+        legs += [(token, 'ETH_to_ERC20'), (token, 'ERC20_to_ETH')]
+    legs.append((path[-1], 'ETH_to_ERC20'))
+    return legs
+
+
+class Shard:  # the pools of one worker; its methods are the messages the coordinator sends
+    def __init__(self):
+        self.exchange = Exchange()
+        self.pending = {}  # txid -> [(pool, snapshot_id)] of prepared legs
+        self.locks = {}  # token -> txid holding its pool between prepare and commit / abort
+
+    def create_pool(self, token, *args, **kwargs):
+        self.exchange.create_pool(token, *args, **kwargs)
+
+    def apply_block(self, txs):  # [(token, method, args)] in order -> [(result, bool_success)]
+        results = []
+        for token, method, args in txs:
+            try:
+                if token in self.locks:
+                    raise Exception("pool {} locked by tx {}".format(token, self.locks[token]))
+                results.append((getattr(self.exchange.get_pool(token), method)(*args), True))
+            except Exception as e:
+                results.append((str(e), False))
+        return results
+
+    """Two-phase routes"""
+
+    def prepare(self, txid, token, method, amount):  # apply one leg, undoable until commit / abort
+        if self.locks.get(token, txid) != txid:
+            raise Exception("pool {} locked by tx {}".format(token, self.locks[token]))
+        pool = self.exchange.get_pool(token)
+        snapshot_id = pool.snapshot()
+        try:
+            amount_out = getattr(pool, method)(amount)
+        except Exception:
+            pool.restore(snapshot_id)
+            raise
+        self.locks[token] = txid
+        self.pending.setdefault(txid, []).append((pool, snapshot_id))
+        return amount_out
+
+    def _unlock(self, txid):
+        for token in [token for token, holder in self.locks.items() if holder == txid]:
+            del self.locks[token]
+
+    def commit(self, txid):
+        for pool, snapshot_id in reversed(self.pending.pop(txid, [])):
+            if snapshot_id == 0:  # outermost: stop journaling
+                pool.release()
+        self._unlock(txid)
+
+    def abort(self, txid):
+        for pool, snapshot_id in reversed(self.pending.pop(txid, [])):
+            pool.restore(snapshot_id)
+        self._unlock(txid)
+
+    def route(self, txid, path, amount_in, min_out=None):  # every leg on this shard: both phases at once
+        amount = amount_in
+        try:
+            for token, method in get_legs(path):
+                amount = self.prepare(txid, token, method, amount)
+            if (min_out is not None) and (amount < min_out):
+                raise Exception("invalid delta_ERC20_out. {} < {}".format(amount, min_out))
+        except Exception as e:
+            self.abort(txid)
+            return str(e), False
+        self.commit(txid)
+        return amount, True
+
+    """State"""
+
+    def get_states(self, tokens=None):  # token -> (ETH, ERC20, LT, fee)
+        pools = self.exchange.token_to_pool
+        return {token: (pools[token].ETH, pools[token].ERC20, pools[token].LT, pools[token].fee)
+                for token in (pools if tokens is None else tokens)}
+
+
+def serve_connection(conn):  # worker loop: (method, args) -> ('ok', result) or ('error', message)
+    shard = Shard()
+    while True:
+        method, args = conn.recv()
+        if method == 'close':
+            conn.close()
+            return
+        try:
+            conn.send(('ok', getattr(shard, method)(*args)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+def serve(address, authkey):  # a worker on another host: `ShardedExchange(addresses=[...], authkey=...)` connects here
+    if not authkey:  # connections run the methods they send
+        raise Exception("invalid authkey. required to listen on {}".format(address))
+    with Listener(address, authkey=authkey) as listener:
+        serve_connection(listener.accept())
+
+
+class ShardedExchange:
+    """
+    An Exchange whose pools are partitioned over worker processes, one Shard
+    each, driven over multiprocessing connections (local pipes, or sockets to
+    `serve` workers, with their authkey). Txs are collected into a block:
+    `run_block` applies it in submission order, split at its multi-hop routes:
+    the single-pool txs between two routes run on every shard in parallel, then
+    the route, over several shards in two phases (prepare every leg, holding its
+    pool, then commit or abort all).
+    """
+    def __init__(self, n_shards=2, addresses=None, authkey=None):
+        if addresses is None:
+            self.conns, self.workers = [], []
+            for _ in range(n_shards):
+                conn, worker_conn = Pipe()
+                worker = Process(target=serve_connection, args=(worker_conn,), daemon=True)
+                worker.start()
+                self.conns.append(conn)
+                self.workers.append(worker)
+        else:
+            if not authkey:
+                raise Exception("invalid authkey. required to connect to {}".format(addresses))
+            self.conns, self.workers = [Client(address, authkey=authkey) for address in addresses], []
+
+        self.shard_of = {}  # token -> shard
+        self._txids = itertools.count()
+        self.txs = [[] for _ in self.conns]  # per shard: (token, method, args) of this block
+        self.tx_indices = [[] for _ in self.conns]  # per shard: submission index of each tx
+        self.routes = []  # (submission index, path, amount_in, min_out)
+        self.n_submitted = 0
+        self.n_cross_shard = 0
+
+    def _call(self, shard, method, *args):
+        self.conns[shard].send((method, args))
+        status, result = self.conns[shard].recv()
+        if status == 'error':
+            raise Exception(result)
+        return result
+
+    def _call_all(self, method, args_per_shard):  # the same method on every shard, in parallel
+        for conn, args in zip(self.conns, args_per_shard):
+            conn.send((method, args))
+        results = []
+        for conn in self.conns:
+            status, result = conn.recv()
+            if status == 'error':
+                raise Exception(result)
+            results.append(result)
+        return results
+
+    def __len__(self):
+        return len(self.shard_of)
+
+    def create_pool(self, token, address, amount_ETH, amount_ERC20, init_LT, fee=0.003, bool_int=False, shard=None):
+        if token in self.shard_of:
+            raise Exception("pool already exists for token {}".format(token))
+        shard = len(self.shard_of) % len(self.conns) if shard is None else shard  # round-robin
+        self._call(shard, 'create_pool', token, address, amount_ETH, amount_ERC20, init_LT, fee, bool_int)
+        self.shard_of[token] = shard
+        return shard
+
+    """Blocks"""
+
+    def submit(self, token, method, *args):  # a call of one pool's method ('ETH_to_ERC20', 'join', ...)
+        if token not in self.shard_of:
+            raise Exception("invalid token {}".format(token))
+        shard = self.shard_of[token]
+        self.txs[shard].append((token, method, args))
+        self.tx_indices[shard].append(self.n_submitted)
+        self.n_submitted += 1
+
+    def submit_route(self, path, amount_in, min_out=None):  # ERC20 of path[0] in, ERC20 of path[-1] out
+        for token in path:
+            if token not in self.shard_of:
+                raise Exception("invalid token {}".format(token))
+        self.routes.append((self.n_submitted, list(path), amount_in, min_out))
+        self.n_submitted += 1
+
+    def _route(self, path, amount_in, min_out):
+        txid = next(self._txids)
+        legs = get_legs(path)
+        shards = sorted({self.shard_of[token] for token, _ in legs})
+        if len(shards) == 1:
+            return self._call(shards[0], 'route', txid, path, amount_in, min_out)
+
+        self.n_cross_shard += 1
+        amount = amount_in
+        try:  # phase 1: each leg takes the previous one's output
+            for token, method in legs:
+                amount = self._call(self.shard_of[token], 'prepare', txid, token, method, amount)
+            if (min_out is not None) and (amount < min_out):
+                raise Exception("invalid delta_ERC20_out. {} < {}".format(amount, min_out))
+        except Exception as e:
+            for shard in shards:
+                self._call(shard, 'abort', txid)
+            return str(e), False
+        for shard in shards:  # phase 2
+            self._call(shard, 'commit', txid)
+        return amount, True
+
+    def run_block(self):
+        """Apply the submitted txs; returns (result or error message, bool_success) per tx, in submission order."""
+        results = [None] * self.n_submitted
+        starts = [0] * len(self.conns)  # per shard: its first tx not applied
+        for i, path, amount_in, min_out in self.routes + [(self.n_submitted, None, None, None)]:
+            ends = [bisect.bisect_left(indices, i) for indices in self.tx_indices]  # txs submitted before the route
+            if ends != starts:
+                segments = [(txs[start:end],) for txs, start, end in zip(self.txs, starts, ends)]
+                for indices, start, end, shard_results in zip(
+                        self.tx_indices, starts, ends, self._call_all('apply_block', segments)):
+                    for j, result in zip(indices[start:end], shard_results):
+                        results[j] = result
+                starts = ends
+            if path is not None:
+                results[i] = self._route(path, amount_in, min_out)
+
+        self.txs = [[] for _ in self.conns]
+        self.tx_indices = [[] for _ in self.conns]
+        self.routes, self.n_submitted = [], 0
+        return results
+
+    """State"""
+
+    def get_states(self):  # token -> (ETH, ERC20, LT, fee), of every pool
+        states = {}
+        for shard_states in self._call_all('get_states', [() for _ in self.conns]):
+            states.update(shard_states)
+        return states
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(('close', ()))
+            conn.close()
+        for worker in self.workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import random
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=950327)
+    parser.add_argument('--pools', type=int, default=1000)
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--txs', type=int, default=20000)  # per block
+    parser.add_argument('--route-prob', type=float, default=0.001)  # share of txs that are 2-hop routes
+    args = parser.parse_args()
+    print(args, "{} cores".format(os.cpu_count()))
+
+    final_states = []
+    for n_shards in sorted({1, 2, os.cpu_count() or 1}):
+        rng = random.Random(args.seed)
+        with ShardedExchange(n_shards) as exchange:
+            for token in range(args.pools):
+                exchange.create_pool(token, '-1', 1000000, 200000000, 1000000)
+
+            start = time.perf_counter()
+            n_failed, results = 0, []
+            for _ in range(args.blocks):
+                for _ in range(args.txs):
+                    if rng.random() < args.route_prob:
+                        exchange.submit_route(rng.sample(range(args.pools), 2), rng.randint(1, 200000))
+                    elif rng.random() < 0.5:
+                        exchange.submit(rng.randrange(args.pools), 'ETH_to_ERC20', rng.randint(1, 1000))
+                    else:
+                        exchange.submit(rng.randrange(args.pools), 'ERC20_to_ETH_exact', rng.randint(1, 1000))
+                results += exchange.run_block()
+            n_failed = sum(not bool_success for _, bool_success in results)
+            elapsed = time.perf_counter() - start
+
+            print(">>> {} shards: {} txs ({} failed, {} cross-shard routes) in {:.3f}s ({:.0f} txs/s)".format(
+                n_shards, args.blocks * args.txs, n_failed, exchange.n_cross_shard, elapsed,
+                args.blocks * args.txs / elapsed))
+            final_states.append(exchange.get_states())
+    print(">>> same final state for every shard count: {}".format(all(s == final_states[0] for s in final_states)))
+
+    """Reference: one Shard, every tx applied as submitted"""
+    rng, shard = random.Random(args.seed), Shard()
+    for token in range(args.pools):
+        shard.create_pool(token, '-1', 1000000, 200000000, 1000000)
+    reference = []
+    for txid in range(args.blocks * args.txs):
+        if rng.random() < args.route_prob:
+            reference.append(shard.route(txid, rng.sample(range(args.pools), 2), rng.randint(1, 200000)))
+        elif rng.random() < 0.5:
+            reference += shard.apply_block([(rng.randrange(args.pools), 'ETH_to_ERC20', (rng.randint(1, 1000),))])
+        else:
+            reference += shard.apply_block([(rng.randrange(args.pools), 'ERC20_to_ETH_exact', (rng.randint(1, 1000),))])
+    print(">>> same results and final state as in submission order: {}".format(
+        (reference == results) and (shard.get_states() == final_states[-1])))
@@ -1,11 +1,11 @@
 import os
 import argparse
 import random
-import matplotlib.pyplot as plt
-from copy import deepcopy
+import numpy as np
 
 from uniswap import Uniswap
 from arbitrager import Arbitrager
+from render import save_results, render_all
 
 
 def get_PATH(path):
@@ -14,8 +14,9 @@ def get_PATH(path):
     return PATH
 
 
-def Arbitraging_Curve(args, pool, actor, display=False):
-    tmp_pool = deepcopy(pool)
+def Arbitraging_Curve(args, pool, actor):
+    snapshot_id = pool.snapshot()
+    tmp_pool = pool  # rolled back to `snapshot_id` after the txs
 
     ks, ETHs, ERC20s, balances, Timings = [], [], [], [], []
     ks.append(tmp_pool.k)
@@ -40,78 +41,19 @@ def Arbitraging_Curve(args, pool, actor, display=False):
 
         balances.append(actor.balance_ERC20)
 
-    """Plot"""
-    # Balance
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot(balances, 'r-', label='balance')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylabel('ERC20')  # , color='c')
-
-    plt.legend()
-
-    for i in range(len(Timings)):
-        plt.axvline(x=Timings[i], color='gray', linestyle=':', linewidth=2)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'balance.png', format='png', dpi=300)
-
-    # k_Curve
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot(ks, 'c-', label='k')
-    ax1.set_xlabel('transaction')
-    # ax1.set_ylim((1998.9e11, 2001.6e11))
-    ax1.set_ylabel('k')  # , color='c')
-    # ax1.tick_params('y', colors='c')
-
-    plt.legend(loc='lower right')
-
-    for i in range(len(Timings)):
-        plt.axvline(x=Timings[i], color='gray', linestyle=':', linewidth=2)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'k_Curve.png', format='png', dpi=300)
-
-    # ETHNERC20_Curve
-    fig, ax1 = plt.subplots()
-
-    ln1 = ax1.plot(ETHs, 'b-', label='ETH')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylabel('ETH', color='b')
-    ax1.tick_params('y', colors='b')
-
-    ax2 = ax1.twinx()
-    ln2 = ax2.plot(ERC20s, 'r-', label='ERC20')
-    ax2.set_ylabel('ERC20', color='r')
-    ax2.tick_params('y', colors='r')
-
-    lns = ln1 + ln2
-    labs = [ln.get_label() for ln in lns]
-    ax1.legend(lns, labs, loc='lower right')
-
-    for i in range(len(Timings)):
-        plt.axvline(x=Timings[i], color='gray', linestyle=':', linewidth=2)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'ETHNERC20_Curve.png', format='png', dpi=300)
+    pool.restore(snapshot_id)
+
+    """Results"""
+    save_results(get_PATH(args.path), 'Arbitraging_Curve',
+                 ks=np.asarray(ks, dtype=np.float64), ETHs=ETHs, ERC20s=ERC20s, balances=balances, Timings=Timings)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--seed', type=int, default=950327)
     parser.add_argument('--path')  # location of log files
-    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--no-save', action='store_true')  # display figures instead of saving
+    parser.add_argument('--no-render', action='store_true')  # results only; see render.py
     args = parser.parse_args()
     print(args)
 
@@ -130,4 +72,8 @@ if __name__ == "__main__":
     # k & Arbitraging Timing
     # Arbitrager's Gain
     """
-    Arbitraging_Curve(args, us, arbitrager, display=args.no_save)
+    Arbitraging_Curve(args, us, arbitrager)
+
+    """Rendering"""
+    if not args.no_render:
+        render_all(get_PATH(args.path), display=args.no_save)
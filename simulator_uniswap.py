@@ -1,10 +1,10 @@
 import os
 import argparse
 import random
-import matplotlib.pyplot as plt
-from copy import deepcopy
+import numpy as np
 
 from uniswap import Uniswap
+from render import save_results, render_all
 
 
 def get_PATH(path):
@@ -13,8 +13,9 @@ def get_PATH(path):
     return PATH
 
 
-def Swap_k_Curve(args, pool, display=False):
-    tmp_pool = deepcopy(pool)
+def Swap_k_Curve(args, pool):
+    snapshot_id = pool.snapshot()
+    tmp_pool = pool  # rolled back to `snapshot_id` after the txs
 
     ks, ETHs, ERC20s = [], [], []
     ks.append(tmp_pool.k)
@@ -33,121 +34,36 @@ def Swap_k_Curve(args, pool, display=False):
     print(">>> after 1000 txs.")
     tmp_pool.print_pool_state(bool_LT=True)
 
-    """Plot"""
-    # k_Curve
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot(ks, 'c-', label='k')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylim((1998.9e11, 2001.6e11))
-    ax1.set_ylabel('k')  # , color='c')
-    # ax1.tick_params('y', colors='c')
-
-    plt.legend()
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'Swap_k_Curve.png', format='png', dpi=300)
-
-    # ETHNERC20_Curve
-    fig, ax1 = plt.subplots()
-
-    ln1 = ax1.plot(ETHs, 'b-', label='ETH')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylabel('ETH', color='b')
-    ax1.tick_params('y', colors='b')
-
-    ax2 = ax1.twinx()
-    ln2 = ax2.plot(ERC20s, 'r-', label='ERC20')
-    ax2.set_ylabel('ERC20', color='r')
-    ax2.tick_params('y', colors='r')
-
-    lns = ln1 + ln2
-    labs = [ln.get_label() for ln in lns]
-    ax1.legend(lns, labs, loc='upper left')
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'Swap_ETHNERC20_Curve.png', format='png', dpi=300)
-
-
-def ETH2ERC20_Swap_Curve(args, pool, display=False):
-    delta_ETHs = range(1, 1000000, 1000)
-    amount_ERC20s = []
-    for delta_ETH in delta_ETHs:
-        delta_ERC20 = pool.ETH_to_ERC20(delta_ETH, bool_update=False)
-        amount_ERC20s.append(delta_ERC20 / delta_ETH)  # amount of ERC20 per 1 ETH
-
-    # Plot
-    fig, ax1 = plt.subplots()
-
-    ln1 = ax1.plot([1, 1000000], [200, 200], 'r-', label='original')  # straight line
-    ax1.set_xlabel('ETH')
-    ax1.set_ylabel('ERC20', color='r')
-    ax1.set_ylim((95, 205))
-    ax1.tick_params('y', colors='r')
-
-    ax2 = ax1.twinx()
-    ln2 = ax2.plot(delta_ETHs, amount_ERC20s, 'b-', label='uniswap')
-    ax2.set_ylabel('ERC20', color='b')
-    ax2.set_ylim((95, 205))
-    ax2.tick_params('y', colors='b')
-
-    lns = ln1 + ln2
-    labs = [ln.get_label() for ln in lns]
-    ax1.legend(lns, labs)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'ETH2ERC20_Swap_Curve.png', format='png', dpi=300)
-
-
-def ERC202ETH_Swap_Curve(args, pool, display=False):
-    delta_ERC20s = range(1, 200000000, 200000)
-    amount_ETHs = []
-    for delta_ERC20 in delta_ERC20s:
-        delta_ETH = pool.ERC20_to_ETH(delta_ERC20, bool_update=False)
-        amount_ETHs.append(delta_ETH / delta_ERC20)  # amount of ERC20 per 1 ETH
-
-    n_err = amount_ETHs.count(0.)
-
-    # Plot
-    fig, ax1 = plt.subplots()
-
-    ln1 = ax1.plot([1, 200000000], [0.005, 0.005], 'r-', label='original')  # straight line
-    ax1.set_xlabel('ERC20')
-    ax1.set_ylabel('ETH', color='r')
-    ax1.set_ylim((0.0022, 0.0052))
-    ax1.tick_params('y', colors='r')
-
-    ax2 = ax1.twinx()
-    ln2 = ax2.plot(delta_ERC20s[n_err:], amount_ETHs[n_err:], 'b-', label='uniswap')
-    ax2.set_ylabel('ETH', color='b')
-    ax2.set_ylim((0.0022, 0.0052))
-    ax2.tick_params('y', colors='b')
-
-    lns = ln1 + ln2
-    labs = [ln.get_label() for ln in lns]
-    ax1.legend(lns, labs)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'ERC202ETH_Swap_Curve.png', format='png', dpi=300)
-
-
-def LP_k_ETHNERC20_Curve(args, pool, display=False):
-    tmp_pool = deepcopy(pool)
+    pool.restore(snapshot_id)
+
+    """Results"""
+    save_results(get_PATH(args.path), 'Swap_k_Curve',
+                 ks=np.asarray(ks, dtype=np.float64), ETHs=ETHs, ERC20s=ERC20s)
+
+
+def ETH2ERC20_Swap_Curve(args, pool):
+    delta_ETHs = np.arange(1, 1000000, 1000)
+    amount_ERC20s = pool.ETH_to_ERC20_batch(delta_ETHs) / delta_ETHs  # amount of ERC20 per 1 ETH
+
+    """Results"""
+    save_results(get_PATH(args.path), 'ETH2ERC20_Swap_Curve',
+                 delta_ETHs=delta_ETHs, amount_ERC20s=amount_ERC20s)
+
+
+def ERC202ETH_Swap_Curve(args, pool):
+    delta_ERC20s = np.arange(1, 200000000, 200000)
+    amount_ETHs = pool.ERC20_to_ETH_batch(delta_ERC20s) / delta_ERC20s  # amount of ERC20 per 1 ETH
+
+    n_err = int(np.count_nonzero(amount_ETHs == 0.))
+
+    """Results"""
+    save_results(get_PATH(args.path), 'ERC202ETH_Swap_Curve',
+                 delta_ERC20s=delta_ERC20s, amount_ETHs=amount_ETHs, n_err=n_err)
+
+
+def LP_k_ETHNERC20_Curve(args, pool):
+    snapshot_id = pool.snapshot()
+    tmp_pool = pool  # rolled back to `snapshot_id` after the txs
 
     ks, ETHs, ERC20s = [], [], []
     ks.append(tmp_pool.k)
@@ -213,86 +129,37 @@ def LP_k_ETHNERC20_Curve(args, pool, display=False):
     print(">>> after 1000 txs.")
     tmp_pool.print_pool_state(bool_LT=True)
 
-    """Plot"""
-    # k_Curve
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot(ks, 'c-', label='k')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylabel('k')  # , color='c')
-    # ax1.tick_params('y', colors='c')
-
-    plt.legend()
-
-    plt.axvline(x=1000, color='gray', linestyle=':', linewidth=2)
-    plt.axvline(x=2000, color='gray', linestyle=':', linewidth=2)
+    pool.restore(snapshot_id)
 
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'LP_k_Curve.png', format='png', dpi=300)
+    """Results"""
+    save_results(get_PATH(args.path), 'LP_k_ETHNERC20_Curve',
+                 ks=np.asarray(ks, dtype=np.float64), ETHs=ETHs, ERC20s=ERC20s)
 
-    # ETHNERC20_Curve
-    fig, ax1 = plt.subplots()
 
-    ln1 = ax1.plot(ETHs, 'b-', label='ETH')
-    ax1.set_xlabel('transaction')
-    ax1.set_ylabel('ETH', color='b')
-    ax1.tick_params('y', colors='b')
-
-    ax2 = ax1.twinx()
-    ln2 = ax2.plot(ERC20s, 'r-', label='ERC20')
-    ax2.set_ylabel('ERC20', color='r')
-    ax2.tick_params('y', colors='r')
-
-    lns = ln1 + ln2
-    labs = [ln.get_label() for ln in lns]
-    ax1.legend(lns, labs)
-
-    plt.axvline(x=1000, color='gray', linestyle=':', linewidth=2)
-    plt.axvline(x=2000, color='gray', linestyle=':', linewidth=2)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'LP_ETHNERC20_Curve.png', format='png', dpi=300)
-
-
-def LP_LT_Curve(args, pool, display=False):
+def LP_LT_Curve(args, pool):
     input_ETHs = range(200000, 1000000, 10000)
     LTs = []
+    snapshot_id = pool.snapshot()  # `join` records LT holders even without bool_update
     for input_ETH in input_ETHs:
         required_ERC20 = pool.required_ERC20_for_liquidity(input_ETH)
         # print(">>> input (ETH, ERC20) = ({}, {})".format(input_ETH, required_ERC20))
         get_LT = pool.join('0', input_ETH, required_ERC20, bool_update=False)
         LTs.append(get_LT)
+    pool.restore(snapshot_id)
 
-    """Plot"""
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot(input_ETHs, LTs, 'b-', label='LT')
-    ax1.set_xlabel('ETH')
-    ax1.set_ylabel('LT')
+    """Results"""
+    save_results(get_PATH(args.path), 'LP_LT_Curve',
+                 input_ETHs=np.asarray(input_ETHs), LTs=LTs)
 
-    plt.legend()
 
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'LP_LT_Curve.png', format='png', dpi=300)
-
-
-def fee_Gain_Curve(args, pool, display=False):
+def fee_Gain_Curve(args, pool):
     fees = range(1, 11)  # n * (1/1000) [%]
     Gains = []
     for fee in fees:
-        tmp_pool = deepcopy(pool)  # copy
+        snapshot_id = pool.snapshot()
+        tmp_pool = pool  # rolled back to `snapshot_id` below
         fee /= 1000.
-        tmp_pool.fee = fee
+        tmp_pool.update_fee(fee)
 
         """Providing Lquidity"""
         input_ETH = 200000
@@ -312,30 +179,19 @@ def fee_Gain_Curve(args, pool, display=False):
         # print(">>> output (ETH, ERC20) = ({}, {})".format(get_ETH, get_ERC20))
         Gain = get_ETH * 200 + get_ERC20
         Gains.append(Gain)
+        pool.restore(snapshot_id)
 
-    """Plot"""
-    fig, ax1 = plt.subplots()
-    ln1 = ax1.plot([fee / 1000. for fee in fees], Gains, 'r-', label='ERC20')
-    ax1.set_xlabel('fee')
-    ax1.set_ylabel('ERC20')
-
-    plt.legend()
-
-    plt.axvline(x=0.003, color='gray', linestyle=':', linewidth=2)
-
-    if display:
-        plt.show()
-    else:
-        figure = plt.gcf()  # get current figure
-        figure.set_size_inches(8, 6)
-        plt.savefig(get_PATH(args.path) + 'Fee_Gain_Curve.png', format='png', dpi=300)
+    """Results"""
+    save_results(get_PATH(args.path), 'fee_Gain_Curve',
+                 fees=[fee / 1000. for fee in fees], Gains=Gains)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--seed', type=int, default=950327)
     parser.add_argument('--path')  # location of log files
-    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--no-save', action='store_true')  # display figures instead of saving
+    parser.add_argument('--no-render', action='store_true')  # results only; see render.py
     args = parser.parse_args()
     print(args)
 
@@ -352,19 +208,23 @@ if __name__ == "__main__":
     us.print_pool_state(bool_LT=True)
 
     """Simulation 1-1) Swap & k"""
-    Swap_k_Curve(args, us, display=args.no_save)
+    Swap_k_Curve(args, us)
 
     """Simulation 1-2) ETH -> ERC20 Swap Curve"""
-    ETH2ERC20_Swap_Curve(args, us, display=args.no_save)
+    ETH2ERC20_Swap_Curve(args, us)
 
     """Simulation 1-3) ERC20 -> ETH Swap Curve"""
-    ERC202ETH_Swap_Curve(args, us, display=args.no_save)
+    ERC202ETH_Swap_Curve(args, us)
 
     """Simulation 2-1) Providing Liquidity & k"""
-    LP_k_ETHNERC20_Curve(args, us, display=args.no_save)
+    LP_k_ETHNERC20_Curve(args, us)
 
     """Simulation 2-3) LP & LT"""
-    LP_LT_Curve(args, us, display=args.no_save)
+    LP_LT_Curve(args, us)
 
     """Simulation 2-3) Fee & LP's Gain"""
-    fee_Gain_Curve(args, us, display=args.no_save)
+    fee_Gain_Curve(args, us)
+
+    """Rendering"""
+    if not args.no_render:
+        render_all(get_PATH(args.path), display=args.no_save)
@@ -0,0 +1,110 @@
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from uniswap import Uniswap
+
+
+def make_grid(**axes):  # cartesian product: make_grid(fee=[...], trade_size=[...]) -> [{fee, trade_size}, ...]
+    keys = list(axes.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*axes.values())]
+
+
+def _run_task(task):
+    scenario, params, seed_seq = task
+    rng = np.random.default_rng(seed_seq)
+    return scenario(rng, **params)
+
+
+def run_sweep(scenario, grid, seed=950327, n_workers=None, chunksize=1):
+    """
+    Run `scenario(rng, **params)` for every params in `grid` across a process pool.
+
+    Each task gets its own RNG stream spawned from `seed` by task index, so the
+    rows are identical for any `n_workers` (n_workers=1 runs in-process).
+    Returns one row (params + scenario results) per task, in grid order.
+    """
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(grid))
+    tasks = [(scenario, params, seed_seq) for params, seed_seq in zip(grid, seed_seqs)]
+
+    if n_workers == 1:
+        results = list(map(_run_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_run_task, tasks, chunksize=chunksize))
+
+    return [dict(params, **result) for params, result in zip(grid, results)]
+
+
+def write_csv(rows, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+"""Scenarios"""
+
+
+def LP_Gain(rng,
+            fee=0.003,
+            trade_size=105,
+            volatility=0.,      # sigma of lognormal trade sizes; 0 for fixed `trade_size`
+            n_rounds=1000,
+            amount_ETH=1000000,
+            amount_ERC20=200000000,
+            init_LT=1000000,
+            input_ETH=200000):
+    # `fee_Gain_Curve` of simulator_uniswap.py, with random directions and sizes
+    pool = Uniswap('-1', amount_ETH, amount_ERC20, init_LT, fee=fee)
+    ratio = amount_ERC20 / amount_ETH
+
+    """Providing Liquidity"""
+    required_ERC20 = pool.required_ERC20_for_liquidity(input_ETH)
+    get_LT = pool.join('0', input_ETH, required_ERC20)
+
+    """Txs"""
+    bool_ETH_to_ERC20s = rng.random(n_rounds) < 0.5
+    sizes = np.maximum(1, np.round(trade_size * rng.lognormal(0., volatility, n_rounds))).astype(np.int64) \
+        if volatility > 0 else np.full(n_rounds, trade_size, dtype=np.int64)
+    for bool_ETH_to_ERC20, size in zip(bool_ETH_to_ERC20s.tolist(), sizes.tolist()):
+        if bool_ETH_to_ERC20:
+            pool.ETH_to_ERC20(size)
+        else:
+            pool.ERC20_to_ETH_exact(size)
+
+    """Remove Liquidity"""
+    get_ETH, get_ERC20 = pool.out('0', get_LT)
+    return {
+        "gain": get_ETH * ratio + get_ERC20 - (input_ETH * ratio + required_ERC20),
+        "k": pool.k,
+        "ETH": pool.ETH,
+        "ERC20": pool.ERC20}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=950327)
+    parser.add_argument('--workers', type=int)  # default: all cores
+    parser.add_argument('--path')  # location of log files
+    args = parser.parse_args()
+    print(args)
+
+    grid = make_grid(fee=[n / 1000. for n in range(1, 11)],
+                     trade_size=[105, 1050],
+                     volatility=[0., 0.5, 1.])
+
+    start = time.perf_counter()
+    rows = run_sweep(LP_Gain, grid, seed=args.seed, n_workers=args.workers)
+    print(">>> {} scenarios in {:.3f}s".format(len(rows), time.perf_counter() - start))
+
+    path = (args.path or 'plots/sweep') + '/LP_Gain.csv'
+    write_csv(rows, path)
+    print(">>> saved {}".format(path))
@@ -1,5 +1,33 @@
-from math import floor, ceil  # for quantization
+from math import floor, ceil, gcd  # for quantization
 from pprint import pprint
+from collections import namedtuple
+
+import numpy as np
+
+from holders import HolderBalances
+
+FEE_DENOMINATOR = 1000000  # fee resolution of integer mode (1e-6)
+INT64_MAX = 2 ** 63 - 1
+JOURNAL_STATE, JOURNAL_FEE, JOURNAL_HOLDER, JOURNAL_SNAPSHOT, JOURNAL_INVARIANT = 0, 1, 2, 3, 4  # undo log entry types
+JOURNAL_LEDGER = 5  # written and undone by `lp_ledger.LPLedger`
+
+# A priced swap of `pool`, valid while its `version` is unchanged; see `Uniswap.quote`
+Quote = namedtuple('Quote', ['pool', 'version', 'direction', 'amount_in', 'amount_out', 'bool_fee'])
+SWAPS = ('ETH_to_ERC20', 'ETH_to_ERC20_exact', 'ERC20_to_ETH', 'ERC20_to_ETH_exact')  # directions of a Quote
+
+
+def _ratios(numerators, denominator):  # elementwise float(n / d), as Python's exact int division rounds it
+    numerators = np.asarray(numerators)
+    if (abs(denominator) >= 2 ** 53) or (numerators.size and np.abs(numerators).max() >= 2 ** 53):
+        return np.array([float(n / denominator) for n in numerators.tolist()], dtype=np.float64)
+    return numerators.astype(np.float64) / denominator
+
+
+def _floor_to_ints(values):  # elementwise `floor`, int64 when it fits
+    floors = np.floor(values)
+    if floors.size and np.abs(floors).max() >= 2. ** 63:
+        return np.array([int(v) for v in floors.tolist()], dtype=object)
+    return floors.astype(np.int64)
 
 
 class Uniswap:  # between Eth and ERC20
@@ -8,24 +36,76 @@ class Uniswap:  # between Eth and ERC20
                  amount_ETH,   # ex) (1.) * n
                  amount_ERC20,    # ex) (200. ~= 199.5) * n
                  init_LT,
-                 fee=0.003      # 0.3%
+                 fee=0.003,     # 0.3%
+                 bool_int=False,    # exact integer (wei) math as in the v1 contract
+                 invariant=None,    # pricing other than x * y = k, see invariants.py
+                 address_table=None     # `holders.AddressTable`: LT holders in arrays over its ids
                  ):
 
+        # Validity check
+        if bool_int and not all(isinstance(v, int) for v in (amount_ETH, amount_ERC20, init_LT)):
+            raise Exception("invalid amounts for integer mode: {}, {}, {}".format(
+                amount_ETH, amount_ERC20, init_LT))
+        if bool_int and (invariant is not None):
+            raise Exception("invalid invariant for integer mode: {}".format(type(invariant).__name__))
+
         self.ETH, self.ERC20, self.LT = amount_ETH, amount_ERC20, init_LT
         self.k = self.ETH * self.ERC20  # constant product
         self.fee = fee
+        self.bool_int = bool_int
+        self.invariant = invariant
 
-        self.LT_holders = {}
+        self.LT_holders = {} if address_table is None else HolderBalances(address_table)
         self.LT_holders[address] = init_LT
 
+        self._journal = None  # undo log, kept only while a snapshot is held
+        self.recorder = None  # optional `recorder.Recorder` of POOL_COLUMNS (WEI_POOL_COLUMNS), fed by `_update`
+        self.event_log = None  # optional `event_log.EventLog`, see `EventLog.attach`
+        self.ledger = None  # optional `lp_ledger.LPLedger`, see `LPLedger.attach`
+        self.metrics = None  # optional `metrics.Metrics`: call counters and timings
+
+        self.version = 0  # bumped by every state change; invalidates quotes
+        self._quotes, self._quotes_version = None, None  # cache of the current version's quotes
+
     def _update(self, ETH_prime, ERC20_prime, LT_prime=None):
-        if LT_prime is not None:
-            self.LT = LT_prime
-        self.ETH, self.ERC20 = ETH_prime, ERC20_prime
+        if LT_prime is None:
+            LT_prime = self.LT
+        if self.recorder is not None:  # before any change: a value the recorder rejects leaves the pool as is
+            self.recorder.record(ETH_prime, ERC20_prime, ETH_prime * ERC20_prime, LT_prime)
+        if self._journal is not None:
+            self._journal.append((JOURNAL_STATE, self.ETH, self.ERC20, self.LT))
+        self.ETH, self.ERC20, self.LT = ETH_prime, ERC20_prime, LT_prime
         self.k = self.ETH * self.ERC20
+        self.version += 1
 
     def update_fee(self, new_fee):
+        if self._journal is not None:
+            self._journal.append((JOURNAL_FEE, self.fee))
         self.fee = new_fee
+        self.version += 1
+        if self.event_log is not None:
+            self.event_log.append(self, 'update_fee', new_fee)
+
+    def _update_LT_holder(self, address, LT_prime):  # LT_prime=None removes the holder
+        if self._journal is not None:
+            self._journal.append((JOURNAL_HOLDER, address, self.LT_holders.get(address)))
+        if LT_prime is None:
+            del self.LT_holders[address]
+        else:
+            self.LT_holders[address] = LT_prime
+
+    def _get_gamma(self, bool_fee=True):  # (1 - fee) as an integer fraction, for integer mode
+        if not bool_fee:
+            return 1, 1
+        gamma_den = FEE_DENOMINATOR
+        gamma_num = gamma_den - round(self.fee * gamma_den)
+        g = gcd(gamma_num, gamma_den)
+        return gamma_num // g, gamma_den // g  # ex) 0.3% -> (997, 1000)
+
+    def _update_invariant(self, delta_in, delta_out, bool_ETH_in, bool_fee):  # state beyond the reserves
+        if self._journal is not None:
+            self._journal.append((JOURNAL_INVARIANT, self.invariant.get_state()))
+        self.invariant.on_swap(self, delta_in, delta_out, bool_ETH_in, bool_fee)
 
     """Swap Protocol"""
 
@@ -34,10 +114,15 @@ class Uniswap:  # between Eth and ERC20
         if (X == 0) or (Y == 0):
             raise Exception("invalid X: {} or Y: {}".format(X, Y))
 
-        alpha = float(delta_X / X)
-        gamma = (1. - self.fee) if bool_fee else (1.)
+        if self.bool_int:  # getInputPrice
+            gamma_num, gamma_den = self._get_gamma(bool_fee)
+            delta_X_with_fee = delta_X * gamma_num
+            delta_Y = delta_X_with_fee * Y // (X * gamma_den + delta_X_with_fee)
+        else:
+            alpha = float(delta_X / X)
+            gamma = (1. - self.fee) if bool_fee else (1.)
 
-        delta_Y = floor(alpha * gamma / (1. + alpha * gamma) * Y)
+            delta_Y = floor(alpha * gamma / (1. + alpha * gamma) * Y)
 
         # Validity check
         if delta_Y >= Y:
@@ -52,57 +137,238 @@ class Uniswap:  # between Eth and ERC20
         if delta_Y >= Y:
             raise Exception("invalid delta_Y. {} >= {}".format(delta_Y, Y))
 
+        if self.bool_int:  # getOutputPrice
+            gamma_num, gamma_den = self._get_gamma(bool_fee)
+            delta_X = X * delta_Y * gamma_den // ((Y - delta_Y) * gamma_num) + 1
+            return delta_X
+
         beta = float(delta_Y / Y)
         gamma = (1. - self.fee) if bool_fee else (1.)
 
         delta_X = floor(beta / ((1. - beta) * gamma) * X) + 1
         return delta_X
 
+    def _get_input_prices(self, delta_Xs, X, Y, bool_fee=True):  # vectorized `_get_input_price`
+        # Validity check
+        if (X == 0) or (Y == 0):
+            raise Exception("invalid X: {} or Y: {}".format(X, Y))
+
+        if self.bool_int:
+            gamma_num, gamma_den = self._get_gamma(bool_fee)
+            delta_Xs = np.asarray(delta_Xs)
+            max_X = int(delta_Xs.max()) if delta_Xs.size else 0
+            bool_fast = (max_X * gamma_num * Y <= INT64_MAX) and (X * gamma_den + max_X * gamma_num <= INT64_MAX)
+            delta_Xs = delta_Xs.astype(np.int64 if bool_fast else object)  # machine ints when they fit
+
+            delta_Xs_with_fee = delta_Xs * gamma_num
+            delta_Ys = delta_Xs_with_fee * Y // (X * gamma_den + delta_Xs_with_fee)
+        else:
+            alphas = _ratios(delta_Xs, X)
+            gamma = (1. - self.fee) if bool_fee else (1.)
+
+            delta_Ys = _floor_to_ints(alphas * gamma / (1. + alphas * gamma) * Y)
+
+        # Validity check
+        invalid = delta_Ys >= Y
+        if invalid.any():
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_Ys[invalid][0], Y))
+
+        return delta_Ys
+
+    def _get_output_prices(self, delta_Ys, Y, X, bool_fee=True):  # vectorized `_get_output_price`
+        # Validity check
+        if (X == 0) or (Y == 0):
+            raise Exception("invalid X: {} or Y: {}".format(X, Y))
+        delta_Ys = np.asarray(delta_Ys)
+        invalid = delta_Ys >= Y
+        if invalid.any():
+            raise Exception("invalid delta_Y. {} >= {}".format(delta_Ys[invalid][0], Y))
+
+        if self.bool_int:
+            gamma_num, gamma_den = self._get_gamma(bool_fee)
+            max_Y = int(delta_Ys.max()) if delta_Ys.size else 0
+            bool_fast = (X * max_Y * gamma_den <= INT64_MAX) and (Y * gamma_num <= INT64_MAX)
+            delta_Ys = delta_Ys.astype(np.int64 if bool_fast else object)  # machine ints when they fit
+
+            delta_Xs = X * delta_Ys * gamma_den // ((Y - delta_Ys) * gamma_num) + 1
+            return delta_Xs
+
+        betas = _ratios(delta_Ys, Y)
+        gamma = (1. - self.fee) if bool_fee else (1.)
+
+        delta_Xs = _floor_to_ints(betas / ((1. - betas) * gamma) * X) + 1
+        return delta_Xs
+
     def ETH_to_ERC20(self, delta_ETH, bool_fee=True, bool_update=True):
+        if self.metrics is not None:
+            return self.metrics.call(self, 'ETH_to_ERC20', delta_ETH, bool_fee=bool_fee, bool_update=bool_update)
         ETH_prime = self.ETH + delta_ETH
-        delta_ERC20 = self._get_input_price(delta_ETH, self.ETH, self.ERC20, bool_fee=bool_fee)
+        if self.invariant is None:
+            delta_ERC20 = self._get_input_price(delta_ETH, self.ETH, self.ERC20, bool_fee=bool_fee)
+        else:
+            delta_ERC20 = self.invariant.get_input_price(self, delta_ETH, True, bool_fee=bool_fee)
 
         if bool_update:
+            if self.invariant is not None:
+                self._update_invariant(delta_ETH, delta_ERC20, True, bool_fee)
             ERC20_prime = self.ERC20 - delta_ERC20
             self._update(ETH_prime, ERC20_prime)  # Pool update
+            if self.event_log is not None:
+                self.event_log.append(self, 'ETH_to_ERC20', delta_ETH, bool_fee)
+            if self.ledger is not None:
+                self.ledger.on_swap(delta_ETH, 0, bool_fee)
         return delta_ERC20
 
     def ETH_to_ERC20_exact(self, delta_ERC20, bool_fee=True, bool_update=True):
-        delta_ETH = self._get_output_price(delta_ERC20, self.ERC20, self.ETH, bool_fee=bool_fee)
+        if self.metrics is not None:
+            return self.metrics.call(self, 'ETH_to_ERC20_exact', delta_ERC20, bool_fee=bool_fee, bool_update=bool_update)
+        if self.invariant is None:
+            delta_ETH = self._get_output_price(delta_ERC20, self.ERC20, self.ETH, bool_fee=bool_fee)
+        else:
+            delta_ETH = self.invariant.get_output_price(self, delta_ERC20, True, bool_fee=bool_fee)
         ETH_prime = self.ETH + delta_ETH
 
         if bool_update:
+            if self.invariant is not None:
+                self._update_invariant(delta_ETH, delta_ERC20, True, bool_fee)
             ERC20_prime = self.ERC20 - delta_ERC20
             self._update(ETH_prime, ERC20_prime)  # Pool update
+            if self.event_log is not None:
+                self.event_log.append(self, 'ETH_to_ERC20_exact', delta_ERC20, bool_fee)
+            if self.ledger is not None:
+                self.ledger.on_swap(delta_ETH, 0, bool_fee)
         return delta_ETH
 
     def ERC20_to_ETH(self, delta_ERC20, bool_fee=True, bool_update=True):
+        if self.metrics is not None:
+            return self.metrics.call(self, 'ERC20_to_ETH', delta_ERC20, bool_fee=bool_fee, bool_update=bool_update)
         ERC20_prime = self.ERC20 + delta_ERC20
-        delta_ETH = self._get_input_price(delta_ERC20, self.ERC20, self.ETH, bool_fee=bool_fee)
+        if self.invariant is None:
+            delta_ETH = self._get_input_price(delta_ERC20, self.ERC20, self.ETH, bool_fee=bool_fee)
+        else:
+            delta_ETH = self.invariant.get_input_price(self, delta_ERC20, False, bool_fee=bool_fee)
 
         if bool_update:
+            if self.invariant is not None:
+                self._update_invariant(delta_ERC20, delta_ETH, False, bool_fee)
             ETH_prime = self.ETH - delta_ETH
             self._update(ETH_prime, ERC20_prime)  # Pool update
+            if self.event_log is not None:
+                self.event_log.append(self, 'ERC20_to_ETH', delta_ERC20, bool_fee)
+            if self.ledger is not None:
+                self.ledger.on_swap(0, delta_ERC20, bool_fee)
         return delta_ETH
 
     def ERC20_to_ETH_exact(self, delta_ETH, bool_fee=True, bool_update=True):
-        delta_ERC20 = self._get_output_price(delta_ETH, self.ETH, self.ERC20, bool_fee=bool_fee)
+        if self.metrics is not None:
+            return self.metrics.call(self, 'ERC20_to_ETH_exact', delta_ETH, bool_fee=bool_fee, bool_update=bool_update)
+        if self.invariant is None:
+            delta_ERC20 = self._get_output_price(delta_ETH, self.ETH, self.ERC20, bool_fee=bool_fee)
+        else:
+            delta_ERC20 = self.invariant.get_output_price(self, delta_ETH, False, bool_fee=bool_fee)
         ERC20_prime = self.ERC20 + delta_ERC20
 
         if bool_update:
+            if self.invariant is not None:
+                self._update_invariant(delta_ERC20, delta_ETH, False, bool_fee)
             ETH_prime = self.ETH - delta_ETH
             self._update(ETH_prime, ERC20_prime)  # Pool update
+            if self.event_log is not None:
+                self.event_log.append(self, 'ERC20_to_ETH_exact', delta_ETH, bool_fee)
+            if self.ledger is not None:
+                self.ledger.on_swap(0, delta_ERC20, bool_fee)
         return delta_ERC20
 
+    """Batch Quotes (no pool update)"""
+
+    def _invariant_prices(self, price, amounts, bool_ETH_in, bool_fee):  # one quote per amount
+        return np.array([price(self, amount, bool_ETH_in, bool_fee=bool_fee) for amount in np.asarray(amounts).tolist()])
+
+    def ETH_to_ERC20_batch(self, delta_ETHs, bool_fee=True):
+        if self.invariant is not None:
+            return self._invariant_prices(self.invariant.get_input_price, delta_ETHs, True, bool_fee)
+        return self._get_input_prices(delta_ETHs, self.ETH, self.ERC20, bool_fee=bool_fee)
+
+    def ETH_to_ERC20_exact_batch(self, delta_ERC20s, bool_fee=True):
+        if self.invariant is not None:
+            return self._invariant_prices(self.invariant.get_output_price, delta_ERC20s, True, bool_fee)
+        return self._get_output_prices(delta_ERC20s, self.ERC20, self.ETH, bool_fee=bool_fee)
+
+    def ERC20_to_ETH_batch(self, delta_ERC20s, bool_fee=True):
+        if self.invariant is not None:
+            return self._invariant_prices(self.invariant.get_input_price, delta_ERC20s, False, bool_fee)
+        return self._get_input_prices(delta_ERC20s, self.ERC20, self.ETH, bool_fee=bool_fee)
+
+    def ERC20_to_ETH_exact_batch(self, delta_ETHs, bool_fee=True):
+        if self.invariant is not None:
+            return self._invariant_prices(self.invariant.get_output_price, delta_ETHs, False, bool_fee)
+        return self._get_output_prices(delta_ETHs, self.ETH, self.ERC20, bool_fee=bool_fee)
+
+    """Quotes (cached per state version, executable without repricing)"""
+
+    def quote(self, direction, amount, bool_fee=True):
+        """
+        Quote of `direction` ('ETH_to_ERC20', 'ETH_to_ERC20_exact', 'ERC20_to_ETH' or
+        'ERC20_to_ETH_exact') for `amount`, as the swap method of that name would
+        price it. Repeated quotes of an unchanged pool are served from a cache.
+        """
+        key = (direction, amount, self.fee, bool_fee)
+        if self._quotes_version == self.version:
+            quote = self._quotes.get(key)
+            if quote is not None:
+                return quote
+        else:
+            self._quotes, self._quotes_version = {}, self.version
+
+        if direction not in SWAPS:
+            raise Exception("invalid direction {}. one of {}".format(direction, SWAPS))
+        price = getattr(self, direction)(amount, bool_fee, False)
+        if direction.endswith('_exact'):
+            quote = Quote(self, self.version, direction, price, amount, bool_fee)
+        else:
+            quote = Quote(self, self.version, direction, amount, price, bool_fee)
+        self._quotes[key] = quote
+        return quote
+
+    def execute(self, quote):  # commit a quote; returns what the swap method would
+        if self.metrics is not None:
+            return self.metrics.call(self, 'execute', quote)
+
+        if quote.pool != self:
+            raise Exception("invalid quote. priced on another pool")
+        if quote.version != self.version:
+            raise Exception("stale quote. version {} but pool is at {}".format(quote.version, self.version))
+
+        _, _, direction, amount_in, amount_out, bool_fee = quote
+        bool_ETH_in, bool_exact = direction.startswith('ETH'), direction.endswith('_exact')
+        if self.invariant is not None:
+            self._update_invariant(amount_in, amount_out, bool_ETH_in, bool_fee)
+        if bool_ETH_in:
+            self._update(self.ETH + amount_in, self.ERC20 - amount_out)  # Pool update
+        else:
+            self._update(self.ETH - amount_out, self.ERC20 + amount_in)  # Pool update
+
+        if self.event_log is not None:
+            self.event_log.append(self, direction, amount_out if bool_exact else amount_in, bool_fee)
+        if self.ledger is not None:
+            self.ledger.on_swap(amount_in if bool_ETH_in else 0, 0 if bool_ETH_in else amount_in, bool_fee)
+        return amount_in if bool_exact else amount_out
+
     """Liquidity Protocol"""
 
     def required_ERC20_for_liquidity(self, delta_ETH):
+        if self.bool_int:  # addLiquidity: token_amount
+            return delta_ETH * self.ERC20 // self.ETH + 1
+
         alpha = float(delta_ETH / self.ETH)
 
         ERC20_prime = floor((1. + alpha) * self.ERC20) + 1
         return ERC20_prime - self.ERC20
 
     def join(self, address, delta_ETH, delta_ERC20, bool_update=True):
+        if self.metrics is not None:
+            return self.metrics.call(self, 'join', address, delta_ETH, delta_ERC20, bool_update=bool_update)
+
         # delta_ERC20 validity check
         current_required_ERC20_for_liquidity = self.required_ERC20_for_liquidity(delta_ETH)
         if current_required_ERC20_for_liquidity != delta_ERC20:
@@ -110,36 +376,64 @@ class Uniswap:  # between Eth and ERC20
                 current_required_ERC20_for_liquidity, delta_ERC20))
 
         delta_LT = self._mint(delta_ETH, delta_ERC20, bool_update=bool_update)
-        if address in self.LT_holders.keys():
-            self.LT_holders[address] += delta_LT
-        else:
-            self.LT_holders[address] = delta_LT
+        LT = self.LT_holders.get(address)
+        self._update_LT_holder(address, delta_LT if LT is None else LT + delta_LT)
 
+        if bool_update and (self.event_log is not None):
+            self.event_log.append(self, 'join', address, delta_ETH, delta_ERC20)
+        if bool_update and (self.ledger is not None):
+            self.ledger.on_join(address, delta_ETH, delta_ERC20, delta_LT)
         return delta_LT
 
     def out(self, address, delta_LT, bool_update=True):
+        if self.metrics is not None:
+            return self.metrics.call(self, 'out', address, delta_LT, bool_update=bool_update)
+
         # Ownership validity check
-        if address not in self.LT_holders.keys():
+        LT = self.LT_holders.get(address)
+        if LT is None:
             raise Exception("invalid address")
 
         # delta_LT validity check
-        if self.LT_holders[address] < delta_LT:
+        if LT < delta_LT:
             raise Exception("invalid delta_LT. Have to be under {} LT but input is {}".format(
-                self.LT_holders[address], delta_LT))
+                LT, delta_LT))
 
         delta_ETH, delta_ERC20 = self._burn(delta_LT, bool_update=bool_update)
-        self.LT_holders[address] -= delta_LT
-        if self.LT_holders[address] == 0:
-            del self.LT_holders[address]
+        LT_prime = LT - delta_LT
+        self._update_LT_holder(address, LT_prime if LT_prime != 0 else None)
+
+        if bool_update and (self.event_log is not None):
+            self.event_log.append(self, 'out', address, delta_LT)
+        if bool_update and (self.ledger is not None):
+            self.ledger.on_out(address, delta_LT, delta_ETH, delta_ERC20)
 
         return delta_ETH, delta_ERC20
 
-    def _mint(self, delta_ETH, delta_ERC20, bool_update=True):  # add_liquidity
-        alpha = float(delta_ETH / self.ETH)
+    def burn(self, delta_LT, bool_update=True):  # remove LT no holder is tracked for (e.g. minted before an export)
+        if self.metrics is not None:
+            return self.metrics.call(self, 'burn', delta_LT, bool_update=bool_update)
+
+        delta_ETH, delta_ERC20 = self._burn(delta_LT, bool_update=bool_update)
+        if bool_update and (self.event_log is not None):
+            self.event_log.append(self, 'burn', delta_LT)
+        return delta_ETH, delta_ERC20
+
+    def _check_proportional(self):
+        if (self.invariant is not None) and not self.invariant.bool_proportional:
+            raise Exception("invalid liquidity operation for invariant {}".format(type(self.invariant).__name__))
 
+    def _mint(self, delta_ETH, delta_ERC20, bool_update=True):  # add_liquidity
+        self._check_proportional()
         ETH_prime = self.ETH + delta_ETH
-        ERC20_prime = floor((1. + alpha) * self.ERC20) + 1
-        LT_prime = floor((1. + alpha) * self.LT)
+        if self.bool_int:  # addLiquidity: token_amount, liquidity_minted
+            ERC20_prime = self.ERC20 + delta_ETH * self.ERC20 // self.ETH + 1
+            LT_prime = self.LT + delta_ETH * self.LT // self.ETH
+        else:
+            alpha = float(delta_ETH / self.ETH)
+
+            ERC20_prime = floor((1. + alpha) * self.ERC20) + 1
+            LT_prime = floor((1. + alpha) * self.LT)
         delta_LT = LT_prime - self.LT
 
         if bool_update:
@@ -147,10 +441,15 @@ class Uniswap:  # between Eth and ERC20
         return delta_LT
 
     def _burn(self, delta_LT, bool_update=True):  # remove_liquidity
-        alpha = float(delta_LT / self.LT)
+        self._check_proportional()
+        if self.bool_int:  # removeLiquidity: eth_amount, token_amount
+            ETH_prime = self.ETH - delta_LT * self.ETH // self.LT
+            ERC20_prime = self.ERC20 - delta_LT * self.ERC20 // self.LT
+        else:
+            alpha = float(delta_LT / self.LT)
 
-        ETH_prime = ceil((1. - alpha) * self.ETH)
-        ERC20_prime = ceil((1. - alpha) * self.ERC20)
+            ETH_prime = ceil((1. - alpha) * self.ETH)
+            ERC20_prime = ceil((1. - alpha) * self.ERC20)
         LT_prime = self.LT - delta_LT
         delta_ETH = self.ETH - ETH_prime
         delta_ERC20 = self.ERC20 - ERC20_prime
@@ -159,6 +458,52 @@ class Uniswap:  # between Eth and ERC20
             self._update(ETH_prime, ERC20_prime, LT_prime)  # burn LT
         return delta_ETH, delta_ERC20
 
+    """Snapshots"""
+
+    def snapshot(self):  # O(1); changes after this are journaled until `restore` or `release`
+        if self._journal is None:
+            self._journal = []
+        # nested snapshots get distinct ids; the log's length, to drop the events `restore` undoes
+        self._journal.append((JOURNAL_SNAPSHOT, None if self.event_log is None else len(self.event_log)))
+        return len(self._journal) - 1
+
+    def restore(self, snapshot_id):  # O(changes since the snapshot)
+        if (self._journal is None) or (snapshot_id >= len(self._journal)):
+            raise Exception("invalid snapshot_id {}".format(snapshot_id))
+
+        n_events = self._journal[snapshot_id][1]
+        while len(self._journal) > snapshot_id:
+            entry = self._journal.pop()
+            if entry[0] == JOURNAL_STATE:
+                _, self.ETH, self.ERC20, self.LT = entry
+                self.k = self.ETH * self.ERC20
+            elif entry[0] == JOURNAL_FEE:
+                self.fee = entry[1]
+            elif entry[0] == JOURNAL_INVARIANT:
+                self.invariant.set_state(entry[1])
+            elif entry[0] == JOURNAL_SNAPSHOT:
+                continue
+            elif entry[0] == JOURNAL_HOLDER:
+                _, address, LT = entry
+                if LT is None:
+                    self.LT_holders.pop(address, None)
+                else:
+                    self.LT_holders[address] = LT
+            else:  # JOURNAL_LEDGER
+                self.ledger.undo(entry)
+
+        self.version += 1  # a restored state is never the one a quote was made on
+        if snapshot_id == 0:
+            self._journal = None
+        if self.event_log is not None:  # the log's events since the snapshot are undone
+            if n_events is None:  # logged since: the restored state starts over
+                self.event_log.checkpoint(self)
+            else:
+                self.event_log.truncate(n_events)
+
+    def release(self):  # keep the current state, drop every snapshot
+        self._journal = None
+
     """Logging"""
 
     def print_pool_state(self, bool_LT=False):